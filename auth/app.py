@@ -1,7 +1,6 @@
 from flask import Flask, json, request, jsonify
 from flask_cors import CORS
 import sys, os
-from functools import wraps
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from shared.models.base import Base
 from shared.models.customer import Customer
@@ -9,14 +8,27 @@ from shared.models.review import Review
 from shared.models.inventory import InventoryItem
 from shared.models.wishlist import Wishlist
 from shared.database import engine, SessionLocal
+from shared.schema import add_missing_columns, add_missing_indexes
+from shared.compression import init_compression
+from shared.json_provider import init_json
+from shared.profiling import init_profiling
+from shared.metrics import init_metrics
+from shared.auth import role_required  # Re-exported for code importing it from the auth service
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, unset_jwt_cookies
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
+init_compression(app)
+init_json(app)
+init_profiling(app, "auth")
+init_metrics(app, engine)
 
 Base.metadata.create_all(bind=engine)
+# Add the columns and indexes introduced since the tables were created
+add_missing_columns(engine)
+add_missing_indexes(engine)
 
 # Configure JWT
 app.config['JWT_SECRET_KEY'] = 'secret-key'
@@ -89,7 +101,8 @@ def login():
             return jsonify({"error": "Missing username or password"}), 400
 
         user = db_session.query(Customer).filter(Customer.username == username).first()
-        if not user:
+        # Accounts being deleted can no longer log in
+        if not user or user.deleted_at is not None:
             return jsonify({"error": "Invalid username or password"}), 401
 
         try:
@@ -134,40 +147,6 @@ def health_check():
     """
     return jsonify({"status": "healthy"}), 200
 
-def role_required(allowed_roles):
-    """
-    Restrict access to specific roles.
-
-    Parameters:
-        allowed_roles (list): A list of roles that are allowed to access the decorated route.
-
-    Returns:
-        - 403 Forbidden: If the user's role is not allowed.
-        - 500 Internal Server Error: If an error occurs during role validation.
-    """
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            try:
-                identity = json.loads(get_jwt_identity())
-
-                if "role" not in identity:
-                    return jsonify({"error": "'role' key missing in JWT identity"}), 400
-                
-                user_role = identity.get("role")
-
-                if not user_role:
-                    return jsonify({"error": "Missing role in JWT identity"}), 403
-
-                if user_role not in allowed_roles:
-                    return jsonify({"error": "Permission denied: Insufficient role"}), 403
-
-                return func(*args, **kwargs)
-            except Exception as e:
-                return jsonify({"error": f"Role validation failed: {str(e)}"}), 500
-        return wrapper
-    return decorator
-
 if __name__ == '__main__':
     create_default_admin()
     app.run(host="0.0.0.0", port=3004)
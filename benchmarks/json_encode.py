@@ -0,0 +1,102 @@
+"""
+Compare JSON encoding time of Flask's default provider and the shared fast provider.
+
+The payloads mirror the largest responses of the services: the full catalog, the customer list,
+and review lists with `created_at` datetimes.
+
+Usage:
+    python -m benchmarks.json_encode [--size 10000] [--repeat 20]
+"""
+import argparse
+import json as stdlib_json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from shared.json_provider import FastJSONProvider, orjson
+
+
+def build_payloads(size):
+    """
+    Build the benchmark payloads.
+
+    Parameters:
+        size (int): The number of entries in each list.
+
+    Returns:
+        dict: Maps a payload name to the object to encode.
+    """
+    created_at = datetime(2024, 11, 1, 12, 0, tzinfo=timezone.utc)
+    return {
+        "catalog": [{"name": f"Item {index}", "price": 10.0 + index % 100} for index in range(size)],
+        "customers": [
+            {
+                'id': index,
+                'fullname': f"Customer {index}",
+                'username': f"customer{index}",
+                'age': 20 + index % 50,
+                'address': f"{index} Main Street",
+                'gender': "other",
+                'marital_status': "single",
+                'wallet': 100.0 + index,
+                'role': "customer"
+            }
+            for index in range(size)
+        ],
+        "product_reviews": [
+            {
+                'id': index,
+                'customer_id': index % 1000,
+                'rating': 1 + index % 5,
+                'comment': "Works as described, would buy again.",
+                'status': "approved",
+                'created_at': created_at + timedelta(minutes=index),
+            }
+            for index in range(size)
+        ],
+    }
+
+
+def run(size, repeat):
+    """
+    Time both providers on every payload.
+
+    Parameters:
+        size (int): The number of entries in each list.
+        repeat (int): The number of encodings timed per payload and provider.
+
+    Returns:
+        dict: Per payload, the mean encoding time in milliseconds of each provider and the speedup.
+    """
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+
+    results = {}
+    for name, payload in build_payloads(size).items():
+        default_ms = min(timeit.repeat(lambda: default_provider.dumps(payload), number=1, repeat=repeat)) * 1000
+        fast_ms = min(timeit.repeat(lambda: fast_provider.dumps(payload), number=1, repeat=repeat)) * 1000
+        results[name] = {
+            "default_ms": round(default_ms, 3),
+            "fast_ms": round(fast_ms, 3),
+            "speedup": round(default_ms / fast_ms, 2) if fast_ms else None,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000, help="entries per payload")
+    parser.add_argument("--repeat", type=int, default=20, help="timed encodings per payload")
+    args = parser.parse_args()
+
+    report = {
+        "encoder": "orjson" if orjson is not None else "json",
+        "size": args.size,
+        "results": run(args.size, args.repeat),
+    }
+    print(stdlib_json.dumps(report, indent=2))
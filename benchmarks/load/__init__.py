@@ -0,0 +1,10 @@
+"""
+Offline load tests of the service endpoints.
+
+Every app is imported in one process against a throwaway database seeded with customers, items,
+orders and reviews. Calls to other services are replaced through the `app.config` hooks, and
+requests go through Flask test clients, so no network or container is needed.
+
+Usage:
+    python -m benchmarks.load [--services sales,reviews] [--concurrency 8] [--duration 5]
+"""
@@ -0,0 +1,331 @@
+"""
+Closed-loop load test of the service endpoints.
+
+Each endpoint is loaded on its own: `--concurrency` threads each send a request through their own
+Flask test client, wait for the response and send the next one, for `--duration` seconds after a
+warmup. The apps share a throwaway SQLite database seeded by `benchmarks.load.seed`, or the
+database of `--database-url` (e.g. a local MySQL), which is dropped and recreated. Calls to other
+services are replaced through the `app.config` hooks by functions answering from the seeded data
+after `--upstream-latency` milliseconds.
+
+Usage:
+    python -m benchmarks.load [--services sales,reviews] [--endpoints purchase,search] [--concurrency 8]
+                              [--duration 5] [--warmup 1] [--upstream-latency 0] [--database-url URL]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from benchmarks.load.seed import CATEGORIES, PASSWORD, WORDS, seed
+
+SERVICES = ("auth", "customers", "inventory", "sales", "reviews")
+
+# Per service, the endpoints loaded: (name, method, role of the caller, request builder). The
+# builder gets a random generator and the seeded data and returns the path, the JSON body and the
+# username of the caller for "customer" requests.
+SCENARIOS = {
+    "auth": [
+        ("login", "POST", None, lambda rng, data: ("/login", {"username": rng.choice(data["usernames"]), "password": PASSWORD}, None)),
+    ],
+    "customers": [
+        ("get_customer", "GET", "admin", lambda rng, data: (f"/customers/{rng.choice(data['usernames'])}", None, None)),
+        ("customer_orders", "GET", "admin", lambda rng, data: (f"/customers/{rng.choice(data['usernames'])}/orders", None, None)),
+    ],
+    "inventory": [
+        ("add_stock", "POST", "admin", lambda rng, data: (f"/inventory/{rng.choice(data['item_ids'])}/stock/add", {"quantity": 1}, None)),
+    ],
+    "sales": [
+        ("list_inventory", "GET", "customer", lambda rng, data: ("/inventory", None, None)),
+        ("get_item", "GET", "customer", lambda rng, data: (f"/inventory/{rng.choice(data['item_ids'])}", None, None)),
+        ("search", "GET", "customer", lambda rng, data: (f"/inventory/search?q={rng.choice(WORDS)}", None, None)),
+        ("browse", "GET", "customer", lambda rng, data: (f"/inventory/browse?category={rng.choice(CATEGORIES)}", None, None)),
+        ("bestsellers", "GET", "customer", lambda rng, data: ("/leaderboards/bestsellers", None, None)),
+        ("purchase", "POST", "customer", lambda rng, data: (f"/purchase/{rng.choice(data['item_ids'])}", {"quantity": 1}, rng.choice(data["usernames"]))),
+        ("purchase_async", "POST", "customer", lambda rng, data: (f"/purchase/async/{rng.choice(data['item_ids'])}", {"quantity": 1}, rng.choice(data["usernames"]))),
+    ],
+    "reviews": [
+        ("product_reviews", "GET", "customer", lambda rng, data: (f"/reviews/product/{rng.choice(data['item_ids'])}", None, None)),
+        ("submit_review", "POST", "customer", lambda rng, data: (
+            f"/reviews/{rng.choice(data['item_ids'])}",
+            {"rating": rng.randint(1, 5), "comment": " ".join(rng.choices(WORDS, k=8))},
+            rng.choice(data["usernames"]),
+        )),
+        ("review_queue", "GET", "admin", lambda rng, data: ("/reviews/queue?status=approved&limit=50", None, None)),
+    ],
+}
+
+
+def percentile(ordered, fraction):
+    """
+    Read a percentile from sorted samples, with the nearest-rank method.
+
+    Parameters:
+        ordered (list): The samples, sorted.
+        fraction (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The sample at that rank, or None without samples.
+    """
+    if not ordered:
+        return None
+    return ordered[max(int(round(fraction * len(ordered))) - 1, 0)]
+
+
+def summarize(latencies, statuses, elapsed):
+    """
+    Summarize the requests sent to one endpoint.
+
+    Parameters:
+        latencies (list): The latency of every request, in seconds.
+        statuses (dict): Maps each response status code to its count.
+        elapsed (float): The measured duration, in seconds.
+
+    Returns:
+        dict: The requests sent, the errors (5xx responses and exceptions), the throughput and the
+              p50, p95, p99 and maximum latencies in milliseconds.
+    """
+    ordered = sorted(latencies)
+
+    def milliseconds(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "requests": len(ordered),
+        "errors": sum(count for status, count in statuses.items() if status == "exception" or status >= 500),
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=lambda pair: str(pair[0]))},
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": milliseconds(percentile(ordered, 0.50)),
+        "p95_ms": milliseconds(percentile(ordered, 0.95)),
+        "p99_ms": milliseconds(percentile(ordered, 0.99)),
+        "max_ms": milliseconds(ordered[-1] if ordered else None),
+    }
+
+
+def load_endpoint(app, method, role, build, data, tokens, concurrency, duration, warmup):
+    """
+    Load one endpoint with a closed loop of concurrent clients.
+
+    Parameters:
+        app (Flask): The app serving the endpoint.
+        method (str): The HTTP method.
+        role (str): "admin", "customer" or None for unauthenticated requests.
+        build (function): Builds the path, body and caller of a request, see SCENARIOS.
+        data (dict): The seeded data.
+        tokens (dict): Maps "admin" and every seeded username to an access token.
+        concurrency (int): The number of clients, each with one request in flight.
+        duration (float): Seconds measured after the warmup.
+        warmup (float): Seconds of requests sent before measuring.
+
+    Returns:
+        dict: The summary of the measured requests, see `summarize`.
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(concurrency + 1)
+    window = {}
+
+    def client_loop(index):
+        client = app.test_client()
+        rng = random.Random(index)
+        local_latencies = []
+        local_statuses = {}
+        barrier.wait()
+        start, stop = window["start"], window["stop"]
+        while True:
+            path, body, username = build(rng, data)
+            if role == "admin":
+                token = tokens["admin"]
+            elif role == "customer":
+                token = tokens[username or rng.choice(data["usernames"])]
+            else:
+                token = None
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+            sent = time.perf_counter()
+            if sent >= stop:
+                break
+            try:
+                response = client.open(path, method=method, json=body, headers=headers)
+                status = response.status_code
+                response.close()
+            except Exception:
+                status = "exception"
+            received = time.perf_counter()
+            if sent >= start:
+                local_latencies.append(received - sent)
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client_loop, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    window["start"] = time.perf_counter() + warmup
+    window["stop"] = window["start"] + duration
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, statuses, duration)
+
+
+def configure_apps(apps, data, upstream_latency):
+    """
+    Replace the calls to other services and the background workers of the apps.
+
+    Parameters:
+        apps (dict): Maps a service to its Flask app.
+        data (dict): The seeded data.
+        upstream_latency (float): Seconds every replaced call waits, standing for the network.
+    """
+    def wait():
+        if upstream_latency:
+            time.sleep(upstream_latency)
+
+    def get_customer_data(username, headers):
+        wait()
+        return {"id": data["customers"][username], "username": username, "role": "customer", "wallet": 1e12}
+
+    def deduct_wallet(username, total_cost, headers):
+        wait()
+        return 0
+
+    def remove_stock(item_id, quantity, headers):
+        wait()
+        return 0
+
+    async def get_customer_data_async(username, headers):
+        import asyncio
+        if upstream_latency:
+            await asyncio.sleep(upstream_latency)
+        return {"id": data["customers"][username], "username": username, "role": "customer", "wallet": 1e12}
+
+    async def no_op_async(*args):
+        import asyncio
+        if upstream_latency:
+            await asyncio.sleep(upstream_latency)
+        return 0
+
+    for service, app in apps.items():
+        app.config['PURGE_IN_BACKGROUND'] = False
+        app.config['MODERATE_IN_BACKGROUND'] = False
+        if service in ("sales", "reviews"):
+            app.config['GET_CUSTOMER_DATA_FUNC'] = get_customer_data
+        if service == "sales":
+            app.config['REMOVE_STOCK_FUNC'] = remove_stock
+            app.config['DEDUCT_WALLET_FUNC'] = deduct_wallet
+            app.config['ASYNC_GET_CUSTOMER_DATA_FUNC'] = get_customer_data_async
+            app.config['ASYNC_REMOVE_STOCK_FUNC'] = no_op_async
+            app.config['ASYNC_DEDUCT_WALLET_FUNC'] = no_op_async
+
+
+def run(services, endpoints=None, concurrency=8, duration=5.0, warmup=1.0, upstream_latency=0.0,
+        database_url=None, seed_options=None):
+    """
+    Seed a database, boot the apps and load their endpoints one after the other.
+
+    Parameters:
+        services (list): The services to load, keys of SCENARIOS.
+        endpoints (list): The endpoint names to load, all endpoints of the services if None.
+        concurrency (int): The number of concurrent clients per endpoint.
+        duration (float): Seconds measured per endpoint.
+        warmup (float): Seconds of unmeasured requests per endpoint.
+        upstream_latency (float): Seconds every replaced call to another service waits.
+        database_url (str): The database to use. Its tables are dropped and recreated. A temporary
+                            SQLite file is used if None.
+        seed_options (dict): Passed to `seed`, e.g. the number of items.
+
+    Returns:
+        dict: The settings of the run and, per service and endpoint, the summary of its requests.
+    """
+    unknown = [service for service in services if service not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown services: {', '.join(unknown)}. Valid services are: {', '.join(SCENARIOS)}.")
+
+    database = None
+    if database_url is None:
+        database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        database_url = f"sqlite:///{database.name}"
+    # The apps create their engine when imported, so the database is chosen first
+    os.environ["DATABASE_URL"] = database_url
+
+    try:
+        import importlib
+        from flask_jwt_extended import create_access_token
+        from shared.database import SessionLocal, engine
+        from shared.models.base import Base
+
+        engine.echo = False
+        apps = {service: importlib.import_module(f"{service}.app").app for service in services}
+
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        db_session = SessionLocal()
+        try:
+            data = seed(db_session, **(seed_options or {}))
+        finally:
+            db_session.close()
+        data["usernames"] = sorted(data["customers"])
+        configure_apps(apps, data, upstream_latency)
+
+        # Every service shares the JWT secret, so one app signs the tokens of all of them
+        with next(iter(apps.values())).app_context():
+            tokens = {"admin": create_access_token(identity=json.dumps({"username": "loadadmin", "role": "admin"}))}
+            for username in data["usernames"]:
+                tokens[username] = create_access_token(identity=json.dumps({"username": username, "role": "customer"}))
+
+        results = {}
+        for service in services:
+            for name, method, role, build in SCENARIOS[service]:
+                if endpoints and name not in endpoints:
+                    continue
+                results.setdefault(service, {})[name] = load_endpoint(
+                    apps[service], method, role, build, data, tokens, concurrency, duration, warmup
+                )
+        return {
+            "database_url": database_url.split("@")[-1],
+            "concurrency": concurrency,
+            "duration_s": duration,
+            "upstream_latency_ms": upstream_latency * 1000,
+            "results": results,
+        }
+    finally:
+        if database is not None:
+            database.close()
+            os.unlink(database.name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--services", default=",".join(SERVICES), help="comma-separated services")
+    parser.add_argument("--endpoints", help="comma-separated endpoint names, all by default")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per endpoint")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds measured per endpoint")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of unmeasured requests per endpoint")
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="milliseconds every mocked upstream call waits")
+    parser.add_argument("--database-url", help="database to use, its tables are dropped; a temporary SQLite file by default")
+    parser.add_argument("--items", type=int, default=500, help="seeded inventory items")
+    parser.add_argument("--customers", type=int, default=200, help="seeded customers")
+    parser.add_argument("--reviews", type=int, default=5000, help="seeded reviews")
+    parser.add_argument("--orders", type=int, default=5000, help="seeded orders")
+    args = parser.parse_args()
+    print(json.dumps(run(
+        args.services.split(","),
+        endpoints=args.endpoints.split(",") if args.endpoints else None,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        warmup=args.warmup,
+        upstream_latency=args.upstream_latency / 1000,
+        database_url=args.database_url,
+        seed_options={"items": args.items, "customers": args.customers, "reviews": args.reviews, "orders": args.orders},
+    ), indent=2))
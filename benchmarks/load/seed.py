@@ -0,0 +1,85 @@
+import random
+
+from argon2 import PasswordHasher
+
+CATEGORIES = ("food", "clothes", "accessories", "electronics")
+WORDS = (
+    "classic", "wireless", "organic", "leather", "compact", "premium", "cotton", "steel", "portable",
+    "vintage", "smart", "travel", "kitchen", "outdoor", "sport", "mini", "deluxe", "eco",
+)
+PASSWORD = "loadtest"
+
+
+def seed(db_session, customers=200, items=500, reviews=5000, orders=5000, seed_value=1):
+    """
+    Fill an empty database with deterministic test data.
+
+    Every customer has the password `PASSWORD` and a wallet large enough for the whole run, and
+    every item a stock that purchases cannot exhaust. Derived tables (rating summaries, daily
+    statistics, revenue rollups) are rebuilt from the seeded rows.
+
+    Parameters:
+        db_session (Session): The session to seed with.
+        customers (int): The number of customers, plus one admin.
+        items (int): The number of inventory items.
+        reviews (int): The number of approved reviews.
+        orders (int): The number of past orders.
+        seed_value (int): The random seed.
+
+    Returns:
+        dict: The seeded `customers`, mapping usernames to IDs, and `item_ids`.
+    """
+    from shared.models.customer import Customer
+    from shared.models.inventory import InventoryItem
+    from shared.models.order import Order
+    from shared.models.review import Review
+    from shared.leaderboards import rebuild_daily_stats
+    from shared.ratings import rebuild_rating_summaries
+    from shared.revenue import rebuild_revenue_rollups
+
+    rng = random.Random(seed_value)
+    # Hashing is deliberately slow, every account shares one hash
+    password = PasswordHasher().hash(PASSWORD)
+
+    accounts = [Customer(
+        fullname="Load Admin", username="loadadmin", age=40, address="1 Admin Road", gender="other",
+        marital_status="single", password=password, role="admin", wallet=0.0,
+    )]
+    accounts += [
+        Customer(
+            fullname=f"Load Customer {index}", username=f"loaduser{index}", age=18 + index % 60,
+            address=f"{index} Load Street", gender=("male", "female", "other")[index % 3],
+            marital_status=("single", "married")[index % 2], password=password, role="customer", wallet=1e12,
+        )
+        for index in range(customers)
+    ]
+    catalog = [
+        InventoryItem(
+            name=" ".join(rng.sample(WORDS, 3)).title(), category=CATEGORIES[index % len(CATEGORIES)],
+            price_per_item=round(rng.uniform(1, 900), 2), description=" ".join(rng.choices(WORDS, k=12)),
+            stock_count=10 ** 9,
+        )
+        for index in range(items)
+    ]
+    db_session.add_all(accounts + catalog)
+    db_session.flush()
+
+    customer_ids = [account.id for account in accounts[1:]]
+    item_ids = [item.id for item in catalog]
+    prices = {item.id: item.price_per_item for item in catalog}
+    db_session.add_all(
+        Review(customer_id=rng.choice(customer_ids), item_id=rng.choice(item_ids), rating=rng.randint(1, 5),
+               comment="Seeded review " + " ".join(rng.choices(WORDS, k=6)), status="approved")
+        for _ in range(reviews)
+    )
+    for _ in range(orders):
+        item_id, quantity = rng.choice(item_ids), rng.randint(1, 3)
+        db_session.add(Order(customer_id=rng.choice(customer_ids), item_id=item_id, quantity=quantity,
+                             unit_price=prices[item_id], total_price=prices[item_id] * quantity))
+    db_session.flush()
+
+    rebuild_rating_summaries(db_session)
+    rebuild_daily_stats(db_session)
+    rebuild_revenue_rollups(db_session)
+    db_session.commit()
+    return {"customers": {account.username: account.id for account in accounts[1:]}, "item_ids": item_ids}
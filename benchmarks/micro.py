@@ -0,0 +1,297 @@
+"""
+Microbenchmarks of the per-request work that does not wait on I/O.
+
+Covers request validation (`validate_data` of customers, inventory items and reviews), the dicts
+built for every row of list endpoints, and the `role_required` check. Every case runs a fixed
+number of calls per timing, so results are comparable between runs, and reports the fastest of
+`--repeat` timings in nanoseconds per call.
+
+Each timing of a case is paired with a timing of a fixed reference loop taken right before it, and
+the case is expressed by the median of the ratios of the pairs. A pair runs under the same load,
+so the ratio cancels out most of the difference in speed between machines and between a loaded
+and an idle one, and the median ignores the pairs a load spike hit in between. These relative
+costs are compared with the baselines stored in `benchmarks/baselines/micro.json`. A case slower
+than its baseline by more than `--threshold` percent is timed again, and only reported as a
+regression, making the command exit with status 1, if the second timing is too slow as well.
+`--save` records the current relative costs as the baselines.
+
+The default threshold sits above the run-to-run spread measured on a shared single-CPU machine,
+up to about 20%. Lower it on quieter machines to catch smaller regressions.
+
+Usage:
+    python -m benchmarks.micro [--repeat 21] [--threshold 30] [--cases customer_validate,review_to_dict_x100]
+                               [--save] [--baseline benchmarks/baselines/micro.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+
+CREATED_AT = datetime(2024, 11, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def reference():
+    # Plain dict and string work with no repo code, the unit relative costs are measured in
+    keys = ("id", "name", "status", "rating")
+    return lambda: {key: len(key) for key in keys}
+
+
+def customer_validate():
+    from shared.models.customer import Customer
+    data = {
+        "fullname": "Regular User", "username": "user1", "password": "password123", "age": 25,
+        "address": "456 User Ave", "gender": "female", "marital_status": "married",
+    }
+    return lambda: Customer.validate_data(data, "create")
+
+
+def customer_validate_edit():
+    from shared.models.customer import Customer
+    data = {"fullname": "Regular User", "age": 25, "address": "456 User Ave", "gender": "female", "marital_status": "married"}
+    return lambda: Customer.validate_data(data, "edit")
+
+
+def item_validate():
+    from shared.models.inventory import InventoryItem
+    data = {"name": "Laptop", "category": "electronics", "price_per_item": 999.99, "stock_count": 10, "description": "A fast laptop"}
+    return lambda: InventoryItem.validate_data(data)
+
+
+def review_validate():
+    from shared.models.review import Review
+    data = {"rating": 4, "comment": "Works as described, would buy again.", "status": "pending"}
+    return lambda: Review.validate_data(data)
+
+
+def customer_list():
+    from customers.app import customer_to_dict
+    from shared.models.customer import Customer
+    customers = [
+        Customer(id=index, fullname=f"Customer {index}", username=f"customer{index}", age=20 + index % 50,
+                 address=f"{index} Main Street", gender="other", marital_status="single", wallet=100.0 + index,
+                 role="customer", password="hash")
+        for index in range(100)
+    ]
+    return lambda: [customer_to_dict(customer) for customer in customers]
+
+
+def inventory_list():
+    from sales.app import inventory_entry
+    rows = [(f"Item {index}", 10.0 + index % 100, index % 7 or None, (index % 7) * 4) for index in range(100)]
+    return lambda: [inventory_entry(*row) for row in rows]
+
+
+def review_list():
+    from reviews.app import review_to_dict
+    from shared.models.review import Review
+    reviews = [
+        Review(id=index, customer_id=index % 10, item_id=index % 20, rating=1 + index % 5,
+               comment="Works as described, would buy again.", status="approved", created_at=CREATED_AT)
+        for index in range(100)
+    ]
+    return lambda: [review_to_dict(review) for review in reviews]
+
+
+def role_check():
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request
+    from shared.auth import role_required
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'secret-key'
+    JWTManager(app)
+    view = role_required(['admin', 'product_manager', 'customer'])(lambda: None)
+    with app.app_context():
+        token = create_access_token(identity=json.dumps({"username": "user1", "role": "customer"}))
+    context = app.test_request_context(headers={"Authorization": f"Bearer {token}"})
+    # The token is decoded once, as jwt_required does before the role check
+    context.push()
+    verify_jwt_in_request()
+    return view
+
+
+def jwt_and_role_check():
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+    from shared.auth import role_required
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'secret-key'
+    JWTManager(app)
+    view = jwt_required()(role_required(['admin', 'product_manager', 'customer'])(lambda: None))
+    with app.app_context():
+        token = create_access_token(identity=json.dumps({"username": "user1", "role": "customer"}))
+    context = app.test_request_context(headers={"Authorization": f"Bearer {token}"})
+    context.push()
+    return view
+
+
+# Per case: the calls per timing and the setup returning the function to call. Lists have 100 rows.
+CASES = {
+    "customer_validate": (20000, customer_validate),
+    "customer_validate_edit": (20000, customer_validate_edit),
+    "item_validate": (20000, item_validate),
+    "review_validate": (50000, review_validate),
+    "customer_to_dict_x100": (500, customer_list),
+    "inventory_entry_x100": (500, inventory_list),
+    "review_to_dict_x100": (500, review_list),
+    "role_required": (20000, role_check),
+    "jwt_required_role_required": (2000, jwt_and_role_check),
+}
+
+# Calls of the reference loop per timing
+REFERENCE_NUMBER = 50000
+
+
+def time_case(name, repeat):
+    """
+    Time one case and the reference loop, alternately.
+
+    Parameters:
+        name (str): The case, a key of CASES.
+        repeat (int): The number of timings of each.
+
+    Returns:
+        tuple: Nanoseconds per call of the case, the fastest timing, and its cost relative to one
+               reference call, the median of the ratios of the paired timings.
+    """
+    number, setup = CASES[name]
+    function = setup()
+    function()
+    timer = timeit.Timer(function)
+    # The reference is timed right before each timing of the case, under the same load
+    reference_timer = timeit.Timer(reference())
+
+    case_times, ratios = [], []
+    for _ in range(repeat):
+        reference_time = reference_timer.timeit(number=REFERENCE_NUMBER) / REFERENCE_NUMBER
+        case_time = timer.timeit(number=number) / number
+        case_times.append(case_time)
+        ratios.append(case_time / reference_time)
+    return min(case_times) * 1e9, statistics.median(ratios)
+
+
+def change_pct(relative, baseline):
+    return round((relative / baseline - 1) * 100, 1) if baseline else None
+
+
+def compare(results, baselines, threshold):
+    """
+    Compare timings with their baselines.
+
+    Parameters:
+        results (dict): Maps a case to its nanoseconds per call and relative cost.
+        baselines (dict): Maps a case to its baseline relative cost.
+        threshold (float): The slowdown, in percent, above which a case is slower than its baseline.
+
+    Returns:
+        dict: Per case, the timing, the relative cost, its baseline, the change in percent and
+              whether it regressed. Cases without a baseline have no change.
+    """
+    report = {}
+    for name, (ns, relative) in results.items():
+        baseline = baselines.get(name)
+        change = change_pct(relative, baseline)
+        report[name] = {
+            "ns_per_call": round(ns, 1),
+            "relative": round(relative, 2),
+            "baseline": baseline,
+            "change_pct": change,
+            "regressed": change is not None and change > threshold,
+        }
+    return report
+
+
+def confirm(report, baselines, threshold, repeat):
+    """
+    Time again the cases found slower than their baselines, keeping only the confirmed regressions.
+
+    Parameters:
+        report (dict): The comparison returned by `compare`, updated in place.
+        baselines (dict): Maps a case to its baseline relative cost.
+        threshold (float): The slowdown, in percent, above which a case regressed.
+        repeat (int): The number of timings of the first run, the second one takes twice as many.
+    """
+    for name, case in report.items():
+        if not case["regressed"]:
+            continue
+        _, relative = time_case(name, repeat * 2)
+        change = change_pct(relative, baselines[name])
+        case["recheck_change_pct"] = change
+        case["regressed"] = change > threshold
+
+
+def run(cases, repeat, threshold, baseline_path=BASELINE, save=False):
+    """
+    Time the cases and compare them with the stored baselines.
+
+    Parameters:
+        cases (list): The cases to run, keys of CASES.
+        repeat (int): The number of timings per case.
+        threshold (float): The slowdown, in percent, above which a case regressed.
+        baseline_path (str): The JSON file of the baselines.
+        save (bool): Whether to store the relative costs as the new baselines of the cases.
+
+    Returns:
+        dict: The threshold, the comparison of every case and the names of the regressed cases.
+    """
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown cases: {', '.join(unknown)}. Valid cases are: {', '.join(CASES)}.")
+
+    # List cases import the service apps, which connect to the database when imported
+    database = None
+    if "DATABASE_URL" not in os.environ:
+        database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        os.environ["DATABASE_URL"] = f"sqlite:///{database.name}"
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as baseline_file:
+            baselines = json.load(baseline_file)
+
+    try:
+        from shared.database import engine
+        engine.echo = False
+        results = {name: time_case(name, repeat) for name in cases}
+        report = compare(results, baselines, threshold)
+        if not save:
+            confirm(report, baselines, threshold, repeat)
+    finally:
+        if database is not None:
+            database.close()
+            os.unlink(database.name)
+
+    if save:
+        baselines.update({name: round(relative, 2) for name, (_, relative) in results.items()})
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(dict(sorted(baselines.items())), baseline_file, indent=2)
+            baseline_file.write("\n")
+
+    return {
+        "threshold_pct": threshold,
+        "results": report,
+        "regressions": [name for name, case in report.items() if case["regressed"]],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=21, help="paired timings per case, the median ratio is kept")
+    parser.add_argument("--threshold", type=float, default=30.0, help="slowdown in percent reported as a regression")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated cases")
+    parser.add_argument("--baseline", default=BASELINE, help="JSON file of the baselines")
+    parser.add_argument("--save", action="store_true", help="store the relative costs as the new baselines")
+    args = parser.parse_args()
+
+    outcome = run(args.cases.split(","), args.repeat, args.threshold, baseline_path=args.baseline, save=args.save)
+    print(json.dumps(outcome, indent=2))
+    sys.exit(1 if outcome["regressions"] and not args.save else 0)
@@ -0,0 +1,82 @@
+"""
+Compare review profanity checks of better_profanity and the compiled shared filter.
+
+Comments of increasing length are checked, clean ones (the common case, where better_profanity
+generates and compares word variants for every word) and ones ending with a censor word.
+
+Usage:
+    python -m benchmarks.profanity_filter [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.moderation import ProfanityFilter
+
+CLEAN_WORDS = (
+    "the quality is great and it arrived quickly, the seller answered every question about "
+    "sizing and the colour matches the pictures. would recommend to friends and family."
+).split()
+
+
+def build_comments():
+    """
+    Build the benchmark comments.
+
+    Returns:
+        dict: Maps a comment name to its text.
+    """
+    comments = {}
+    for length in (10, 100, 1000):
+        clean = " ".join(CLEAN_WORDS[index % len(CLEAN_WORDS)] for index in range(length))
+        comments[f"clean_{length}_words"] = clean
+        comments[f"profane_{length}_words"] = clean + " bull-sh1t"
+    return comments
+
+
+def run(repeat):
+    """
+    Time both filters on every comment.
+
+    Parameters:
+        repeat (int): The number of checks timed per comment and filter.
+
+    Returns:
+        dict: The build time of each filter in milliseconds and, per comment, the mean check time
+              in milliseconds of each filter and the speedup.
+    """
+    from better_profanity import Profanity
+    started = time.perf_counter()
+    profanity = Profanity()
+    reference_build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    compiled = ProfanityFilter()
+    compiled_build_ms = (time.perf_counter() - started) * 1000
+
+    results = {}
+    for name, comment in build_comments().items():
+        assert profanity.contains_profanity(comment) == compiled.contains_profanity(comment), name
+        reference_ms = min(timeit.repeat(lambda: profanity.contains_profanity(comment), number=1, repeat=repeat)) * 1000
+        compiled_ms = min(timeit.repeat(lambda: compiled.contains_profanity(comment), number=1, repeat=repeat)) * 1000
+        results[name] = {
+            "better_profanity_ms": round(reference_ms, 3),
+            "compiled_ms": round(compiled_ms, 3),
+            "speedup": round(reference_ms / compiled_ms, 1) if compiled_ms else None,
+        }
+    return {
+        "build_ms": {"better_profanity": round(reference_build_ms, 1), "compiled": round(compiled_build_ms, 1)},
+        "automaton_states": compiled.state_count,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timed checks per comment")
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
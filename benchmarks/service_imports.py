@@ -0,0 +1,101 @@
+"""
+Measure what importing the auth service app costs every other service.
+
+Each service is imported in a fresh interpreter, then `auth.app` is imported on top of it, which
+is what the services did to get `role_required` before it moved to `shared.auth`. The second
+import only pays for what the auth app adds to a service: its Flask app, JWT manager, password
+hasher and `create_all` call.
+
+Usage:
+    python -m benchmarks.service_imports [--repeat 5] [--services customers,inventory,sales,reviews]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+MEASURE = """
+import importlib, json, resource, sys, time, tracemalloc
+sys.path.insert(0, {root!r})
+
+def measure(module):
+    before = tracemalloc.get_traced_memory()[0] if {trace_memory} else 0
+    started = time.perf_counter()
+    importlib.import_module(module)
+    elapsed = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[0] - before if {trace_memory} else 0
+    return {{"ms": elapsed * 1000, "allocated_kb": allocated / 1024, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}
+
+if {trace_memory}:
+    tracemalloc.start()
+service = measure({service!r})
+auth = measure("auth.app")
+print(json.dumps({{"service": service, "auth": auth}}))
+"""
+
+
+def measure_service(service, trace_memory, environment):
+    """
+    Import a service and then the auth app in a fresh interpreter.
+
+    Parameters:
+        service (str): The service package, e.g. "sales".
+        trace_memory (bool): Whether to trace allocations, which slows imports down.
+        environment (dict): The environment of the interpreter.
+
+    Returns:
+        dict: The import time, allocations and peak RSS after each import.
+    """
+    code = MEASURE.format(root=ROOT, service=f"{service}.app", trace_memory=trace_memory)
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=environment, cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(services, repeat):
+    """
+    Measure every service.
+
+    Parameters:
+        services (list): The service packages to import.
+        repeat (int): The number of timed imports per service, the fastest one is reported.
+
+    Returns:
+        dict: Per service, the import time of the service and the time, allocations and resident
+              memory that importing `auth.app` adds to it.
+    """
+    environment = dict(os.environ)
+    database = None
+    if "DATABASE_URL" not in environment:
+        database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        environment["DATABASE_URL"] = f"sqlite:///{database.name}"
+
+    try:
+        results = {}
+        for service in services:
+            timings = [measure_service(service, False, environment) for _ in range(repeat)]
+            memory = measure_service(service, True, environment)
+            results[service] = {
+                "service_import_ms": round(min(timing["service"]["ms"] for timing in timings), 1),
+                "auth_app_import_ms": round(min(timing["auth"]["ms"] for timing in timings), 1),
+                "auth_app_allocated_kb": round(memory["auth"]["allocated_kb"], 1),
+                "auth_app_rss_kb": max(timings[0]["auth"]["max_rss_kb"] - timings[0]["service"]["max_rss_kb"], 0),
+            }
+        return {"database_url": environment["DATABASE_URL"].split("@")[-1], "results": results}
+    finally:
+        if database is not None:
+            database.close()
+            os.unlink(database.name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timed imports per service")
+    parser.add_argument("--services", default="customers,inventory,sales,reviews", help="comma-separated services")
+    args = parser.parse_args()
+    print(json.dumps(run(args.services.split(","), args.repeat), indent=2))
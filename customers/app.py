@@ -1,8 +1,8 @@
-from flask import Flask, json, request, jsonify
+from flask import Flask, json, request, jsonify, current_app
 from flask_cors import CORS
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from auth.app import role_required
+from shared.auth import role_required
 from shared.models.base import Base
 from shared.models.customer import Customer
 from shared.models.review import Review
@@ -10,20 +10,116 @@ from shared.models.inventory import InventoryItem
 from shared.models.order import Order
 from shared.models.wishlist import Wishlist
 from shared.database import engine, SessionLocal
+from shared.schema import add_missing_columns, add_missing_indexes
+from shared.compression import init_compression
+from shared.json_provider import init_json
+from shared.profiling import init_profiling
+from shared.metrics import init_metrics, track_cache
+from shared.cache import VersionedCache
+from shared.responses import cached_json_response
+from shared.versioning import VersionTracker, bump_version, customer_version_name
+from shared.purge import PURGE_PLANS, Purger, purge_job_to_dict, schedule_purge
+from shared.models.purge_job import PurgeJob
 from sqlalchemy.sql import text
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 import json
+from datetime import datetime, timezone
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
+init_compression(app)
+init_json(app)
+init_profiling(app, "customers")
+init_metrics(app, engine)
 app.config['JWT_SECRET_KEY'] = 'secret-key'
 jwt = JWTManager(app)
 ph = PasswordHasher()
 
 # Create tables if not created
 Base.metadata.create_all(bind=engine)
+# Add the columns and indexes introduced since the tables were created
+add_missing_columns(engine)
+add_missing_indexes(engine)
+
+# Customer profiles are cached per username and rebuilt when the profile version changes. They
+# hold the wallet balance, so a changed profile is rebuilt before it is served, never served stale.
+customer_versions = VersionTracker()
+customer_cache = VersionedCache(customer_versions, stale_ok=False)
+track_cache("customers", customer_cache)
+
+def load_customer_profile(username):
+    """
+    Load the profile of a customer.
+
+    Parameters:
+        username (str): The username of the customer.
+
+    Returns:
+        dict: The customer profile, or None if the customer does not exist.
+    """
+    db_session = SessionLocal()
+    try:
+        customer = find_active_customer(db_session, username)
+        if not customer:
+            return None
+        return {
+            'id': customer.id,
+            'fullname': customer.fullname,
+            'username': customer.username,
+            'age': customer.age,
+            'address': customer.address,
+            'gender': customer.gender,
+            'marital_status': customer.marital_status,
+            'wallet': customer.wallet
+        }
+    finally:
+        db_session.close()
+
+def find_active_customer(db_session, username):
+    """
+    Find a customer whose account is not being deleted.
+
+    Parameters:
+        db_session (Session): The session to read with.
+        username (str): The username of the customer.
+
+    Returns:
+        Customer: The customer, or None if it does not exist or was deleted.
+    """
+    return db_session.query(Customer).filter(Customer.username == username, Customer.deleted_at.is_(None)).first()
+
+def customer_to_dict(customer):
+    """
+    Render a customer for the customer list.
+
+    Parameters:
+        customer (Customer): The customer.
+
+    Returns:
+        dict: The customer details, with their role.
+    """
+    return {
+        'id': customer.id,
+        'fullname': customer.fullname,
+        'username': customer.username,
+        'age': customer.age,
+        'address': customer.address,
+        'gender': customer.gender,
+        'marital_status': customer.marital_status,
+        'wallet': customer.wallet,
+        "role" : customer.role
+    }
+
+def forget_customer_profile(username):
+    """
+    Drop the cached profile of a customer after a committed change.
+
+    Parameters:
+        username (str): The username of the customer.
+    """
+    customer_cache.changed(f'customers:{username}', customer_version_name(username))
 
 @app.route('/customers', methods=['GET'])
 @jwt_required()
@@ -45,21 +141,8 @@ def get_customers():
     """
     db_session = SessionLocal()
     try:
-        customers = db_session.query(Customer).all()
-        customers_list = [
-            {
-                'id': customer.id,
-                'fullname': customer.fullname,
-                'username': customer.username,
-                'age': customer.age,
-                'address': customer.address,
-                'gender': customer.gender,
-                'marital_status': customer.marital_status,
-                'wallet': customer.wallet,
-                "role" : customer.role
-            }
-            for customer in customers
-        ]
+        customers = db_session.query(Customer).filter(Customer.deleted_at.is_(None)).all()
+        customers_list = [customer_to_dict(customer) for customer in customers]
         return jsonify(customers_list), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -85,40 +168,29 @@ def get_customer_by_username(username):
           - `customer`: Can access only their own data.
           - `product_manager`: Can access any customer's data.
 
+    **Caching**:
+        - Served from the profile cache with a strong `ETag`. A matching `If-None-Match` gets
+          304 Not Modified.
+
     **Returns**:
         - 200 OK: A JSON object containing the customer's details.
+        - 304 Not Modified: If the client already has the current profile.
         - 400 Bad Request: If a non-admin user tries to access another customer's data.
         - 404 Not Found: If the customer with the specified username does not exist.
         - 500 Internal Server Error: If an error occurs during database access.
     """
-    db_session = SessionLocal()
     try:
         user = json.loads(get_jwt_identity()) 
 
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
         
-        customer = db_session.query(Customer).filter_by(username=username).first()
-        if not customer:
+        entry = customer_cache.get(f'customers:{username}', customer_version_name(username), lambda: load_customer_profile(username))
+        if entry is None:
             return jsonify({'error': 'Customer not found'}), 404
-
-        customer_data = {
-            'id': customer.id,
-            'fullname': customer.fullname,
-            'username': customer.username,
-            'age': customer.age,
-            'address': customer.address,
-            'gender': customer.gender,
-            'marital_status': customer.marital_status,
-            'wallet': customer.wallet
-        }
-        return jsonify(customer_data), 200
+        return cached_json_response(entry)
     except Exception as e:
-        print(e)
-        print("hello")
         return jsonify({'error': str(e)}), 500
-    finally:
-        db_session.close()
 
 @app.route('/customers', methods=['POST'])
 def add_customer():
@@ -221,7 +293,7 @@ def update_customer(username):
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
         
-        customer = db_session.query(Customer).filter_by(username=username).first()
+        customer = find_active_customer(db_session, username)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
@@ -233,7 +305,9 @@ def update_customer(username):
             if hasattr(customer, key):
                 setattr(customer, key, value)
 
+        bump_version(db_session, customer_version_name(username))
         db_session.commit()
+        forget_customer_profile(username)
         return jsonify({'message': f'Customer {username} updated successfully'}), 200
     except Exception as e:
         db_session.rollback()
@@ -277,7 +351,7 @@ def change_password(username):
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
         
-        customer = db_session.query(Customer).filter_by(username=username).first()
+        customer = find_active_customer(db_session, username)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
 
@@ -297,6 +371,19 @@ def change_password(username):
     finally:
         db_session.close()
 
+# Deleted accounts are marked right away and their data is purged in the background, in chunks
+purger = Purger({"customer": PURGE_PLANS["customer"]}, on_purged=lambda kind, target_id, username: forget_customer_profile(username))
+app.config['PURGER'] = purger
+app.config['PURGE_IN_BACKGROUND'] = True
+
+@app.before_request
+def start_purger():
+    """
+    Start the purge worker of this process on its first request.
+    """
+    if current_app.config['PURGE_IN_BACKGROUND']:
+        current_app.config['PURGER'].start()
+
 @app.route('/customers/<string:username>', methods=['DELETE'])
 @jwt_required()
 @role_required(['admin', 'customer', 'product_manager'])
@@ -304,6 +391,10 @@ def delete_customer(username):
     """
     Delete a customer by username and all entries related to it.
 
+    The account is marked as deleted, which disables its login and hides it from every customer
+    endpoint at once. Its orders, reviews and wishlist are then purged in the background, in small
+    transactions, before the customer row itself is deleted.
+
     Endpoint:
         DELETE /customers/<string:username>
 
@@ -316,7 +407,8 @@ def delete_customer(username):
         "admin" or "customer" roles.
 
     Returns:
-        - 200 OK: If the customer is successfully deleted.
+        - 202 Accepted: If the customer is marked as deleted. Includes the purge job to follow with
+          GET /customers/purge-jobs/<job_id>.
         - 400 Bad Request: If a non-admin user attempts to delete another user's account.
         - 404 Not Found: If the customer with the specified username does not exist.
         - 500 Internal Server Error: If an exception occurs during the deletion process.
@@ -328,23 +420,55 @@ def delete_customer(username):
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
         
-        customer = db_session.query(Customer).filter_by(username=username).first()
+        customer = find_active_customer(db_session, username)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
-        
-        db_session.query(Order).filter_by(customer_id=customer.id).delete()
-        db_session.query(Review).filter_by(customer_id=customer.id).delete()
-        db_session.query(Wishlist).filter_by(customer_id=customer.id).delete()
 
-        db_session.delete(customer)
+        customer.deleted_at = datetime.now(timezone.utc)
+        job = schedule_purge(db_session, "customer", customer.id, label=username)
+        bump_version(db_session, customer_version_name(username))
         db_session.commit()
-        return jsonify({'message': f'Customer {username} deleted successfully'}), 200
+        forget_customer_profile(username)
+        return jsonify({'message': f'Customer {username} deleted successfully', 'job': purge_job_to_dict(job)}), 202
     except Exception as e:
         db_session.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         db_session.close()
 
+@app.route('/customers/purge-jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'customer', 'product_manager'])
+def get_purge_job(job_id):
+    """
+    Report the progress of the purge of a deleted customer.
+
+    Endpoint:
+        GET /customers/purge-jobs/<int:job_id>
+
+    Decorators:
+        @jwt_required() - Ensures the user is authenticated using a JWT token.
+        @role_required(['admin', 'customer', 'product_manager']) - Customers only see the job of
+        their own account.
+
+    Returns:
+        - 200 OK: The job with its `status` ("pending", "running" or "done"), current `step` and
+          `rows_deleted` so far.
+        - 404 Not Found: If the job does not exist or belongs to another customer.
+        - 500 Internal Server Error: If an exception occurs.
+    """
+    db_session = SessionLocal()
+    try:
+        user = json.loads(get_jwt_identity())
+        job = db_session.query(PurgeJob).filter_by(id=job_id, kind="customer").first()
+        if not job or ('admin' not in user['role'] and user['username'] != job.label):
+            return jsonify({'error': 'Purge job not found'}), 404
+        return jsonify(purge_job_to_dict(job)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        db_session.close()
+
 @app.route('/customers/<string:username>/wallet/add', methods=['POST'])
 @jwt_required()
 @role_required(['admin', 'customer', 'product_manager'])
@@ -386,12 +510,14 @@ def add_customer_wallet(username):
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
         
-        customer = db_session.query(Customer).filter_by(username=username).first()
+        customer = find_active_customer(db_session, username)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
 
         customer.wallet += amount
+        bump_version(db_session, customer_version_name(username))
         db_session.commit()
+        forget_customer_profile(username)
         return jsonify({'message': f'Added ${amount} to {username}\'s wallet', 'new_balance': customer.wallet}), 200
     except Exception as e:
         db_session.rollback()
@@ -440,7 +566,7 @@ def deduct_customer_wallet(username):
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
 
-        customer = db_session.query(Customer).filter_by(username=username).first()
+        customer = find_active_customer(db_session, username)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
 
@@ -448,7 +574,9 @@ def deduct_customer_wallet(username):
             return jsonify({'error': 'Insufficient balance'}), 400
 
         customer.wallet -= amount
+        bump_version(db_session, customer_version_name(username))
         db_session.commit()
+        forget_customer_profile(username)
         return jsonify({'message': f'Deducted ${amount} from {username}\'s wallet', 'new_balance': customer.wallet}), 200
     except Exception as e:
         db_session.rollback()
@@ -487,7 +615,7 @@ def get_customer_orders(username):
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
 
-        customer = db_session.query(Customer).filter_by(username=username).first()
+        customer = find_active_customer(db_session, username)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
 
@@ -538,19 +666,22 @@ def get_customer_wishlist(username):
         if 'admin' not in user['role'] and user['username'] != username:
             return jsonify({'error': 'Invalid user'}), 400
 
-        customer = db_session.query(Customer).filter_by(username=username).first()
+        customer = find_active_customer(db_session, username)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
-        wishlist = customer.wishlist_items  
+        # Items marked as deleted stay in wishlists until they are purged, they are not listed
+        wishlist = db_session.query(Wishlist.wishlist_id, Wishlist.item_id, InventoryItem.name, InventoryItem.price_per_item).join(
+            InventoryItem, InventoryItem.id == Wishlist.item_id
+        ).filter(Wishlist.customer_id == customer.id, InventoryItem.deleted_at.is_(None)).order_by(Wishlist.wishlist_id).all()
         wishlist_items = [
             {
-                'wishlist_id': item.wishlist_id,
-                'item_id': item.item_id,
-                'item_name': item.inventory_item.name,  
-                'item_price': item.inventory_item.price_per_item  
+                'wishlist_id': wishlist_id,
+                'item_id': item_id,
+                'item_name': name,
+                'item_price': price_per_item
             }
-            for item in wishlist
+            for wishlist_id, item_id, name, price_per_item in wishlist
         ]
 
         return jsonify({'wishlist': wishlist_items}), 200
@@ -24,6 +24,8 @@ def app():
     # Create the database and the database tables
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    # Deleted accounts are purged explicitly by the tests
+    flask_app.config['PURGE_IN_BACKGROUND'] = False
     yield flask_app
     # Teardown: Drop all tables
     Base.metadata.drop_all(bind=engine)
@@ -301,13 +303,22 @@ def test_delete_customer(client, db_session, get_auth_token):
         '/customers/user1',
         headers={'Authorization': f'Bearer {get_auth_token["user"]}'}
     )
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.get_json()
     assert data['message'] == 'Customer user1 deleted successfully'
+    assert data['job']['status'] == 'pending'
+
+    # The account is hidden at once and deleted by the purge
+    response = client.get('/customers/user1', headers={'Authorization': f'Bearer {get_auth_token["admin"]}'})
+    assert response.status_code == 404
+    flask_app.config['PURGER'].run_once()
 
     # Verify deletion in DB
     customer = db_session.query(Customer).filter_by(username='user1').first()
     assert customer is None
+    response = client.get(f'/customers/purge-jobs/{data["job"]["job_id"]}', headers={'Authorization': f'Bearer {get_auth_token["user"]}'})
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'done'
 
 # Test: Delete customer (No User)
 def test_delete_customer_no_user(client, db_session, get_auth_token):
@@ -445,4 +456,171 @@ def test_get_wishlist(client, db_session, get_auth_token):
     data = response.get_json()
     assert 'wishlist' in data
     assert len(data['wishlist']) == 1
-    assert data['wishlist'][0]['item_id'] == 1
\ No newline at end of file
+    assert data['wishlist'][0]['item_id'] == 1
+
+def test_get_wishlist_hides_deleted_items(client, db_session, get_auth_token):
+    from datetime import datetime, timezone
+
+    item = InventoryItem(name="Retired Item", category="Electronics", price_per_item=3.0, stock_count=1)
+    db_session.add(item)
+    db_session.commit()
+    db_session.add(Wishlist(customer_id=1, item_id=item.id))
+    db_session.commit()
+
+    def listed_item_ids():
+        response = client.get('/customers/admin/wishlist', headers={'Authorization': f'Bearer {get_auth_token["admin"]}'})
+        assert response.status_code == 200
+        return [entry['item_id'] for entry in response.get_json()['wishlist']]
+
+    assert item.id in listed_item_ids()
+
+    # Marked as deleted, the item is hidden before the purge removes the wishlist row
+    item.deleted_at = datetime.now(timezone.utc)
+    db_session.commit()
+    assert item.id not in listed_item_ids()
+    assert db_session.query(Wishlist).filter_by(customer_id=1, item_id=item.id).count() == 1
+
+# Test: Conditional GET of a customer profile
+def test_get_customer_etag(client, db_session, get_auth_token):
+    response = client.get(
+        '/customers/user1',
+        headers={'Authorization': f'Bearer {get_auth_token["user"]}'}
+    )
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get(
+        '/customers/user1',
+        headers={'Authorization': f'Bearer {get_auth_token["user"]}', 'If-None-Match': etag}
+    )
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+    # A wallet change produces a new version of the profile
+    client.post(
+        '/customers/user1/wallet/add',
+        headers={'Authorization': f'Bearer {get_auth_token["user"]}'},
+        json={'amount': 10}
+    )
+    response = client.get(
+        '/customers/user1',
+        headers={'Authorization': f'Bearer {get_auth_token["user"]}', 'If-None-Match': etag}
+    )
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+# Test: A profile changed by another worker is rebuilt before it is served, never served stale
+def test_get_customer_not_served_stale(client, db_session, get_auth_token):
+    from customers.app import customer_cache, customer_versions
+    from shared.versioning import bump_version, customer_version_name
+
+    def wallet():
+        response = client.get('/customers/user1', headers={'Authorization': f'Bearer {get_auth_token["user"]}'})
+        assert response.status_code == 200
+        return response.get_json()['wallet']
+
+    before = wallet()
+    customer = db_session.query(Customer).filter_by(username='user1').first()
+    customer.wallet = before + 25
+    bump_version(db_session, customer_version_name('user1'))
+    db_session.commit()
+    # The version tracker of this worker picks up the new version
+    customer_versions.forget(customer_version_name('user1'))
+
+    stale_hits = customer_cache.stale_hits
+    assert wallet() == before + 25
+    assert customer_cache.stale_hits == stale_hits
+
+# Test: Large lists are gzip-compressed when the client accepts it
+def test_get_customers_compressed(client, db_session, get_auth_token):
+    import gzip
+
+    extra_customers = [
+        Customer(
+            fullname=f"Bulk User {index}",
+            username=f"bulkuser{index}",
+            age=30,
+            address=f"{index} Bulk Street",
+            gender="other",
+            marital_status="single",
+            password="not-a-real-hash",
+            role="customer",
+            wallet=0.0
+        )
+        for index in range(20)
+    ]
+    db_session.add_all(extra_customers)
+    db_session.commit()
+
+    try:
+        plain = client.get('/customers', headers={'Authorization': f'Bearer {get_auth_token["admin"]}'})
+        assert plain.status_code == 200
+        assert 'Content-Encoding' not in plain.headers
+
+        response = client.get(
+            '/customers',
+            headers={'Authorization': f'Bearer {get_auth_token["admin"]}', 'Accept-Encoding': 'gzip, deflate'}
+        )
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert len(response.data) < len(plain.data)
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+    finally:
+        for customer in extra_customers:
+            db_session.delete(customer)
+        db_session.commit()
+
+def test_delete_customer_purges_in_chunks(client, db_session, get_auth_token):
+    from shared.purge import PURGE_PLANS, Purger
+
+    customer = Customer(fullname="Busy Buyer", username="busybuyer", age=40, address="1 Market St", gender="other",
+                        marital_status="single", password=ph.hash("buyerpass"), role="customer", wallet=0.0)
+    item = db_session.query(InventoryItem).filter_by(name="Purge Item").first() or InventoryItem(
+        name="Purge Item", category="Electronics", price_per_item=5.0, stock_count=10)
+    db_session.add_all([customer, item])
+    db_session.commit()
+    db_session.add_all([Order(customer_id=customer.id, item_id=item.id, quantity=1) for _ in range(5)])
+    db_session.add_all([Review(customer_id=customer.id, item_id=item.id, rating=4, comment='Fine', status='flagged') for _ in range(3)])
+    db_session.add(Wishlist(customer_id=customer.id, item_id=item.id))
+    db_session.commit()
+    customer_id = customer.id
+
+    response = client.delete('/customers/busybuyer', headers={'Authorization': f'Bearer {get_auth_token["admin"]}'})
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['job_id']
+    assert client.delete('/customers/busybuyer', headers={'Authorization': f'Bearer {get_auth_token["admin"]}'}).status_code == 404
+
+    purger = Purger(PURGE_PLANS, chunk_size=2)
+    chunks = []
+    while True:
+        deleted = purger.run_chunk(job_id)
+        if not deleted:
+            break
+        chunks.append(deleted)
+    assert chunks == [2, 2, 1, 2, 1, 1]
+
+    job = client.get(f'/customers/purge-jobs/{job_id}', headers={'Authorization': f'Bearer {get_auth_token["admin"]}'}).get_json()
+    assert job['status'] == 'done'
+    assert job['rows_deleted'] == 9
+    assert db_session.query(Customer).filter_by(id=customer_id).first() is None
+    assert db_session.query(Order).filter_by(customer_id=customer_id).count() == 0
+    assert purger.run_chunk(job_id) == 0
+
+def test_add_missing_columns_upgrades_existing_table(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+    from shared.schema import add_missing_columns
+
+    # A customers table created before accounts could be marked as deleted
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as connection:
+        connection.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, username VARCHAR(50))"))
+        connection.execute(text("INSERT INTO customers (id, username) VALUES (1, 'legacy')"))
+
+    assert add_missing_columns(old_engine, [Customer.__table__.c.deleted_at]) == ["customers.deleted_at"]
+    assert "deleted_at" in {column["name"] for column in inspect(old_engine).get_columns("customers")}
+    with old_engine.connect() as connection:
+        assert connection.execute(text("SELECT deleted_at FROM customers WHERE id = 1")).scalar() is None
+    assert add_missing_columns(old_engine, [Customer.__table__.c.deleted_at]) == []
+    old_engine.dispose()
@@ -1,8 +1,8 @@
-from flask import Flask, json, request, jsonify
+from flask import Flask, json, request, jsonify, current_app
 from flask_cors import CORS
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from auth.app import role_required
+from shared.auth import role_required
 from shared.models.base import Base
 from shared.models.customer import Customer
 from shared.models.review import Review
@@ -11,17 +11,51 @@ from shared.models.order import Order
 from shared.models.wishlist import Wishlist
 from sqlalchemy.sql import text
 from shared.database import engine, SessionLocal
+from shared.schema import add_missing_columns, add_missing_indexes
+from shared.compression import init_compression
+from shared.json_provider import init_json
+from shared.profiling import init_profiling
+from shared.metrics import init_metrics
+from shared.versioning import CATALOG_VERSION, bump_version, item_version_name, review_version_name
+from shared.catalog_feed import record_item_change
+from shared.purge import PURGE_PLANS, Purger, purge_job_to_dict, schedule_purge
+from shared.models.purge_job import PurgeJob
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 import json
+from datetime import datetime, timezone
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
+init_compression(app)
+init_json(app)
+init_profiling(app, "inventory")
+init_metrics(app, engine)
 app.config['JWT_SECRET_KEY'] = 'secret-key'
 jwt = JWTManager(app)
 
 #Base.metadata.drop_all(bind=engine)
 # Create tables if not created
 Base.metadata.create_all(bind=engine)
+# Add the columns and indexes introduced since the tables were created
+add_missing_columns(engine)
+add_missing_indexes(engine)
+
+def catalog_changed(db_session, item_id, listing=True):
+    """
+    Record an item change for the services caching or indexing the catalog.
+
+    Runs in the caller's transaction: bumps the version of the item and, when fields shown in
+    catalog listings changed, the catalog version, then appends the item to the catalog change log.
+
+    Parameters:
+        db_session (Session): The session holding the item change.
+        item_id (int): The ID of the added, updated or deleted item.
+        listing (bool): False when only the stock count changed.
+    """
+    if listing:
+        bump_version(db_session, CATALOG_VERSION)
+    bump_version(db_session, item_version_name(item_id))
+    record_item_change(db_session, item_id)
 
 @app.route('/inventory', methods=['POST'])
 @jwt_required()
@@ -62,6 +96,8 @@ def add_item():
 
         new_item = InventoryItem(**data)
         db_session.add(new_item)
+        db_session.flush()
+        catalog_changed(db_session, new_item.id)
         db_session.commit()
 
         return jsonify({'message': 'Good added successfully', 'item_id': new_item.id}), 201
@@ -106,7 +142,7 @@ def update_item(item_id):
     data = request.json
     db_session = SessionLocal()
     try:     
-        item = db_session.query(InventoryItem).filter_by(id=item_id).first()
+        item = db_session.query(InventoryItem).filter_by(id=item_id, deleted_at=None).first()
         if not item:
             return jsonify({'error': 'Item not found'}), 404
         
@@ -115,9 +151,10 @@ def update_item(item_id):
             return jsonify({'error': message}), 400
 
         for key, value in data.items():
-            if hasattr(item, key):
+            if hasattr(item, key) and key != 'deleted_at':
                 setattr(item, key, value)
 
+        catalog_changed(db_session, item_id)
         db_session.commit()
         return jsonify({'message': f'Item {item_id} updated successfully'}), 200
     except Exception as e:
@@ -126,6 +163,19 @@ def update_item(item_id):
     finally:
         db_session.close()
 
+# Deleted items are hidden at once and their orders and reviews are purged in the background, in chunks
+purger = Purger({"item": PURGE_PLANS["item"]})
+app.config['PURGER'] = purger
+app.config['PURGE_IN_BACKGROUND'] = True
+
+@app.before_request
+def start_purger():
+    """
+    Start the purge worker of this process on its first request.
+    """
+    if current_app.config['PURGE_IN_BACKGROUND']:
+        current_app.config['PURGER'].start()
+
 @app.route('/inventory/<int:item_id>', methods=['DELETE'])
 @jwt_required()
 @role_required(['admin', 'product_manager'])
@@ -133,6 +183,10 @@ def delete_item(item_id):
     """
     Delete an inventory item and its associated data.
 
+    The item is marked as deleted, which hides it from the catalog, searches and purchases at once.
+    Its orders, reviews, wishlist entries and statistics are then purged in the background, in
+    small transactions that do not block purchases, before the item row itself is deleted.
+
     Endpoint:
         DELETE /inventory/<int:item_id>
 
@@ -145,31 +199,63 @@ def delete_item(item_id):
         "admin" or "product_manager" roles.
 
     Returns:
-        - 200 OK: If the item and its associated data are successfully deleted. 
+        - 202 Accepted: If the item is marked as deleted. Includes the purge job to follow with
+          GET /inventory/purge-jobs/<job_id>.
         - 404 Not Found: If the item with the specified ID does not exist.
         - 500 Internal Server Error: If an exception occurs during the process.
     """
     db_session = SessionLocal()
     try:
-        item = db_session.query(InventoryItem).filter_by(id=item_id).first()
+        item = db_session.query(InventoryItem).filter_by(id=item_id, deleted_at=None).first()
 
         if not item:
             return jsonify({'error': 'Item not found'}), 404
-        
-        db_session.query(Order).filter_by(item_id=item.id).delete()
-        db_session.query(Review).filter_by(item_id=item.id).delete()
-        db_session.query(Wishlist).filter_by(item_id=item.id).delete()
 
-        db_session.delete(item)
+        item.deleted_at = datetime.now(timezone.utc)
+        job = schedule_purge(db_session, "item", item_id, label=item.name)
+        catalog_changed(db_session, item_id)
+        bump_version(db_session, review_version_name(item_id))
         db_session.commit()
 
-        return jsonify({'message': f'Item {item_id} deleted successfully'}), 200
+        return jsonify({'message': f'Item {item_id} deleted successfully', 'job': purge_job_to_dict(job)}), 202
     except Exception as e:
         db_session.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         db_session.close()
 
+@app.route('/inventory/purge-jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'product_manager'])
+def get_purge_job(job_id):
+    """
+    Report the progress of the purge of a deleted item.
+
+    Endpoint:
+        GET /inventory/purge-jobs/<int:job_id>
+
+    Decorators:
+        @jwt_required() - Ensures the user is authenticated using a JWT token.
+        @role_required(['admin', 'product_manager']) - Restricts access to users with 
+        "admin" or "product_manager" roles.
+
+    Returns:
+        - 200 OK: The job with its `status` ("pending", "running" or "done"), current `step` and
+          `rows_deleted` so far.
+        - 404 Not Found: If the job does not exist.
+        - 500 Internal Server Error: If an exception occurs.
+    """
+    db_session = SessionLocal()
+    try:
+        job = db_session.query(PurgeJob).filter_by(id=job_id, kind="item").first()
+        if not job:
+            return jsonify({'error': 'Purge job not found'}), 404
+        return jsonify(purge_job_to_dict(job)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        db_session.close()
+
 @app.route('/inventory/<int:item_id>/stock/remove', methods=['POST'])
 @jwt_required()
 @role_required(['admin', 'product_manager','customer'])
@@ -206,7 +292,7 @@ def deduct_item(item_id):
     db_session = SessionLocal()
 
     try:
-        item = db_session.query(InventoryItem).filter_by(id=item_id).first()
+        item = db_session.query(InventoryItem).filter_by(id=item_id, deleted_at=None).first()
         if not item:
             return jsonify({'error': 'Item not found'}), 404
 
@@ -214,6 +300,7 @@ def deduct_item(item_id):
             return jsonify({'error': 'Not enough stock available'}), 400
 
         item.stock_count -= quantity
+        catalog_changed(db_session, item_id, listing=False)
         db_session.commit()
 
         return jsonify({'message': f'{quantity} items deducted from stock', 'new_stock': item.stock_count}), 200
@@ -260,12 +347,13 @@ def add_stock(item_id):
     db_session = SessionLocal()
 
     try:
-        item = db_session.query(InventoryItem).filter_by(id=item_id).first()
+        item = db_session.query(InventoryItem).filter_by(id=item_id, deleted_at=None).first()
 
         if not item:
             return jsonify({'error': 'Item not found'}), 404
 
         item.stock_count += quantity
+        catalog_changed(db_session, item_id, listing=False)
         db_session.commit()
 
         return jsonify({'message': f'Successfully added {quantity} items to stock', 'new_stock': item.stock_count}), 200
@@ -24,6 +24,8 @@ def app():
     # Create the database and the database tables
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    # Deleted items are purged explicitly by the tests
+    flask_app.config['PURGE_IN_BACKGROUND'] = False
     yield flask_app
     # Teardown: Drop all tables
     Base.metadata.drop_all(bind=engine)
@@ -293,9 +295,10 @@ def test_delete_item(client, db_session, get_auth_tokens):
         f'/inventory/{1}',
         headers={'Authorization': f'Bearer {get_auth_tokens["admin"]}'}
     )
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.get_json()
     assert data['message'] == f'Item {1} deleted successfully'
+    flask_app.config['PURGER'].run_once()
 
     # Verify deletion in DB
     item = db_session.query(InventoryItem).filter_by(id=1).first()
@@ -415,4 +418,125 @@ def test_add_stock_bad_amount(client, db_session, get_auth_tokens):
     )
     assert response.status_code == 400
     data = response.get_json()
-    assert data['error'] == 'Invalid quantity. Must be a positive integer.'
\ No newline at end of file
+    assert data['error'] == 'Invalid quantity. Must be a positive integer.'
+# Test: Catalog changes bump the version counters read by the sales catalog cache
+def test_catalog_version_bumped(client, db_session, get_auth_tokens, add_inventory_item):
+    from shared.models.data_version import DataVersion
+    from shared.versioning import CATALOG_VERSION, item_version_name
+
+    def version(name):
+        db_session.expire_all()
+        row = db_session.query(DataVersion).filter_by(name=name).first()
+        return row.version if row else 0
+
+    catalog_before = version(CATALOG_VERSION)
+    item_before = version(item_version_name(add_inventory_item.id))
+
+    response = client.post(
+        f'/inventory/{add_inventory_item.id}/stock/add',
+        headers={'Authorization': f'Bearer {get_auth_tokens["admin"]}'},
+        json={'quantity': 5}
+    )
+    assert response.status_code == 200
+    assert version(item_version_name(add_inventory_item.id)) == item_before + 1
+    assert version(CATALOG_VERSION) == catalog_before
+
+    response = client.put(
+        f'/inventory/{add_inventory_item.id}',
+        headers={'Authorization': f'Bearer {get_auth_tokens["admin"]}'},
+        json={
+            'name': 'Green Apple',
+            'category': 'food',
+            'price_per_item': 45.0,
+            'stock_count': 10
+        }
+    )
+    assert response.status_code == 200
+    assert version(item_version_name(add_inventory_item.id)) == item_before + 2
+    assert version(CATALOG_VERSION) == catalog_before + 1
+
+
+def test_item_changes_logged(client, db_session, get_auth_tokens, add_inventory_item):
+    """
+    Test that item changes are appended to the catalog change log.
+    """
+    from shared.models.catalog_change import CatalogChange
+
+    def logged_changes():
+        db_session.expire_all()
+        return [change.item_id for change in db_session.query(CatalogChange).order_by(CatalogChange.id).all()]
+
+    before = logged_changes()
+    response = client.post(
+        f'/inventory/{add_inventory_item.id}/stock/add',
+        headers={'Authorization': f'Bearer {get_auth_tokens["admin"]}'},
+        json={'quantity': 1}
+    )
+    assert response.status_code == 200
+    assert logged_changes() == before + [add_inventory_item.id]
+
+
+def test_delete_item_tombstone_and_purge(client, db_session, get_auth_tokens, add_inventory_item):
+    """
+    Test that a deleted item is hidden at once and its orders and reviews are purged in chunks.
+    """
+    from shared.purge import PURGE_PLANS, Purger
+    from shared.models.rating_summary import ItemRatingSummary
+    from shared.models.purge_job import PurgeJob
+
+    customer = Customer(fullname="Apple Fan", username="applefan", age=30, address="1 Orchard Rd", gender="other",
+                        marital_status="single", password=ph.hash("applepass"), role="customer", wallet=0.0)
+    db_session.add(customer)
+    db_session.commit()
+    item_id = add_inventory_item.id
+    db_session.add_all([Order(customer_id=customer.id, item_id=item_id, quantity=1) for _ in range(3)])
+    db_session.add_all([Review(customer_id=customer.id, item_id=item_id, rating=5, comment='Tasty', status='flagged') for _ in range(2)])
+    db_session.add(ItemRatingSummary(item_id=item_id, review_count=0, rating_sum=0, rating_1=0, rating_2=0, rating_3=0, rating_4=0, rating_5=0))
+    db_session.commit()
+
+    headers = {'Authorization': f'Bearer {get_auth_tokens["admin"]}'}
+    response = client.delete(f'/inventory/{item_id}', headers=headers)
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['job_id']
+
+    # The tombstoned item is gone for the catalog but its data is still there
+    assert client.put(f'/inventory/{item_id}', headers=headers, json={'name': 'Red Apple', 'category': 'food', 'price_per_item': 1.0, 'stock_count': 1}).status_code == 404
+    assert client.delete(f'/inventory/{item_id}', headers=headers).status_code == 404
+    assert db_session.query(Order).filter_by(item_id=item_id).count() == 3
+
+    purger = Purger({"item": PURGE_PLANS["item"]}, chunk_size=2)
+    chunks = []
+    while True:
+        deleted = purger.run_chunk(job_id)
+        if not deleted:
+            break
+        chunks.append(deleted)
+    assert chunks == [2, 1, 2]
+
+    job = client.get(f'/inventory/purge-jobs/{job_id}', headers=headers).get_json()
+    assert job['status'] == 'done'
+    assert job['rows_deleted'] == 5
+    db_session.expire_all()
+    assert db_session.query(InventoryItem).filter_by(id=item_id).first() is None
+    assert db_session.query(ItemRatingSummary).filter_by(item_id=item_id).first() is None
+    assert db_session.query(PurgeJob).filter_by(id=job_id).one().finished_at is not None
+
+def test_add_missing_indexes_creates_catalog_index(tmp_path):
+    """
+    Inventory tables created before the catalog browsing index get it at startup.
+    """
+    from sqlalchemy import create_engine, inspect, text
+    from shared.schema import add_missing_indexes
+
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE inventory_item (id INTEGER PRIMARY KEY, name VARCHAR(100), category VARCHAR(20), "
+            "price_per_item FLOAT, description TEXT, stock_count INTEGER)"
+        ))
+
+    assert add_missing_indexes(old_engine) == ["ix_inventory_item_category_price"]
+    indexes = {index["name"]: index["column_names"] for index in inspect(old_engine).get_indexes("inventory_item")}
+    assert indexes["ix_inventory_item_category_price"] == ["category", "price_per_item"]
+    assert add_missing_indexes(old_engine) == []
+    old_engine.dispose()
@@ -2,20 +2,41 @@ from flask import Flask, json, request, jsonify, current_app
 from flask_cors import CORS
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from auth.app import role_required
+from shared.auth import role_required
 from shared.models.base import Base
 from shared.models.customer import Customer
 from shared.models.review import Review
 from shared.models.inventory import InventoryItem
+from shared.models.wishlist import Wishlist
 from shared.database import engine, SessionLocal
-from sqlalchemy.sql import text
+from shared.schema import add_missing_columns, add_missing_indexes
+from shared.backfill import run_backfills
+from shared.compression import init_compression
+from shared.json_provider import init_json
+from shared.profiling import init_profiling
+from shared.metrics import init_metrics, metrics, track_cache
+from shared.health import HealthMonitor, check_database, http_probe
+from shared.item_index import ItemIndex
+from shared.cache import VersionedCache
+from shared.responses import cached_json_response
+from shared.versioning import VersionTracker, bump_version, review_version_name
+from shared.ratings import apply_bulk_rating_change, apply_rating_change
+from shared.resilience import UpstreamUnavailableError, get_upstream
+from shared.moderation import ProfanityFilter
+from shared.review_moderation import PENDING, ReviewModerator, check_links, check_repetition, check_shouting, profanity_check
+from sqlalchemy import and_, delete, func, or_, select, update
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 import json
-from better_profanity import profanity
+import base64
 import requests
+from datetime import datetime
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
+init_compression(app)
+init_json(app)
+init_profiling(app, "reviews")
+init_metrics(app, engine)
 app.config['JWT_SECRET_KEY'] = 'secret-key'
 jwt = JWTManager(app)
 
@@ -39,32 +60,124 @@ def get_customer_details(username,headers):
         raise Exception('Unexpected content type: JSON expected')
     return response.json()
 
+# Item existence is answered from an in-memory index of the inventory table
+item_index = ItemIndex()
+
 def get_item_exists(item_id,headers):
     """
-    Retrieve item data from the inventory service.
+    Check whether an inventory item exists.
+
+    Reviews shares the inventory table, so the check is answered from a local bitset of item IDs,
+    refreshed incrementally from the database, instead of an HTTP call to the sales service.
 
     Parameters:
-        username (str): The username of the customer whose details are to be retrieved.
-        headers (dict): A dictionary of HTTP headers to include in the request. Typically includes 
-                        authentication headers.
+        item_id (int): The ID of the inventory item to look up.
+        headers (dict): Unused, kept so the function matches the `GET_ITEM_EXISTS_FUNC` signature.
 
     Returns:
-        dict: A JSON object containing customer details if the request is successful.
-        rasies an exception
-
+        bool: True if the item exists, False otherwise.
     """
-    response = requests.get(f'http://sales-service:3003/inventory/{item_id}', timeout=5, headers=headers)
-    response.raise_for_status()
-    if response.headers.get('Content-Type') != 'application/json':
-        raise Exception('Unexpected content type: JSON expected')
-    return True
+    return item_index.exists(item_id)
+
+# Calls to each upstream service go through its circuit breaker and concurrent call limit
+customer_service = get_upstream('customer-service')
 
-app.config['GET_CUSTOMER_DATA_FUNC'] = get_customer_details
+app.config['GET_CUSTOMER_DATA_FUNC'] = customer_service.wrap(get_customer_details)
 app.config['GET_ITEM_EXISTS_FUNC'] = get_item_exists
 
 #Base.metadata.drop_all(bind=engine)
 # Create tables if not created
 Base.metadata.create_all(bind=engine)
+# Add the columns and indexes introduced since the tables were created
+add_missing_columns(engine)
+add_missing_indexes(engine)
+# Fill the rating summaries of databases created before them
+run_backfills(["rating_summaries"])
+
+# Review lists are cached per product and rebuilt when the review version of the product changes
+review_versions = VersionTracker()
+review_cache = VersionedCache(review_versions)
+track_cache("reviews", review_cache)
+
+def load_product_reviews(item_id):
+    """
+    Load every review of a product.
+
+    Parameters:
+        item_id (int): The ID of the product.
+
+    Returns:
+        list: The reviews of the product, or None if it has no reviews.
+    """
+    db_session = SessionLocal()
+    try:
+        reviews = db_session.query(Review).filter_by(item_id=item_id).all()
+        if not reviews:
+            return None
+        return [
+            {
+                'id': review.id,
+                'customer_id': review.customer_id,
+                'rating': review.rating,
+                'comment': review.comment,
+                'status': review.status,
+                'created_at': review.created_at,
+            }
+            for review in reviews
+        ]
+    finally:
+        db_session.close()
+
+def review_to_dict(review):
+    """
+    Render a review with its author and product.
+
+    Parameters:
+        review (Review): The review.
+
+    Returns:
+        dict: The review details.
+    """
+    return {
+        'id': review.id,
+        'customer_id': review.customer_id,
+        'item_id': review.item_id,
+        'rating': review.rating,
+        'comment': review.comment,
+        'status': review.status,
+        'created_at': review.created_at,
+    }
+
+def reviews_changed(db_session, item_id):
+    """
+    Bump the review version of a product as part of the caller's transaction.
+
+    Parameters:
+        db_session (Session): The session holding the review change.
+        item_id (int): The ID of the reviewed product.
+    """
+    bump_version(db_session, review_version_name(item_id))
+
+def rating_state(review):
+    """
+    Capture what the rating summaries know of a review.
+
+    Parameters:
+        review (Review): The review.
+
+    Returns:
+        tuple: The (item_id, rating, status, created_at) of the review.
+    """
+    return (review.item_id, review.rating, review.status, review.created_at)
+
+def forget_product_reviews(item_id):
+    """
+    Drop the cached reviews of a product after a committed change.
+
+    Parameters:
+        item_id (int): The ID of the reviewed product.
+    """
+    review_cache.changed(f'reviews:product:{item_id}', review_version_name(item_id))
 
 # Get details of a specific review.
 @app.route('/reviews/<int:review_id>', methods=['GET'])
@@ -95,16 +208,7 @@ def get_review_details(review_id):
         if not review:
             return jsonify({'error': 'Review not found'}), 404
 
-        review_details = {
-            'id': review.id,
-            'customer_id': review.customer_id,
-            'item_id': review.item_id,
-            'rating': review.rating,
-            'comment': review.comment,
-            'status': review.status,
-            'created_at': review.created_at,
-        }
-        return jsonify(review_details), 200
+        return jsonify(review_to_dict(review)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -129,6 +233,7 @@ def get_customer_reviews():
         - 200 OK: JSON list of reviews submitted by the customer.
         - 404 Not Found: If the customer has no reviews.
         - 500 Internal Server Error: If an error occurs.
+        - 503 Service Unavailable: If an upstream service is unavailable or overloaded.
     """
     db_session = SessionLocal()
     try:
@@ -160,6 +265,8 @@ def get_customer_reviews():
             for review in reviews
         ]
         return jsonify(review_list), 200
+    except UpstreamUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -182,43 +289,71 @@ def get_product_reviews(item_id):
         @jwt_required() - Requires authentication via JWT.
         @role_required(['admin', 'product_manager', 'customer']) - Restricts access based on roles.
 
+    Caching:
+        The list is served from a per-product cache with a strong `ETag`. A matching
+        `If-None-Match` gets 304 Not Modified.
+
     Returns:
         - 200 OK: JSON list of reviews for the specified product.
+        - 304 Not Modified: If the client already has the current list.
         - 404 Not Found: If no reviews exist for the product.
         - 500 Internal Server Error: If an error occurs.
     """
-    db_session = SessionLocal()
     try:
-        user = json.loads(get_jwt_identity())
-
-        # Get customer details
-        jwt_token = create_access_token(identity=get_jwt_identity())
-        headers = {
-            'Authorization': f'Bearer {jwt_token}',
-            'Content-Type': 'application/json'
-        }
-        reviews = db_session.query(Review).filter_by(item_id=item_id).all()
-        if not reviews:
+        entry = review_cache.get(f'reviews:product:{item_id}', review_version_name(item_id), lambda: load_product_reviews(item_id))
+        if entry is None:
             return jsonify({'message': 'No reviews found for this product'}), 404
-
-        review_list = [
-            {
-                'id': review.id,
-                'customer_id': review.customer_id,
-                'rating': review.rating,
-                'comment': review.comment,
-                'status': review.status,
-                'created_at': review.created_at,
-            }
-            for review in reviews
-        ]
-        return jsonify(review_list), 200
+        return cached_json_response(entry)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        db_session.close()
 
-profanity.load_censor_words()
+# The censor word list is compiled once, so each comment is checked in a single pass
+profanity_filter = ProfanityFilter()
+
+def forget_moderated_reviews(item_ids):
+    """
+    Drop the cached reviews of the products whose reviews were moderated.
+
+    Parameters:
+        item_ids (set): The IDs of the products.
+    """
+    for item_id in item_ids:
+        forget_product_reviews(item_id)
+
+# New reviews are stored as pending and moderated in batches by background workers
+review_moderator = ReviewModerator(
+    checks=[profanity_check(profanity_filter), check_links, check_shouting, check_repetition],
+    on_moderated=forget_moderated_reviews,
+)
+app.config['REVIEW_MODERATOR'] = review_moderator
+app.config['MODERATE_IN_BACKGROUND'] = True
+
+def collect_moderation_backlog():
+    """
+    Report the moderation backlog in the metrics, so its growth can be alerted on.
+
+    Returns:
+        list: The pending reviews and the age of the oldest one as gauges, 0 when the queue is
+              empty, and the reviews moderated and flagged by this process as counters.
+    """
+    backlog = app.config['REVIEW_MODERATOR'].backlog()
+    return [
+        ("review_moderation_pending", "gauge", "Reviews waiting for moderation.", [((), backlog["pending"])]),
+        ("review_moderation_oldest_pending_seconds", "gauge", "Age of the oldest review waiting for moderation.",
+         [((), backlog["oldest_pending_seconds"] or 0.0)]),
+        ("review_moderation_moderated_total", "counter", "Reviews moderated by the background workers.", [((), backlog["moderated"])]),
+        ("review_moderation_flagged_total", "counter", "Reviews flagged by the background workers.", [((), backlog["flagged"])]),
+    ]
+
+metrics.register_collector("review_moderation", collect_moderation_backlog)
+
+@app.before_request
+def start_review_moderator():
+    """
+    Start the moderation workers of this process on its first request.
+    """
+    if current_app.config['MODERATE_IN_BACKGROUND']:
+        current_app.config['REVIEW_MODERATOR'].start()
 
 @app.route('/reviews/<int:item_id>', methods=['POST'])
 @jwt_required()
@@ -241,13 +376,16 @@ def submit_review(item_id):
         JSON object containing:
             - rating (int): Rating for the product (required).
             - comment (str): Optional comment for the review.
-            - status (str): Optional status of the review (default: "approved").
+
+    The review is stored as "pending" and returned right away. Background workers then approve or
+    flag it (spam, duplicate and profanity checks). Its rating counts once it is approved.
 
     Returns:
         - 201 Created: If the review is successfully submitted.
         - 404 Not Found: If item doesn't exist
         - 400 Bad Request: If validation fails.
         - 500 Internal Server Error: If an error occurs.
+        - 503 Service Unavailable: If an upstream service is unavailable or overloaded.
     """
     data = request.json
     db_session = SessionLocal()
@@ -277,8 +415,8 @@ def submit_review(item_id):
         if len(comment) > 500:
             return jsonify({'error': 'Comment exceeds maximum length of 500 characters.'}), 400
 
-        # Check for profanity using `better-profanity`
-        if comment and profanity.contains_profanity(comment):
+        # Check for profanity with the compiled censor word list of `better-profanity`
+        if comment and profanity_filter.contains_profanity(comment):
             return jsonify({'error': 'Inappropriate comment detected.'}), 400
 
         # Create and save the review
@@ -287,16 +425,23 @@ def submit_review(item_id):
             item_id=item_id,
             rating=data["rating"],
             comment=comment,
-            status=data.get("status", "approved").lower()
+            status=PENDING
         )
         db_session.add(new_review)
+        apply_rating_change(db_session, None, rating_state(new_review))
+        reviews_changed(db_session, item_id)
         db_session.commit()
+        forget_product_reviews(item_id)
 
         return jsonify({
             'message': 'Review submitted successfully',
-            'review_id': new_review.id
+            'review_id': new_review.id,
+            'status': PENDING
         }), 201
 
+    except UpstreamUnavailableError as e:
+        db_session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db_session.rollback()
         current_app.logger.error(f"Error in submit_review: {str(e)}")
@@ -304,6 +449,9 @@ def submit_review(item_id):
     finally:
         db_session.close()
         
+# Fields of a review that only admins can change
+AUTHOR_PROTECTED_FIELDS = {'id', 'item_id', 'customer_id', 'status', 'created_at', 'updated_at'}
+
 # Update an existing review.
 @app.route('/reviews/<int:review_id>', methods=['PUT'])
 @jwt_required()
@@ -325,14 +473,17 @@ def update_review(review_id):
     Request Body:
         JSON object containing:
             - rating (int): Updated rating for the product.
-            - comment (str): Updated comment for the review.
-            - status (str): Updated status of the review.
+            - comment (str): Updated comment for the review. An edited comment is moderated
+              again: the review goes back to "pending".
+            - status (str): Updated status of the review, admins only. Ignored for authors, as
+              are `id`, `item_id` and `customer_id`.
 
     Returns:
         - 200 OK: If the review is successfully updated.
         - 400 Bad Request: If validation fails or if the user is not authorized.
         - 404 Not Found: If the review does not exist.
         - 500 Internal Server Error: If an error occurs.
+        - 503 Service Unavailable: If an upstream service is unavailable or overloaded.
 
     """
     data = request.json
@@ -360,12 +511,28 @@ def update_review(review_id):
         if not is_valid:
             return jsonify({'error': message}), 400
 
+        before = rating_state(review)
+        is_admin = 'admin' in user['role']
+        comment_changed = 'comment' in data and data['comment'] != review.comment
         for key, value in data.items():
+            # Authors may only edit their rating and comment, moderation decides the status
+            if not is_admin and key in AUTHOR_PROTECTED_FIELDS:
+                continue
             if hasattr(review, key):
                 setattr(review, key, value)
+        if comment_changed and not (is_admin and 'status' in data):
+            # An edited comment is moderated again
+            review.status = PENDING
+        apply_rating_change(db_session, before, rating_state(review))
 
+        item_id = before[0]
+        reviews_changed(db_session, item_id)
         db_session.commit()
+        forget_product_reviews(item_id)
         return jsonify({'message': 'Review updated successfully'}), 200
+    except UpstreamUnavailableError as e:
+        db_session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db_session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -395,6 +562,7 @@ def delete_review(review_id):
         - 400 Bad Request: If the user is not authorized.
         - 404 Not Found: If the review does not exist.
         - 500 Internal Server Error: If an error occurs.
+        - 503 Service Unavailable: If an upstream service is unavailable or overloaded.
     """
     db_session = SessionLocal()
     try:
@@ -418,8 +586,15 @@ def delete_review(review_id):
             return jsonify({'error': 'Invalid user'}), 400
 
         db_session.delete(review)
+        apply_rating_change(db_session, rating_state(review), None)
+        item_id = review.item_id
+        reviews_changed(db_session, item_id)
         db_session.commit()
+        forget_product_reviews(item_id)
         return jsonify({'message': 'Review deleted successfully'}), 200
+    except UpstreamUnavailableError as e:
+        db_session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db_session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -455,8 +630,13 @@ def flag_review(review_id):
         if not review:
             return jsonify({'error': 'Review not found'}), 404
 
+        before = rating_state(review)
         review.status = 'flagged'
+        apply_rating_change(db_session, before, rating_state(review))
+        item_id = review.item_id
+        reviews_changed(db_session, item_id)
         db_session.commit()
+        forget_product_reviews(item_id)
         return jsonify({'message': f'Review {review_id} flagged successfully'}), 200
     except Exception as e:
         db_session.rollback()
@@ -493,8 +673,13 @@ def approve_review(review_id):
         if not review:
             return jsonify({'error': 'Review not found'}), 404
 
+        before = rating_state(review)
         review.status = 'approved'
+        apply_rating_change(db_session, before, rating_state(review))
+        item_id = review.item_id
+        reviews_changed(db_session, item_id)
         db_session.commit()
+        forget_product_reviews(item_id)
         return jsonify({'message': f'Review {review_id} approved successfully'}), 200
     except Exception as e:
         db_session.rollback()
@@ -502,57 +687,379 @@ def approve_review(review_id):
     finally:
         db_session.close()
 
-@app.route('/health', methods=['GET'])
-def health_check():
+# Bulk moderation selects reviews by ID list or by filter and changes them in chunks, one
+# transaction per chunk, so a broad filter never locks an unbounded number of rows at once
+MAX_BULK_IDS = 1000
+BULK_CHUNK_SIZE = 1000
+MAX_BULK_CHUNKS = 10
+BULK_FILTERS = {"item_id": Review.item_id, "customer_id": Review.customer_id, "status": Review.status}
+BULK_STATUSES = ("pending", "approved", "normal", "flagged")
+
+# The reviews an action still has to change, so repeated chunks make progress
+BULK_TARGET_STATUS = {"approve": "approved", "flag": "flagged"}
+
+def bulk_criteria(data):
     """
-    Health check endpoint.
+    Build the filter of a bulk moderation request.
+
+    Parameters:
+        data (dict): The request body, with either `ids` (a list of review IDs) or `filter` (an object
+                     with any of `item_id`, `customer_id` and `status`).
 
     Returns:
-        - 200 OK: If the service and all dependencies are operational.
-        - 500 Internal Server Error: If any dependency is not operational.
+        tuple: The list of SQLAlchemy filter expressions, and an error message (None if valid).
     """
-    db_status = "unknown"
-    customer_service_status = "unknown"
-    sales_service_status = "unknown"
+    if not isinstance(data, dict):
+        return None, "A JSON object with 'ids' or 'filter' is required."
+    if "ids" in data:
+        ids = data["ids"]
+        if not isinstance(ids, list) or not ids or not all(isinstance(review_id, int) and not isinstance(review_id, bool) for review_id in ids):
+            return None, "'ids' must be a non-empty list of review IDs."
+        if len(ids) > MAX_BULK_IDS:
+            return None, f"At most {MAX_BULK_IDS} review IDs can be changed at once, use a filter instead."
+        return [Review.id.in_(ids)], None
+    filters = data.get("filter")
+    if not isinstance(filters, dict) or not filters:
+        return None, "A JSON object with 'ids' or a non-empty 'filter' is required."
+    criteria = []
+    for field, value in filters.items():
+        if field not in BULK_FILTERS:
+            return None, f"Invalid filter '{field}'. Valid filters are: {', '.join(BULK_FILTERS)}."
+        if field == "status":
+            if value not in BULK_STATUSES:
+                return None, f"Invalid status filter. Valid statuses are: {', '.join(BULK_STATUSES)}."
+        elif not isinstance(value, int) or isinstance(value, bool):
+            return None, f"'{field}' filter must be an integer ID."
+        criteria.append(BULK_FILTERS[field] == value)
+    return criteria, None
+
+def apply_bulk_action(db_session, action, criteria, limit=MAX_BULK_IDS):
+    """
+    Approve, flag or delete one chunk of the reviews matching a filter, as part of the caller's transaction.
+
+    The chunk is read and locked with SELECT ... FOR UPDATE, then changed with one plain UPDATE or
+    DELETE on its IDs, which every database supports. The locked rows tell which reviews enter or
+    leave approval, they are added to or removed from the rating summaries.
+
+    Parameters:
+        db_session (Session): The session to run the change in.
+        action (str): "approve", "flag" or "delete".
+        criteria (list): The filter expressions selecting the reviews.
+        limit (int): The maximum number of reviews changed.
+
+    Returns:
+        tuple: The number of reviews changed, and the set of IDs of their items.
+    """
+    query = db_session.query(Review.id, Review.item_id, Review.rating, Review.created_at, Review.status).filter(*criteria)
+    if action in BULK_TARGET_STATUS:
+        query = query.filter(Review.status != BULK_TARGET_STATUS[action])
+    rows = query.order_by(Review.id).limit(limit).with_for_update().all()
+    if not rows:
+        return 0, set()
+
+    ids = [row[0] for row in rows]
+    was_approved = [(item_id, rating, created_at) for _, item_id, rating, created_at, status in rows if status == "approved"]
+    if action == "approve":
+        db_session.execute(update(Review).where(Review.id.in_(ids)).values(status="approved"), execution_options={"synchronize_session": False})
+        apply_bulk_rating_change(db_session, [(item_id, rating, created_at) for _, item_id, rating, created_at, _ in rows], 1)
+    elif action == "flag":
+        db_session.execute(update(Review).where(Review.id.in_(ids)).values(status="flagged"), execution_options={"synchronize_session": False})
+        apply_bulk_rating_change(db_session, was_approved, -1)
+    else:
+        db_session.execute(delete(Review).where(Review.id.in_(ids)), execution_options={"synchronize_session": False})
+        apply_bulk_rating_change(db_session, was_approved, -1)
+
+    item_ids = {row[1] for row in rows}
+    for item_id in item_ids:
+        reviews_changed(db_session, item_id)
+    return len(rows), item_ids
+
+def bulk_moderate(action):
+    """
+    Run a bulk moderation request.
+
+    The matching reviews are changed in chunks of BULK_CHUNK_SIZE, each committed on its own. At most
+    MAX_BULK_CHUNKS chunks run per request; `complete` is false when matching reviews are left, and
+    the same request can be sent again to continue.
+
+    Parameters:
+        action (str): "approve", "flag" or "delete".
 
-    # Check database connectivity
+    Returns:
+        tuple: The JSON response and its status code.
+    """
+    db_session = SessionLocal()
     try:
-        db_session = SessionLocal()
-        db_session.execute(text("SELECT 1"))
-        db_session.close()
-        db_status = "connected"
+        criteria, error = bulk_criteria(request.get_json(silent=True))
+        if error:
+            return jsonify({'error': error}), 400
+
+        affected, item_ids, complete = 0, set(), False
+        for _ in range(MAX_BULK_CHUNKS):
+            changed, changed_items = apply_bulk_action(db_session, action, criteria, BULK_CHUNK_SIZE)
+            db_session.commit()
+            forget_moderated_reviews(changed_items)
+            affected += changed
+            item_ids |= changed_items
+            if changed < BULK_CHUNK_SIZE:
+                complete = True
+                break
+        return jsonify({'action': action, 'affected': affected, 'item_ids': sorted(item_ids), 'complete': complete}), 200
     except Exception as e:
-        db_status = f"unavailable: {str(e)}"
+        db_session.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        db_session.close()
+
+@app.route('/reviews/bulk/approve', methods=['POST'])
+@jwt_required()
+@role_required(['admin', 'product_manager'])
+def bulk_approve_reviews():
+    """
+    Approve many reviews at once.
+
+    Endpoint:
+        POST /reviews/bulk/approve
+
+    Decorators:
+        @jwt_required() - Requires authentication via JWT.
+        @role_required(['admin', 'product_manager']) - Restricts access to admins and product managers.
+
+    Request Body:
+        JSON object containing either:
+            - ids (list): The IDs of the reviews, at most 1000.
+            - filter (dict): Any of `item_id`, `customer_id` and `status`, e.g. {"item_id": 4, "status": "pending"}.
+
+    Returns:
+        - 200 OK: The `affected` number of reviews, the `item_ids` of their products and whether the
+          change is `complete`; at most 10000 reviews are changed per request.
+        - 400 Bad Request: If neither a valid ID list nor a filter is given.
+        - 500 Internal Server Error: If an error occurs.
+    """
+    return bulk_moderate("approve")
+
+@app.route('/reviews/bulk/flag', methods=['POST'])
+@jwt_required()
+@role_required(['admin', 'product_manager'])
+def bulk_flag_reviews():
+    """
+    Flag many reviews at once.
+
+    Endpoint:
+        POST /reviews/bulk/flag
+
+    Decorators:
+        @jwt_required() - Requires authentication via JWT.
+        @role_required(['admin', 'product_manager']) - Restricts access to admins and product managers.
+
+    Request Body:
+        JSON object containing either `ids` or `filter`, as for POST /reviews/bulk/approve.
+
+    Returns:
+        - 200 OK: The `affected` number of reviews, the `item_ids` of their products and whether the
+          change is `complete`.
+        - 400 Bad Request: If neither a valid ID list nor a filter is given.
+        - 500 Internal Server Error: If an error occurs.
+    """
+    return bulk_moderate("flag")
+
+@app.route('/reviews/bulk/delete', methods=['POST'])
+@jwt_required()
+@role_required(['admin'])
+def bulk_delete_reviews():
+    """
+    Delete many reviews at once.
+
+    Endpoint:
+        POST /reviews/bulk/delete
+
+    Decorators:
+        @jwt_required() - Requires authentication via JWT.
+        @role_required(['admin']) - Restricts access to admins.
+
+    Request Body:
+        JSON object containing either `ids` or `filter`, as for POST /reviews/bulk/approve.
+
+    Returns:
+        - 200 OK: The `affected` number of reviews, the `item_ids` of their products and whether the
+          change is `complete`.
+        - 400 Bad Request: If neither a valid ID list nor a filter is given.
+        - 500 Internal Server Error: If an error occurs.
+    """
+    return bulk_moderate("delete")
+
+# The moderation queue is paged by (created_at, id) so each page is an index range scan
+QUEUE_STATUSES = ["pending", "approved", "normal", "flagged"]
+DEFAULT_QUEUE_LIMIT = 50
+MAX_QUEUE_LIMIT = 200
+
+def encode_queue_cursor(review):
+    """
+    Build the cursor pointing after a review of the moderation queue.
+
+    Parameters:
+        review (Review): The last review of a page.
+
+    Returns:
+        str: The opaque cursor.
+    """
+    position = json.dumps([review.created_at.isoformat(), review.id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+def decode_queue_cursor(cursor):
+    """
+    Read a moderation queue cursor.
+
+    Parameters:
+        cursor (str): The cursor returned with the previous page.
+
+    Returns:
+        tuple: The `created_at` and `id` of the last review of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        created_at, review_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(review_id)
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+@app.route('/reviews/queue', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'product_manager'])
+def get_review_queue():
+    """
+    List the reviews with a given status, oldest first, for moderators to work through.
 
-    # Check customer-service health
+    Endpoint:
+        GET /reviews/queue?status=flagged&limit=50&cursor=<next_cursor>
+
+    Decorators:
+        @jwt_required() - Requires authentication via JWT.
+        @role_required(['admin', 'product_manager']) - Restricts access to admins and product managers.
+
+    Query Parameters:
+        - status (str): The review status to list, e.g. "flagged" or "pending".
+        - limit (int): Reviews per page, 50 by default and at most 200.
+        - cursor (str): The `next_cursor` of the previous page, omitted for the first page.
+
+    Returns:
+        - 200 OK: The `reviews` of the page and the `next_cursor`, null on the last page.
+        - 400 Bad Request: If the status, limit or cursor is invalid.
+        - 500 Internal Server Error: If an error occurs.
+    """
+    db_session = SessionLocal()
     try:
-        response = requests.get('http://customer-service:3000/health', timeout=5)
-        if response.status_code == 200:
-            customer_service_status = "healthy"
-        else:
-            customer_service_status = f"unhealthy: {response.status_code}"
+        status = request.args.get('status', '').lower()
+        if status not in QUEUE_STATUSES:
+            return jsonify({'error': f"Invalid status. Valid options are: {', '.join(QUEUE_STATUSES)}."}), 400
+        limit = request.args.get('limit', DEFAULT_QUEUE_LIMIT, type=int)
+        if limit is None or not 1 <= limit <= MAX_QUEUE_LIMIT:
+            return jsonify({'error': f"'limit' must be an integer between 1 and {MAX_QUEUE_LIMIT}."}), 400
+
+        query = db_session.query(Review).filter(Review.status == status)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                after_created_at, after_id = decode_queue_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            # Compare with the stored timestamp of the last review when it still exists, so the
+            # position does not depend on how the database renders timestamps
+            stored_created_at = select(Review.created_at).where(Review.id == after_id).scalar_subquery()
+            after = func.coalesce(stored_created_at, after_created_at)
+            query = query.filter(or_(
+                Review.created_at > after,
+                and_(Review.created_at == after, Review.id > after_id),
+            ))
+
+        # One extra row tells whether another page follows
+        reviews = query.order_by(Review.created_at, Review.id).limit(limit + 1).all()
+        next_cursor = encode_queue_cursor(reviews[limit - 1]) if len(reviews) > limit else None
+        return jsonify({
+            'reviews': [review_to_dict(review) for review in reviews[:limit]],
+            'next_cursor': next_cursor,
+        }), 200
     except Exception as e:
-        customer_service_status = f"unavailable: {str(e)}"
+        return jsonify({'error': str(e)}), 500
+    finally:
+        db_session.close()
 
-    # Check sales-service health
+@app.route('/reviews/moderation/backlog', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'product_manager'])
+def get_moderation_backlog():
+    """
+    Report the moderation backlog.
+
+    Endpoint:
+        GET /reviews/moderation/backlog
+
+    Decorators:
+        @jwt_required() - Requires authentication via JWT.
+        @role_required(['admin', 'product_manager']) - Restricts access to admins and product managers.
+
+    Returns:
+        - 200 OK: The number of `pending` reviews, the age in seconds of the oldest one
+          (`oldest_pending_seconds`), and the reviews `moderated` and `flagged` by this process.
+        - 500 Internal Server Error: If an error occurs.
+    """
     try:
-        response = requests.get('http://sales-service:3003/health', timeout=5)
-        if response.status_code == 200:
-            sales_service_status = "healthy"
-        else:
-            sales_service_status = f"unhealthy: {response.status_code}"
+        return jsonify(current_app.config['REVIEW_MODERATOR'].backlog()), 200
     except Exception as e:
-        sales_service_status = f"unavailable: {str(e)}"
+        return jsonify({'error': str(e)}), 500
+
+# Dependencies are probed in the background so health requests only read cached results
+health_monitor = HealthMonitor(
+    probes={
+        "database": check_database,
+        "customer_service": http_probe('http://customer-service:3000/health'),
+    },
+    healthy_states={
+        "database": "connected",
+        "customer_service": "healthy",
+    },
+)
+app.config['HEALTH_MONITOR'] = health_monitor
+
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """
+    Liveness endpoint.
+
+    Does not touch the database or any other service.
+
+    Returns:
+        - 200 OK: Always, as long as the service answers.
+    """
+    return jsonify({"status": "alive"}), 200
+
+@app.route('/health/ready', methods=['GET'])
+@app.route('/health', methods=['GET'])
+def health_check():
+    """
+    Readiness endpoint.
+
+    Reports the cached results of the background dependency probes.
+
+    Returns:
+        - 200 OK: If the service and all dependencies are operational.
+        - 500 Internal Server Error: If any dependency is not operational.
+    """
+    monitor = current_app.config['HEALTH_MONITOR']
+    monitor.start()
+    results, age = monitor.snapshot()
 
     # Aggregate overall status
-    overall_status = "healthy" if db_status == "connected" and customer_service_status == "healthy" and sales_service_status == "healthy" else "unhealthy"
+    overall_status = "healthy" if monitor.is_ready(results) else "unhealthy"
 
     # Return JSON response
     return jsonify({
         "status": overall_status,
-        "database": db_status,
-        "customer_service": customer_service_status,
-        "sales_service_status": sales_service_status
+        "database": results.get("database", "unknown"),
+        "customer_service": results.get("customer_service", "unknown"),
+        "checked_seconds_ago": round(age, 3)
     }), 200 if overall_status == "healthy" else 500
 
 if __name__ == '__main__':
@@ -25,6 +25,8 @@ def app():
     """
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    # Reviews are moderated explicitly by the tests
+    flask_app.config['MODERATE_IN_BACKGROUND'] = False
     yield flask_app
     Base.metadata.drop_all(bind=engine)
 
@@ -132,10 +134,14 @@ def test_add_review(client, db_session, get_auth_token, add_test_data):
     assert review is not None
     assert review.rating == 4
     assert review.comment == 'A new review comment!'
-    assert review.status == 'approved'
+    assert review.status == 'pending'
     assert review.item_id == 1
     assert review.customer_id == 1
 
+    client.application.config['REVIEW_MODERATOR'].run_once()
+    db_session.refresh(review)
+    assert review.status == 'approved'
+
 def test_submit_review_with_profanity(client, db_session, get_auth_token, add_test_data):
     with client.application.app_context():
         client.application.config['GET_CUSTOMER_DATA_FUNC'] = lambda username, headers: {
@@ -215,6 +221,31 @@ def test_update_review(client, db_session, get_auth_token, add_test_data):
     assert review.comment == "Updated review comment"
     assert review.rating == 4
 
+def test_update_review_author_cannot_moderate(client, db_session, get_auth_token, add_test_data, monkeypatch):
+    """
+    Test that authors cannot change the status or ownership of their review, and that an edited
+    comment is moderated again.
+    """
+    monkeypatch.setitem(client.application.config, 'GET_CUSTOMER_DATA_FUNC', lambda username, headers: {"id": 1, "username": username})
+    headers = {"Authorization": f"Bearer {get_auth_token['user']}"}
+    review = Review(customer_id=1, item_id=1, rating=2, comment="Flagged comment", status="flagged")
+    db_session.add(review)
+    db_session.commit()
+
+    response = client.put(f'/reviews/{review.id}', headers=headers, json={"status": "approved", "item_id": 2, "customer_id": 5, "rating": 3})
+    assert response.status_code == 200
+    db_session.refresh(review)
+    assert (review.status, review.item_id, review.customer_id, review.rating) == ("flagged", 1, 1, 3)
+
+    review.status = "approved"
+    db_session.commit()
+    response = client.put(f'/reviews/{review.id}', headers=headers, json={"rating": 3, "comment": "Edited comment", "status": "approved"})
+    assert response.status_code == 200
+    db_session.refresh(review)
+    assert (review.comment, review.status) == ("Edited comment", "pending")
+    db_session.delete(review)
+    db_session.commit()
+
 def test_delete_review(client, db_session, get_auth_token, add_test_data):
     with client.application.app_context():
         client.application.config['GET_CUSTOMER_DATA_FUNC'] = lambda username, headers: {
@@ -301,3 +332,530 @@ def test_approve_review(client, db_session, get_auth_token, add_test_data):
     approved_review = db_session.query(Review).filter_by(id=1).first()
     assert approved_review is not None
     assert approved_review.status == "approved"
+
+
+def test_liveness(client):
+    response = client.get('/health/live')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'alive'
+
+def test_readiness_cached(client):
+    from shared.health import HealthMonitor
+
+    calls = []
+    def counting_probe():
+        calls.append(1)
+        return "healthy"
+
+    original_monitor = client.application.config['HEALTH_MONITOR']
+    client.application.config['HEALTH_MONITOR'] = HealthMonitor(
+        probes={"database": lambda: "connected", "customer_service": counting_probe},
+        healthy_states={"database": "connected", "customer_service": "healthy"},
+        interval=60,
+    )
+    try:
+        first = client.get('/health')
+        for _ in range(5):
+            second = client.get('/health/ready')
+    finally:
+        client.application.config['HEALTH_MONITOR'] = original_monitor
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.get_json()['customer_service'] == "healthy"
+    # At most the first request and the background round probe; the other requests read the cache
+    assert len(calls) <= 2
+
+def test_submit_review_unknown_item(client, db_session, get_auth_token, add_test_data, monkeypatch):
+    from reviews.app import get_item_exists
+
+    monkeypatch.setitem(client.application.config, 'GET_CUSTOMER_DATA_FUNC', lambda username, headers: {
+        "id": 1,
+        "username": username,
+    })
+    monkeypatch.setitem(client.application.config, 'GET_ITEM_EXISTS_FUNC', get_item_exists)
+
+    response = client.post(
+        '/reviews/9999',
+        json={"rating": 3, "comment": "Where is this item?"},
+        headers={"Authorization": f"Bearer {get_auth_token['user']}"}
+    )
+
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'Item not found'
+
+def test_item_index_lookups(db_session, add_test_data):
+    from datetime import datetime, timezone
+    from shared.catalog_feed import record_item_change
+    from shared.item_index import ItemIndex
+
+    index = ItemIndex(refresh_interval=3600, negative_ttl=3600)
+    assert index.exists(1) is True
+    assert index.exists(424242) is False
+
+    # Inventory-service logs every item change in the same transaction
+    item = InventoryItem(id=424242, name="Late Item", category="food", price_per_item=1.0, stock_count=1)
+    db_session.add(item)
+    record_item_change(db_session, 424242)
+    db_session.commit()
+
+    # The miss is remembered until the negative entry expires or a refresh sees the new ID
+    assert index.exists(424242) is False
+    index.refresh()
+    assert index.exists(424242) is True
+
+    # An item marked as deleted is dropped by the next refresh, before its purge or a rebuild
+    item.deleted_at = datetime.now(timezone.utc)
+    record_item_change(db_session, 424242)
+    db_session.commit()
+    assert index.exists(424242) is True
+    index.refresh()
+    assert index.exists(424242) is False
+
+    db_session.query(InventoryItem).filter_by(id=424242).delete()
+    db_session.commit()
+    index.rebuild()
+    assert index.exists(424242) is False
+
+def test_get_product_reviews_conditional(client, db_session, get_auth_token, add_test_data):
+    response = client.get(
+        '/reviews/product/1',
+        headers={"Authorization": f"Bearer {get_auth_token['user']}"}
+    )
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get(
+        '/reviews/product/1',
+        headers={"Authorization": f"Bearer {get_auth_token['user']}", 'If-None-Match': etag}
+    )
+    assert response.status_code == 304
+
+    review_id = db_session.query(Review).filter_by(item_id=1).first().id
+    client.put(
+        f'/reviews/flag/{review_id}',
+        headers={"Authorization": f"Bearer {get_auth_token['user']}"}
+    )
+
+    response = client.get(
+        '/reviews/product/1',
+        headers={"Authorization": f"Bearer {get_auth_token['user']}", 'If-None-Match': etag}
+    )
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_review_created_at_iso_format(client, db_session, get_auth_token, add_test_data):
+    from datetime import datetime
+
+    review = db_session.query(Review).first()
+    response = client.get(
+        f'/reviews/{review.id}',
+        headers={"Authorization": f"Bearer {get_auth_token['user']}"}
+    )
+
+    assert response.status_code == 200
+    created_at = response.get_json()['created_at']
+    assert datetime.fromisoformat(created_at) == review.created_at
+
+
+def test_rating_summary_maintained(client, db_session, get_auth_token, add_test_data, monkeypatch):
+    from shared.models.rating_summary import ItemRatingSummary
+    from shared.models.data_version import DataVersion
+    from shared.ratings import rebuild_rating_summaries, summary_to_dict
+    from shared.versioning import CATALOG_VERSION, item_version_name
+
+    monkeypatch.setitem(client.application.config, 'GET_CUSTOMER_DATA_FUNC', lambda username, headers: {"id": 1, "username": username})
+    headers = {'Authorization': f'Bearer {get_auth_token["admin"]}'}
+
+    def summary():
+        db_session.expire_all()
+        return summary_to_dict(db_session.query(ItemRatingSummary).filter_by(item_id=1).first())
+
+    def version(name):
+        db_session.expire_all()
+        row = db_session.query(DataVersion).filter_by(name=name).first()
+        return row.version if row else 0
+
+    # Reviews inserted directly by the fixtures are only counted by a rebuild
+    rebuild_rating_summaries(db_session)
+    db_session.commit()
+    before = summary()
+    response = client.post('/reviews/1', headers=headers, json={'rating': 3, 'comment': 'Average product', 'status': 'approved'})
+    assert response.status_code == 201
+    review_id = response.get_json()['review_id']
+    assert summary() == before
+    client.application.config['REVIEW_MODERATOR'].run_once()
+    assert summary()['count'] == before['count'] + 1
+    assert summary()['histogram']['3'] == before['histogram']['3'] + 1
+
+    client.put(f'/reviews/flag/{review_id}', headers=headers)
+    assert summary() == before
+
+    # A rating change invalidates the cached item details, not every catalog listing
+    catalog_before, item_before = version(CATALOG_VERSION), version(item_version_name(1))
+    client.put(f'/reviews/approve/{review_id}', headers=headers)
+    assert version(CATALOG_VERSION) == catalog_before
+    assert version(item_version_name(1)) == item_before + 1
+    client.put(f'/reviews/{review_id}', headers=headers, json={'rating': 1})
+    after_update = summary()
+    assert after_update['count'] == before['count'] + 1
+    assert after_update['histogram']['1'] == before['histogram']['1'] + 1
+    assert after_update['histogram']['3'] == before['histogram']['3']
+
+    client.delete(f'/reviews/{review_id}', headers=headers)
+    assert summary() == before
+
+    approved = db_session.query(Review).filter_by(item_id=1, status='approved').all()
+    maintained = summary()
+    assert maintained['count'] == len(approved)
+    assert maintained['average'] == round(sum(review.rating for review in approved) / len(approved), 2)
+
+
+def test_rating_summaries_backfilled(db_session, add_test_data):
+    from shared.backfill import marker_name, run_backfills
+    from shared.models.data_version import DataVersion
+    from shared.models.rating_summary import ItemRatingSummary
+    from shared.ratings import summary_to_dict
+
+    # A database created before the summaries has approved reviews but neither summaries nor marker
+    db_session.query(ItemRatingSummary).delete()
+    db_session.query(DataVersion).filter_by(name=marker_name("rating_summaries")).delete()
+    db_session.commit()
+
+    assert run_backfills(["rating_summaries"]) == ["rating_summaries"]
+    approved = db_session.query(Review).filter_by(item_id=1, status='approved').all()
+    summary = summary_to_dict(db_session.query(ItemRatingSummary).filter_by(item_id=1).first())
+    assert summary['count'] == len(approved) > 0
+    assert summary['average'] == round(sum(review.rating for review in approved) / len(approved), 2)
+
+    # Later starts leave the maintained summaries alone
+    assert run_backfills(["rating_summaries"]) == []
+    assert run_backfills(["rating_summaries"], force=True) == ["rating_summaries"]
+    with pytest.raises(ValueError):
+        run_backfills(["ratings"])
+
+
+def test_remove_reviews_from_summaries_grouped(db_session, add_test_data):
+    from datetime import date, datetime
+    from shared.models.item_daily_stats import ItemDailyStats
+    from shared.models.rating_summary import ItemRatingSummary
+    from shared.ratings import rebuild_rating_summaries, remove_reviews_from_summaries, summary_to_dict
+
+    reviews = [
+        Review(customer_id=21, item_id=1, rating=rating, comment='Leaving soon', status=status, created_at=created_at)
+        for rating, status, created_at in [
+            (5, 'approved', datetime(2024, 3, 1, 9)), (5, 'approved', datetime(2024, 3, 1, 18)),
+            (2, 'approved', datetime(2024, 3, 2, 12)), (4, 'flagged', datetime(2024, 3, 2, 13)),
+        ]
+    ]
+    db_session.add_all(reviews)
+    db_session.commit()
+    rebuild_rating_summaries(db_session)
+    db_session.commit()
+
+    def summary():
+        return summary_to_dict(db_session.query(ItemRatingSummary).filter_by(item_id=1).first())
+
+    def reviews_on(day):
+        row = db_session.query(ItemDailyStats).filter_by(item_id=1, day=day).first()
+        return (row.review_count, row.rating_sum) if row else (0, 0)
+
+    try:
+        before = summary()
+        days_before = {day: reviews_on(day) for day in (date(2024, 3, 1), date(2024, 3, 2))}
+        assert remove_reviews_from_summaries(db_session, Review.customer_id == 21) == [1]
+        db_session.flush()
+        db_session.expire_all()
+        after = summary()
+        # The flagged review was never counted
+        assert after['count'] == before['count'] - 3
+        assert after['histogram']['5'] == before['histogram']['5'] - 2
+        assert after['histogram']['2'] == before['histogram']['2'] - 1
+        assert after['histogram']['4'] == before['histogram']['4']
+        assert reviews_on(date(2024, 3, 1)) == (days_before[date(2024, 3, 1)][0] - 2, days_before[date(2024, 3, 1)][1] - 10)
+        assert reviews_on(date(2024, 3, 2)) == (days_before[date(2024, 3, 2)][0] - 1, days_before[date(2024, 3, 2)][1] - 2)
+    finally:
+        db_session.rollback()
+        for review in reviews:
+            db_session.delete(review)
+        rebuild_rating_summaries(db_session)
+        db_session.commit()
+
+def test_profanity_filter_matches_better_profanity():
+    import random
+    from better_profanity import profanity
+    from shared.moderation import CHARS_MAPPING, default_words
+    from reviews.app import profanity_filter
+
+    corpus_path = os.path.join(os.path.dirname(__file__), 'profanity_corpus.txt')
+    with open(corpus_path, encoding='utf-8') as corpus_file:
+        corpus = [line.rstrip('\n') for line in corpus_file]
+
+    # Censor words with leetspeak substitutions and separators, joined with ordinary words
+    rng = random.Random(38)
+    words = default_words()
+    for _ in range(200):
+        parts = []
+        for _ in range(rng.randint(1, 5)):
+            word = rng.choice(words) if rng.random() < 0.4 else rng.choice(['great', 'class', 'the', 'bull', 'hand', 'a'])
+            parts.append(''.join(rng.choice(CHARS_MAPPING.get(char, (char,))) for char in word))
+            parts.append(rng.choice([' ', '-', '_', '. ', '!', '  ']))
+        corpus.append(''.join(parts).strip())
+
+    for comment in corpus:
+        assert profanity_filter.contains_profanity(comment) == profanity.contains_profanity(comment), comment
+
+def test_moderation_flags_spam_and_duplicates(client, db_session, get_auth_token, add_test_data):
+    moderator = client.application.config['REVIEW_MODERATOR']
+    moderator.run_once()
+    headers = {'Authorization': f'Bearer {get_auth_token["admin"]}'}
+
+    comments = {
+        'Solid build, the hinge feels sturdy and the finish is nice.': 'approved',
+        'Cheap copies at www.example-deals.com': 'flagged',
+        'THIS IS THE BEST THING I HAVE EVER BOUGHT': 'flagged',
+        'Goooooooood': 'flagged',
+    }
+    review_ids = {}
+    for comment in comments:
+        response = client.post('/reviews/1', headers=headers, json={'rating': 4, 'comment': comment})
+        assert response.status_code == 201
+        assert response.get_json()['status'] == 'pending'
+        review_ids[comment] = response.get_json()['review_id']
+
+    # The same customer posting the same long comment again
+    response = client.post('/reviews/1', headers=headers, json={'rating': 4, 'comment': 'Solid build, the hinge feels sturdy and the finish is nice.'})
+    duplicate_id = response.get_json()['review_id']
+
+    response = client.get('/reviews/moderation/backlog', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['pending'] == 5
+    assert response.get_json()['oldest_pending_seconds'] is not None
+
+    assert moderator.run_once() == 5
+    db_session.expire_all()
+    for comment, status in comments.items():
+        assert db_session.query(Review).filter_by(id=review_ids[comment]).first().status == status, comment
+    assert db_session.query(Review).filter_by(id=duplicate_id).first().status == 'flagged'
+
+    response = client.get('/reviews/moderation/backlog', headers=headers)
+    assert response.get_json()['pending'] == 0
+    assert response.get_json()['oldest_pending_seconds'] is None
+
+
+def test_moderation_backlog_metrics(client, db_session, add_test_data):
+    from datetime import datetime, timedelta, timezone
+
+    client.application.config['REVIEW_MODERATOR'].run_once()
+    waiting = Review(customer_id=1, item_id=1, rating=4, comment='Waiting for moderation', status='pending',
+                     created_at=(datetime.now(timezone.utc) - timedelta(hours=2)).replace(tzinfo=None))
+    db_session.add(waiting)
+    db_session.commit()
+
+    def gauges():
+        lines = client.get('/metrics').get_data(as_text=True).splitlines()
+        return {line.split()[0]: float(line.split()[1]) for line in lines if line.startswith('review_moderation_')}
+
+    try:
+        values = gauges()
+        assert values['review_moderation_pending'] == 1
+        assert values['review_moderation_oldest_pending_seconds'] >= 7200
+        assert 'review_moderation_moderated_total' in values
+
+        client.application.config['REVIEW_MODERATOR'].run_once()
+        values = gauges()
+        assert values['review_moderation_pending'] == 0
+        assert values['review_moderation_oldest_pending_seconds'] == 0
+    finally:
+        db_session.delete(waiting)
+        db_session.commit()
+
+def test_moderation_duplicates_scoped_and_counted(db_session, add_test_data):
+    from shared.database import SessionLocal
+    from shared.review_moderation import ReviewModerator
+
+    copied = 'Copied praise posted by several accounts on one product.'
+    racing = 'A comment approved by a moderator while it is being checked.'
+    # Three customers posted the same comment on item 1, a fourth one posts it on items 1 and 2
+    existing = [Review(customer_id=customer_id, item_id=1, rating=5, comment=copied, status='approved') for customer_id in (11, 12, 13)]
+    db_session.add_all(existing)
+    db_session.commit()
+    # The raced review is claimed first, before the batch writes anything
+    raced = Review(customer_id=16, item_id=2, rating=4, comment=racing, status='pending')
+    db_session.add(raced)
+    db_session.commit()
+    same_item = Review(customer_id=14, item_id=1, rating=5, comment=copied, status='pending')
+    other_item = Review(customer_id=15, item_id=2, rating=5, comment=copied, status='pending')
+    db_session.add_all([same_item, other_item])
+    db_session.commit()
+
+    def approve_first(comment):
+        # A moderator approves the review between the claim and the status change
+        if comment == racing:
+            other_session = SessionLocal()
+            other_session.query(Review).filter_by(id=raced.id).update({'status': 'approved'})
+            other_session.commit()
+            other_session.close()
+        return None
+
+    moderator = ReviewModerator([approve_first])
+    try:
+        assert moderator.run_once() == 3
+        assert moderator.moderated == 2
+        assert moderator.flagged == 1
+        db_session.expire_all()
+        assert db_session.get(Review, same_item.id).status == 'flagged'
+        assert db_session.get(Review, other_item.id).status == 'approved'
+        assert db_session.get(Review, raced.id).status == 'approved'
+    finally:
+        for review in existing + [same_item, other_item, raced]:
+            db_session.delete(review)
+        db_session.commit()
+
+def test_bulk_moderation(client, db_session, get_auth_token, add_test_data):
+    from shared.models.rating_summary import ItemRatingSummary
+    from shared.ratings import rebuild_rating_summaries, summary_to_dict
+
+    headers = {'Authorization': f'Bearer {get_auth_token["admin"]}'}
+    rebuild_rating_summaries(db_session)
+    db_session.commit()
+
+    def summary():
+        db_session.expire_all()
+        return summary_to_dict(db_session.query(ItemRatingSummary).filter_by(item_id=1).first())
+
+    reviews = [Review(customer_id=1, item_id=1, rating=rating, comment='Bulk review', status='pending') for rating in (1, 2, 5)]
+    db_session.add_all(reviews)
+    db_session.commit()
+    review_ids = [review.id for review in reviews]
+    before = summary()
+
+    response = client.post('/reviews/bulk/approve', headers=headers, json={'ids': review_ids})
+    assert response.status_code == 200
+    assert response.get_json() == {'action': 'approve', 'affected': 3, 'item_ids': [1], 'complete': True}
+    after_approve = summary()
+    assert after_approve['count'] == before['count'] + 3
+    assert after_approve['histogram']['2'] == before['histogram']['2'] + 1
+
+    # Already approved reviews are left alone
+    response = client.post('/reviews/bulk/approve', headers=headers, json={'ids': review_ids})
+    assert response.get_json()['affected'] == 0
+
+    response = client.post('/reviews/bulk/flag', headers=headers, json={'ids': review_ids[:2]})
+    assert response.get_json()['affected'] == 2
+    assert summary()['count'] == before['count'] + 1
+
+    response = client.post('/reviews/bulk/delete', headers=headers, json={'ids': review_ids})
+    assert response.get_json()['affected'] == 3
+    assert summary() == before
+    assert db_session.query(Review).filter(Review.id.in_(review_ids)).count() == 0
+
+    invalid_bodies = [
+        {}, {'ids': []}, {'filter': {}}, {'filter': {'rating': 5}}, {'ids': ['a']}, {'ids': [True]},
+        {'filter': {'item_id': '1'}}, {'filter': {'customer_id': [1]}}, {'filter': {'status': 'any'}},
+    ]
+    for body in invalid_bodies:
+        response = client.post('/reviews/bulk/flag', headers=headers, json=body)
+        assert response.status_code == 400
+    response = client.post('/reviews/bulk/delete', headers={'Authorization': f'Bearer {get_auth_token["manager"]}'}, json={'ids': [1]})
+    assert response.status_code == 403
+
+def test_bulk_moderation_by_filter(client, db_session, get_auth_token, add_test_data):
+    headers = {'Authorization': f'Bearer {get_auth_token["admin"]}'}
+    reviews = [Review(customer_id=1, item_id=1, rating=3, comment='Filtered review', status='pending') for _ in range(3)]
+    db_session.add_all(reviews)
+    db_session.commit()
+
+    pending = db_session.query(Review).filter_by(item_id=1, status='pending').count()
+    response = client.post('/reviews/bulk/flag', headers=headers, json={'filter': {'item_id': 1, 'status': 'pending'}})
+    assert response.status_code == 200
+    assert response.get_json()['affected'] == pending
+    db_session.expire_all()
+    assert all(review.status == 'flagged' for review in db_session.query(Review).filter(Review.id.in_([review.id for review in reviews])))
+
+def test_bulk_moderation_chunks_filters(client, db_session, get_auth_token, add_test_data, monkeypatch):
+    headers = {'Authorization': f'Bearer {get_auth_token["admin"]}'}
+    monkeypatch.setattr('reviews.app.BULK_CHUNK_SIZE', 2)
+    monkeypatch.setattr('reviews.app.MAX_BULK_CHUNKS', 2)
+    reviews = [Review(customer_id=1, item_id=1, rating=4, comment='Chunked review', status='pending') for _ in range(5)]
+    db_session.add_all(reviews)
+    db_session.commit()
+
+    # Each request changes at most two chunks, later requests continue where it stopped
+    response = client.post('/reviews/bulk/approve', headers=headers, json={'filter': {'status': 'pending'}})
+    assert response.get_json()['affected'] == 4
+    assert response.get_json()['complete'] is False
+    while not response.get_json()['complete']:
+        response = client.post('/reviews/bulk/approve', headers=headers, json={'filter': {'status': 'pending'}})
+    assert db_session.query(Review).filter_by(status='pending').count() == 0
+    db_session.expire_all()
+    assert all(review.status == 'approved' for review in db_session.query(Review).filter(Review.id.in_([review.id for review in reviews])))
+
+    response = client.post('/reviews/bulk/delete', headers=headers, json={'ids': [review.id for review in reviews]})
+    assert (response.get_json()['affected'], response.get_json()['complete']) == (4, False)
+    response = client.post('/reviews/bulk/delete', headers=headers, json={'ids': [review.id for review in reviews]})
+    assert (response.get_json()['affected'], response.get_json()['complete']) == (1, True)
+
+def test_review_queue_keyset_pagination(client, db_session, get_auth_token, add_test_data):
+    from datetime import datetime, timedelta
+
+    headers = {'Authorization': f'Bearer {get_auth_token["admin"]}'}
+    db_session.query(Review).filter_by(status='normal').delete()
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    # Pairs of reviews share a timestamp, so pages must break ties by ID
+    reviews = [
+        Review(customer_id=1, item_id=1, rating=3, comment=f'Queued review {index}', status='normal',
+               created_at=start + timedelta(minutes=index // 2))
+        for index in range(7)
+    ]
+    db_session.add_all(reviews)
+    db_session.commit()
+    expected = [review.id for review in reviews]
+
+    listed = []
+    cursor = None
+    while True:
+        query = '/reviews/queue?status=normal&limit=3' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(query, headers=headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page['reviews']) <= 3
+        listed.extend(review['id'] for review in page['reviews'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert listed == expected
+
+    # A page stays in place when the last review of the previous page is moderated away
+    first_page = client.get('/reviews/queue?status=normal&limit=2', headers=headers).get_json()
+    client.post('/reviews/bulk/flag', headers=headers, json={'ids': [first_page['reviews'][-1]['id']]})
+    second_page = client.get(f'/reviews/queue?status=normal&limit=2&cursor={first_page["next_cursor"]}', headers=headers).get_json()
+    assert [review['id'] for review in second_page['reviews']] == expected[2:4]
+
+    assert client.get('/reviews/queue?status=unknown', headers=headers).status_code == 400
+    assert client.get('/reviews/queue?status=normal&limit=0', headers=headers).status_code == 400
+    assert client.get('/reviews/queue?status=normal&cursor=bogus', headers=headers).status_code == 400
+    customer_headers = {'Authorization': f'Bearer {get_auth_token["user"]}'}
+    assert client.get('/reviews/queue?status=flagged', headers=customer_headers).status_code == 403
+
+
+def test_add_missing_indexes_creates_moderation_queue_index(tmp_path):
+    """
+    Reviews tables created before the moderation queue index get it at startup.
+    """
+    from sqlalchemy import create_engine, inspect, text
+    from shared.schema import add_missing_indexes
+
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE reviews (id INTEGER PRIMARY KEY, customer_id INTEGER, item_id INTEGER, rating INTEGER, "
+            "comment TEXT, status VARCHAR(50), created_at DATETIME, updated_at DATETIME)"
+        ))
+
+    # The tables of the other indexes do not exist in this database and are skipped
+    assert add_missing_indexes(old_engine) == ["ix_reviews_status_created_at"]
+    indexes = {index["name"]: index["column_names"] for index in inspect(old_engine).get_indexes("reviews")}
+    assert indexes["ix_reviews_status_created_at"] == ["status", "created_at", "id"]
+    assert add_missing_indexes(old_engine) == []
+    old_engine.dispose()
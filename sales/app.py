@@ -2,21 +2,45 @@ from flask import Flask, json, request, jsonify , current_app
 from flask_cors import CORS
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from auth.app import role_required
+from shared.auth import role_required
 from shared.models.wishlist import Wishlist
 from shared.models.base import Base
 from shared.models.customer import Customer
 from shared.models.review import Review
 from shared.models.order import Order
 from shared.models.inventory import InventoryItem
+from shared.models.rating_summary import ItemRatingSummary
 from shared.database import engine, SessionLocal
-from sqlalchemy.sql import text
+from shared.schema import add_missing_columns, add_missing_indexes
+from shared.backfill import run_backfills
+from shared.compression import init_compression
+from shared.json_provider import init_json
+from shared.profiling import init_profiling
+from shared.metrics import init_metrics, track_cache
+from shared.health import HealthMonitor, check_database, http_probe
+from shared.resilience import UpstreamUnavailableError, get_upstream, httpx
+from shared.cache import VersionedCache
+from shared.ratings import summary_to_dict
+from shared.leaderboards import WINDOWS, bestsellers, record_sale, top_rated
+from shared.revenue import GRANULARITIES, GROUPINGS, MAX_RANGE, naive_utc, record_revenue, revenue_report
+from shared.catalog_feed import CatalogFeed
+from shared.facets import CatalogFacets
+from shared.search_index import SearchIndex
+from shared.responses import cached_json_response
+from shared.versioning import CATALOG_VERSION, VersionTracker, item_version_name
 from flask_jwt_extended import JWTManager, create_access_token, get_jwt, jwt_required, get_jwt_identity
 import json
+import asyncio
+import inspect
 import requests
+from datetime import datetime, timedelta, timezone
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
+init_compression(app)
+init_json(app)
+init_profiling(app, "sales")
+init_metrics(app, engine)
 app.config['JWT_SECRET_KEY'] = 'secret-key'
 jwt = JWTManager(app)
 
@@ -89,18 +113,198 @@ def deduct_wallet(username,total_cost,headers):
         if wallet_response.headers.get('Content-Type') != 'application/json':
             raise Exception('Unexpected content type: JSON expected from wallet service')
 
+async def request_json_async(method, url, headers, payload=None):
+    """
+    Send a request to another service with the asyncio HTTP client.
+
+    Parameters:
+        method (str): The HTTP method.
+        url (str): The URL of the endpoint.
+        headers (dict): The HTTP headers, typically including authentication headers.
+        payload (dict): The JSON body, if any.
+
+    Returns:
+        dict: The JSON response.
+        raises an exception for HTTP errors and non-JSON responses.
+    """
+    if httpx is None:
+        raise RuntimeError("httpx is required for asynchronous calls to other services")
+    async with httpx.AsyncClient(timeout=5) as client:
+        response = await client.request(method, url, json=payload, headers=headers)
+    response.raise_for_status()
+    if response.headers.get('Content-Type') != 'application/json':
+        raise Exception('Unexpected content type: JSON expected')
+    return response.json()
+
+async def get_customer_details_async(username, headers):
+    """
+    Retrieve customer data from the customer service, asynchronously. See `get_customer_details`.
+    """
+    return await request_json_async('GET', f'http://customer-service:3000/customers/{username}', headers)
+
+async def remove_stock_async(item_id, quantity, headers):
+    """
+    Remove stock for a specific inventory item, asynchronously. See `remove_stock`.
+    """
+    await request_json_async('POST', f'http://inventory-service:3001/inventory/{item_id}/stock/remove', headers, {"quantity": quantity})
+
+async def deduct_wallet_async(username, total_cost, headers):
+    """
+    Deduct funds from a customer's wallet, asynchronously. See `deduct_wallet`.
+    """
+    await request_json_async('POST', f'http://customer-service:3000/customers/{username}/wallet/deduct', headers, {"amount": total_cost})
+
+# Calls to each upstream service go through its circuit breaker and concurrent call limit
+customer_service = get_upstream('customer-service')
+inventory_service = get_upstream('inventory-service')
+
 # Set the default function in app config
-app.config['GET_CUSTOMER_DATA_FUNC'] = get_customer_details
-app.config['REMOVE_STOCK_FUNC'] = remove_stock
-app.config['DEDUCT_WALLET_FUNC'] = deduct_wallet
+app.config['GET_CUSTOMER_DATA_FUNC'] = customer_service.wrap(get_customer_details)
+app.config['REMOVE_STOCK_FUNC'] = inventory_service.wrap(remove_stock)
+app.config['DEDUCT_WALLET_FUNC'] = customer_service.wrap(deduct_wallet)
+
+# The asyncio purchase path may override each hook with an `ASYNC_` variant. Overrides may be
+# coroutine functions or plain functions. Without an override, or without httpx, the path runs the
+# hook above in a worker thread, so mocks of the hooks above apply to both purchase paths.
+app.config['ASYNC_GET_CUSTOMER_DATA_FUNC'] = None
+app.config['ASYNC_REMOVE_STOCK_FUNC'] = None
+app.config['ASYNC_DEDUCT_WALLET_FUNC'] = None
+if httpx is not None:
+    app.config['ASYNC_GET_CUSTOMER_DATA_FUNC'] = customer_service.wrap_async(get_customer_details_async)
+    app.config['ASYNC_REMOVE_STOCK_FUNC'] = inventory_service.wrap_async(remove_stock_async)
+    app.config['ASYNC_DEDUCT_WALLET_FUNC'] = customer_service.wrap_async(deduct_wallet_async)
+# Seconds an asynchronous purchase may spend loading the customer and item before it charges the wallet
+app.config['PURCHASE_DEADLINE'] = 10.0
 
 # Create tables if not created
 Base.metadata.create_all(bind=engine)
+# Add the columns and indexes introduced since the tables were created
+add_missing_columns(engine)
+add_missing_indexes(engine)
+# Fill the daily statistics and revenue rollups of databases created before them
+run_backfills(["daily_stats", "revenue_rollups"])
 
 # Configure JWT
 app.config['JWT_SECRET_KEY'] = 'secret-key'
 jwt = JWTManager(app)
-    
+
+# Catalog reads are served from pre-serialized payloads, rebuilt when inventory-service bumps
+# the catalog version (list views) or the version of a single item (item details). Review changes
+# only bump the item version, so list views are also rebuilt in the background once they are
+# LISTING_MAX_AGE seconds old, which bounds how stale the ratings they show can be.
+LISTING_MAX_AGE = 30
+catalog_versions = VersionTracker()
+catalog_cache = VersionedCache(catalog_versions, max_age=LISTING_MAX_AGE)
+track_cache("catalog", catalog_cache)
+
+# Product search runs on an in-memory index, loaded once and then kept up to date from the
+# catalog change log written by inventory-service
+catalog_feed = CatalogFeed()
+search_index = SearchIndex()
+catalog_feed.subscribe(search_index)
+
+# Facet counts of catalog browsing come from per-cell counters fed by the same change log
+catalog_facets = CatalogFacets()
+catalog_feed.subscribe(catalog_facets)
+
+# Leaderboards are read from the daily item statistics and served from a cache rebuilt in the
+# background at most once a minute, since every order changes them
+leaderboard_cache = VersionedCache(catalog_versions, max_age=60)
+track_cache("leaderboards", leaderboard_cache)
+LEADERBOARDS = {"bestsellers": bestsellers, "top-rated": top_rated}
+
+def load_leaderboard(board, window, category, limit):
+    """
+    Load a leaderboard.
+
+    Parameters:
+        board (str): "bestsellers" or "top-rated".
+        window (str): One of "7d", "30d" and "all".
+        category (str): The category to rank, or None for every category.
+        limit (int): The number of items to return.
+
+    Returns:
+        dict: The `board`, `window`, `category` and ranked `items`.
+    """
+    db_session = SessionLocal()
+    try:
+        items = LEADERBOARDS[board](db_session, window=window, category=category, limit=limit)
+        return {"board": board, "window": window, "category": category, "items": items}
+    finally:
+        db_session.close()
+
+def inventory_entry(name, price, review_count, rating_sum):
+    """
+    Render an item of the inventory list.
+
+    Parameters:
+        name (str): The name of the item.
+        price (float): The price per item.
+        review_count (int): The number of approved reviews, None without a rating summary.
+        rating_sum (int): The sum of their ratings.
+
+    Returns:
+        dict: The `name`, `price` and `rating` of the item.
+    """
+    return {
+        "name": name,
+        "price": price,
+        "rating": {
+            "count": review_count or 0,
+            "average": round(rating_sum / review_count, 2) if review_count else None
+        }
+    }
+
+def load_inventory(category=None):
+    """
+    Load the name, price and rating of every inventory item, optionally restricted to one category.
+
+    Parameters:
+        category (str): The category to filter on, or None for the whole catalog.
+
+    Returns:
+        list: A list of dictionaries with the `name`, `price` and `rating` of each item. The rating
+              holds the `count` of approved reviews and their `average` (None without reviews).
+    """
+    db_session = SessionLocal()
+    try:
+        query = db_session.query(
+            InventoryItem.name, InventoryItem.price_per_item, ItemRatingSummary.review_count, ItemRatingSummary.rating_sum
+        ).outerjoin(ItemRatingSummary, ItemRatingSummary.item_id == InventoryItem.id).filter(InventoryItem.deleted_at.is_(None))
+        if category is not None:
+            query = query.filter(InventoryItem.category == category)
+        return [inventory_entry(*row) for row in query.all()]
+    finally:
+        db_session.close()
+
+def load_item_details(item_id):
+    """
+    Load the full details of an inventory item.
+
+    Parameters:
+        item_id (int): The ID of the inventory item.
+
+    Returns:
+        dict: The item details, or None if the item does not exist.
+    """
+    db_session = SessionLocal()
+    try:
+        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id, InventoryItem.deleted_at.is_(None)).first()
+        if item is None:
+            return None
+        summary = db_session.query(ItemRatingSummary).filter(ItemRatingSummary.item_id == item_id).first()
+        return {
+            "id": item.id,
+            "name": item.name,
+            "category": item.category,
+            "price_per_item": item.price_per_item,
+            "description": item.description,
+            "stock_count": item.stock_count,
+            "rating": summary_to_dict(summary)
+        }
+    finally:
+        db_session.close()
+
 @app.route('/inventory', methods=['GET'])
 @jwt_required()
 @role_required(['admin', 'customer', 'product_manager'])
@@ -117,19 +321,142 @@ def get_inventory():
           - `customer`: Can view all inventory items.
           - `product_manager`: Can view all inventory items.
 
+    **Caching**:
+        - Served from the catalog cache, rebuilt in the background when the catalog version changes.
+        - Sends a strong `ETag`. A matching `If-None-Match` gets 304 Not Modified.
+
     **Returns**:
         - 200 OK: A JSON array containing the details of all inventory items. Each item includes:
             - `name` (str): The name of the inventory item.
             - `price` (float): The price per item.
         - 500 Internal Server Error: If an error occurs during the process.
     """
-    db_session = SessionLocal()
     try:
-        goods = db_session.query(InventoryItem.name, InventoryItem.price_per_item).all()
-        json_results = [{"name": name, "price": price} for name, price in goods]
-        return jsonify(json_results), 200
+        entry = catalog_cache.get('inventory:all', CATALOG_VERSION, load_inventory)
+        return cached_json_response(entry)
     except Exception as e:
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@app.route('/inventory/search', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'customer', 'product_manager'])
+def search_inventory():
+    """
+    Search inventory items by name and description.
+
+    **Endpoint**:
+        GET /inventory/search?q=<query>&page=<page>&per_page=<per_page>
+
+    **Query Parameters**:
+        - `q` (str): The search terms. Required.
+        - `page` (int): The page of results to return, starting at 1. Defaults to 1.
+        - `per_page` (int): The number of results per page, between 1 and 100. Defaults to 20.
+
+    **Access Control**:
+        - Users must have one of the following roles: `admin`, `customer`, `product_manager`.
+
+    **Ranking**:
+        - Items matching more of the terms, and rarer terms, come first (BM25).
+        - Matches in the item name weigh more than matches in the description.
+        - The index picks up item changes within a second.
+
+    **Returns**:
+        - 200 OK: A JSON object with the `query`, the `total` number of matches, `page`, `per_page`
+          and `results`, a list of items with their `id`, `name`, `category`, `price` and `score`.
+        - 400 Bad Request: If `q` is missing or the pagination parameters are invalid.
+        - 500 Internal Server Error: If an error occurs during the process.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "Query parameter 'q' is required"}), 400
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        if page is None or page < 1 or per_page is None or not 1 <= per_page <= 100:
+            return jsonify({"error": "'page' must be at least 1 and 'per_page' between 1 and 100"}), 400
+
+        catalog_feed.maybe_sync()
+        total, matches = search_index.search(query, limit=per_page, offset=(page - 1) * per_page)
+        results = [
+            {"id": item_id, "name": name, "category": category, "price": price, "score": round(score, 4)}
+            for item_id, score, (name, category, price) in matches
+        ]
+        return jsonify({"query": query, "total": total, "page": page, "per_page": per_page, "results": results}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/inventory/browse', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'customer', 'product_manager'])
+def browse_inventory():
+    """
+    Browse inventory items with filters and facet counts.
+
+    **Endpoint**:
+        GET /inventory/browse?category=<category>&min_price=<price>&max_price=<price>&in_stock=<bool>&page=<page>&per_page=<per_page>
+
+    **Query Parameters**:
+        - `category` (str): A category to include. Repeat it, or separate values with commas, to
+          include several. Defaults to every category.
+        - `min_price`, `max_price` (float): Inclusive price range. Both optional.
+        - `in_stock` (bool): `true` to keep only items with a positive stock count.
+        - `page` (int): The page of items to return, starting at 1. Defaults to 1.
+        - `per_page` (int): The number of items per page, between 1 and 100. Defaults to 20.
+
+    **Access Control**:
+        - Users must have one of the following roles: `admin`, `customer`, `product_manager`.
+
+    **Facets**:
+        - `category`: Item count of every category. Honors `in_stock`.
+        - `price`: Item count of every price bucket. Honors `in_stock` and `category`.
+        - Read from incrementally maintained counters, refreshed within a second of item changes.
+
+    **Returns**:
+        - 200 OK: A JSON object with the `total` number of matching items, `page`, `per_page`,
+          `items` (each with `id`, `name`, `category`, `price` and `stock_count`) and `facets`.
+        - 400 Bad Request: If a filter or pagination parameter is invalid.
+        - 500 Internal Server Error: If an error occurs during the process.
+    """
+    db_session = SessionLocal()
+    try:
+        categories = [value.strip().lower() for arg in request.args.getlist('category') for value in arg.split(',') if value.strip()]
+        min_price = request.args.get('min_price', type=float)
+        max_price = request.args.get('max_price', type=float)
+        in_stock = request.args.get('in_stock', 'false').lower() in ('1', 'true', 'yes')
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        if ('min_price' in request.args and min_price is None) or ('max_price' in request.args and max_price is None):
+            return jsonify({"error": "'min_price' and 'max_price' must be numbers"}), 400
+        if min_price is not None and max_price is not None and min_price > max_price:
+            return jsonify({"error": "'min_price' cannot be greater than 'max_price'"}), 400
+        if page is None or page < 1 or per_page is None or not 1 <= per_page <= 100:
+            return jsonify({"error": "'page' must be at least 1 and 'per_page' between 1 and 100"}), 400
+
+        query = db_session.query(
+            InventoryItem.id, InventoryItem.name, InventoryItem.category,
+            InventoryItem.price_per_item, InventoryItem.stock_count
+        ).filter(InventoryItem.deleted_at.is_(None))
+        if categories:
+            query = query.filter(InventoryItem.category.in_(categories))
+        if min_price is not None:
+            query = query.filter(InventoryItem.price_per_item >= min_price)
+        if max_price is not None:
+            query = query.filter(InventoryItem.price_per_item <= max_price)
+        if in_stock:
+            query = query.filter(InventoryItem.stock_count > 0)
+
+        total = query.count()
+        rows = query.order_by(InventoryItem.id).offset((page - 1) * per_page).limit(per_page).all()
+        items = [
+            {"id": item_id, "name": name, "category": category, "price": price, "stock_count": stock_count}
+            for item_id, name, category, price, stock_count in rows
+        ]
+
+        catalog_feed.maybe_sync()
+        facets = catalog_facets.counts(categories or None, in_stock)
+        return jsonify({"total": total, "page": page, "per_page": per_page, "items": items, "facets": facets}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     finally:
         db_session.close()
 
@@ -152,21 +479,21 @@ def get_inventory_category(category):
           - `customer`: Can view items in any category.
           - `product_manager`: Can view items in any category.
 
+    **Caching**:
+        - Served from the catalog cache, one entry per category.
+        - Sends a strong `ETag`. A matching `If-None-Match` gets 304 Not Modified.
+
     **Returns**:
         - 200 OK: A JSON array containing the details of all inventory items in the specified category. Each item includes:
             - `name` (str): The name of the inventory item.
             - `price` (float): The price per item.
         - 500 Internal Server Error: If an error occurs during the process.
     """
-    db_session = SessionLocal()
     try:
-        goods = db_session.query(InventoryItem.name, InventoryItem.price_per_item).filter(InventoryItem.category == category).all()
-        json_results = [{"name": name, "price": price} for name, price in goods]
-        return jsonify(json_results), 200
+        entry = catalog_cache.get(f'inventory:category:{category}', CATALOG_VERSION, lambda: load_inventory(category))
+        return cached_json_response(entry)
     except Exception as e:
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
-    finally:
-        db_session.close()
 
 @app.route('/inventory/<int:item_id>', methods=['GET'])
 @jwt_required()
@@ -184,26 +511,135 @@ def get_item_details(item_id):
           - `customer`: Can view all inventory items.
           - `product_manager`: Can view all inventory items.
 
+    **Caching**:
+        - Served from the catalog cache, rebuilt when the version of this item changes.
+        - Sends a strong `ETag`. A matching `If-None-Match` gets 304 Not Modified.
+
     **Response**:
         - 200 OK: A JSON array containing the details of all inventory items. Each item includes:
             - `name` (str): The name of the inventory item.
             - `price` (float): The price per item.
         - 500 Internal Server Error: If an error occurs during the process.
     """
-    db_session = SessionLocal()
     try:
-        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id).first()
-        if item is None:
+        entry = catalog_cache.get(f'inventory:item:{item_id}', item_version_name(item_id), lambda: load_item_details(item_id))
+        if entry is None:
             return jsonify({"error": "Item not found"}), 404
-        item_details = {
-            "id": item.id,
-            "name": item.name,
-            "category": item.category,
-            "price_per_item": item.price_per_item,
-            "description": item.description,
-            "stock_count": item.stock_count
-        }
-        return jsonify(item_details), 200
+        return cached_json_response(entry)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/leaderboards/<string:board>', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'customer', 'product_manager'])
+def get_leaderboard(board):
+    """
+    Retrieve the best selling or best rated items.
+
+    **Endpoint**:
+        GET /leaderboards/<board>?window=<window>&category=<category>&limit=<limit>
+
+    **Path Parameter**:
+        - `board` (str): `bestsellers` (ranked by units sold) or `top-rated` (ranked by the average
+          rating of approved reviews, weighted by their number).
+
+    **Query Parameters**:
+        - `window` (str): `7d`, `30d` or `all`. Defaults to `7d` for bestsellers and `all` for top rated.
+        - `category` (str): Rank only the items of this category. Defaults to every category.
+        - `limit` (int): The number of items, between 1 and 50. Defaults to 10.
+
+    **Access Control**:
+        - Users must have one of the following roles: `admin`, `customer`, `product_manager`.
+
+    **Caching**:
+        - Served from a cache refreshed in the background, at most one minute old.
+        - Sends a strong `ETag`. A matching `If-None-Match` gets 304 Not Modified.
+
+    **Returns**:
+        - 200 OK: A JSON object with the `board`, `window`, `category` and ranked `items`.
+        - 400 Bad Request: If the window or limit is invalid.
+        - 404 Not Found: If the leaderboard does not exist.
+        - 500 Internal Server Error: If an error occurs during the process.
+    """
+    try:
+        if board not in LEADERBOARDS:
+            return jsonify({"error": "Leaderboard not found"}), 404
+        window = request.args.get('window', '7d' if board == 'bestsellers' else 'all')
+        category = request.args.get('category')
+        limit = request.args.get('limit', 10, type=int)
+        if window not in WINDOWS:
+            return jsonify({"error": f"Invalid window. Valid options are: {', '.join(WINDOWS)}."}), 400
+        if limit is None or not 1 <= limit <= 50:
+            return jsonify({"error": "'limit' must be between 1 and 50"}), 400
+        if category is not None:
+            category = category.lower()
+
+        entry = leaderboard_cache.get(
+            f'leaderboard:{board}:{window}:{category}:{limit}', 'leaderboards',
+            lambda: load_leaderboard(board, window, category, limit)
+        )
+        return cached_json_response(entry)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analytics/revenue', methods=['GET'])
+@jwt_required()
+@role_required(['admin', 'product_manager'])
+def get_revenue():
+    """
+    Report revenue over a time range from the hourly or daily rollups.
+
+    **Endpoint**:
+        GET /analytics/revenue?granularity=<hour|day>&start=<ISO 8601>&end=<ISO 8601>&group_by=<category|item>&category=<category>&item_id=<id>
+
+    **Query Parameters**:
+        - `granularity` (str): `hour` or `day`. Defaults to `day`.
+        - `start`, `end` (str): ISO 8601 timestamps, UTC if no offset is given. `end` is excluded.
+          Default to the last 30 days (last 24 hours for `hour`). A range covers at most 31 days
+          hourly and 366 days daily.
+        - `group_by` (str): `category` or `item` to split every bucket. Optional.
+        - `category` (str), `item_id` (int): Restrict the report to one category or item. Optional.
+
+    **Access Control**:
+        - Users must have one of the following roles: `admin`, `product_manager`.
+
+    **Returns**:
+        - 200 OK: A JSON object with the `granularity`, `start`, `end`, `group_by`, the `totals` over
+          the range (`orders`, `units`, `revenue`) and the `series` of buckets.
+        - 400 Bad Request: If a parameter is invalid or the range is too long.
+        - 500 Internal Server Error: If an error occurs during the process.
+    """
+    db_session = SessionLocal()
+    try:
+        granularity = request.args.get('granularity', 'day')
+        group_by = request.args.get('group_by')
+        category = request.args.get('category')
+        item_id = request.args.get('item_id', type=int)
+        if granularity not in GRANULARITIES:
+            return jsonify({"error": f"Invalid granularity. Valid options are: {', '.join(GRANULARITIES)}."}), 400
+        if group_by is not None and group_by not in GROUPINGS:
+            return jsonify({"error": f"Invalid group_by. Valid options are: {', '.join(GROUPINGS)}."}), 400
+        if 'item_id' in request.args and item_id is None:
+            return jsonify({"error": "'item_id' must be an integer"}), 400
+
+        try:
+            end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.now(timezone.utc)
+            start = datetime.fromisoformat(request.args['start']) if 'start' in request.args else (
+                end - (timedelta(days=1) if granularity == 'hour' else timedelta(days=30))
+            )
+        except ValueError:
+            return jsonify({"error": "'start' and 'end' must be ISO 8601 timestamps"}), 400
+        start, end = naive_utc(start), naive_utc(end)
+        if start >= end:
+            return jsonify({"error": "'start' must be before 'end'"}), 400
+        if end - start > MAX_RANGE[granularity]:
+            return jsonify({"error": f"The range is too long for {granularity} buckets"}), 400
+
+        report = revenue_report(
+            db_session, granularity, start, end,
+            group_by=group_by, category=category.lower() if category else None, item_id=item_id
+        )
+        return jsonify({"granularity": granularity, "start": start, "end": end, "group_by": group_by, **report}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
@@ -231,6 +667,7 @@ def add_wishlist(item_id):
         - 200 OK: If the item is successfully added to the wishlist or is already in the wishlist.
         - 404 Not Found: If the customer or the inventory item does not exist.
         - 500 Internal Server Error: If an exception occurs during the process.
+        - 503 Service Unavailable: If customer-service is unavailable or overloaded.
     """
     db_session = SessionLocal()
     try:
@@ -245,7 +682,7 @@ def add_wishlist(item_id):
         get_customer_data_func = current_app.config['GET_CUSTOMER_DATA_FUNC']
         customer = get_customer_data_func(user['username'],headers)
 
-        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id).first()
+        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id, InventoryItem.deleted_at.is_(None)).first()
         if not item:
             return jsonify({"error": "Item not found"}), 404
 
@@ -264,6 +701,9 @@ def add_wishlist(item_id):
 
         return jsonify({"message": f"Item {item_id} added to wishlist successfully."}), 200
 
+    except UpstreamUnavailableError as e:
+        db_session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db_session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -292,6 +732,7 @@ def remove_wishlist(item_id):
         - 200 OK: If the item is successfully removed from the wishlist.
         - 404 Not Found: If the item is not found in the customer's wishlist.
         - 500 Internal Server Error: If an exception occurs during the process.
+        - 503 Service Unavailable: If customer-service is unavailable or overloaded.
 
     """
     db_session = SessionLocal()
@@ -307,7 +748,7 @@ def remove_wishlist(item_id):
         get_customer_data_func = current_app.config['GET_CUSTOMER_DATA_FUNC']
         customer = get_customer_data_func(user['username'],headers)
 
-        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id).first()
+        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id, InventoryItem.deleted_at.is_(None)).first()
         if not item:
             return jsonify({"error": "Item not found"}), 404
 
@@ -324,6 +765,9 @@ def remove_wishlist(item_id):
 
         return jsonify({'message': f"Item {item_id} removed from wishlist successfully."}), 200
 
+    except UpstreamUnavailableError as e:
+        db_session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db_session.rollback()  
         return jsonify({'error': str(e)}), 500
@@ -331,6 +775,53 @@ def remove_wishlist(item_id):
         db_session.close()
         
 
+def purchase_error(stock_count, total_cost, customer, quantity):
+    """
+    Check that a purchase can go ahead.
+
+    Parameters:
+        stock_count (int): The units of the item in stock.
+        total_cost (float): The price of the purchase.
+        customer (dict): The customer details, with their `wallet` balance.
+        quantity (int): The units purchased.
+
+    Returns:
+        str: The reason the purchase is refused, or None.
+    """
+    if stock_count < quantity:
+        return 'Not enough stock available'
+    if customer["wallet"] < total_cost:
+        return 'Insufficient wallet balance'
+    return None
+
+def record_order(db_session, customer, item_id, category, unit_price, quantity):
+    """
+    Log an order with its sales statistics as part of the caller's transaction.
+
+    Parameters:
+        db_session (Session): The session to log the order in.
+        customer (dict): The customer details, with their `id`.
+        item_id (int): The ID of the purchased item.
+        category (str): The category of the item.
+        unit_price (float): The price of one unit.
+        quantity (int): The units purchased.
+
+    Returns:
+        Order: The new order.
+    """
+    total_cost = unit_price * quantity
+    new_order = Order(
+        customer_id=customer["id"],
+        item_id=item_id,
+        quantity=quantity,
+        unit_price=unit_price,
+        total_price=total_cost
+    )
+    db_session.add(new_order)
+    record_sale(db_session, item_id, quantity)
+    record_revenue(db_session, item_id, category, quantity, total_cost)
+    return new_order
+
 @app.route('/purchase/<int:item_id>', methods=['POST'])
 @jwt_required()
 @role_required(['admin', 'customer'])
@@ -358,6 +849,7 @@ def purchase_item(item_id):
         - 400 Bad Request: If the quantity is invalid, stock is insufficient, or the wallet 
         balance is insufficient.
         - 500 Internal Server Error: If an exception occurs during the process.
+        - 503 Service Unavailable: If customer-service or inventory-service is unavailable or overloaded.
     """
     data = request.json
     quantity = data.get('quantity', 0)
@@ -378,16 +870,15 @@ def purchase_item(item_id):
         get_customer_data_func = current_app.config['GET_CUSTOMER_DATA_FUNC']
         customer = get_customer_data_func(user['username'],headers)
 
-        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id).first()
+        item = db_session.query(InventoryItem).filter(InventoryItem.id == item_id, InventoryItem.deleted_at.is_(None)).first()
         if not item:
             return jsonify({"error": "Item not found"}), 404
 
         # Check if there is enough stock and if the user has sufficient wallet balance
         total_cost = item.price_per_item * quantity
-        if item.stock_count < quantity:
-            return jsonify({'error': 'Not enough stock available'}), 400
-        if customer["wallet"] < total_cost:
-            return jsonify({'error': 'Insufficient wallet balance'}), 400
+        error = purchase_error(item.stock_count, total_cost, customer, quantity)
+        if error:
+            return jsonify({'error': error}), 400
 
         # Deduct from customer's wallet via API
         deduct_wallet_func = current_app.config['DEDUCT_WALLET_FUNC']
@@ -398,8 +889,7 @@ def purchase_item(item_id):
         remove_stock_func(item_id,quantity,headers)
 
         # Log the order in the local database
-        new_order = Order(customer_id=customer["id"], item_id=item.id, quantity=quantity)
-        db_session.add(new_order)
+        new_order = record_order(db_session, customer, item.id, item.category, item.price_per_item, quantity)
         db_session.commit()
         remove_wishlist(item_id)
         return jsonify({
@@ -407,62 +897,257 @@ def purchase_item(item_id):
             "order_id": new_order.id
         }), 200
 
+    except UpstreamUnavailableError as e:
+        db_session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db_session.rollback()
         return jsonify({'error': str(e)}), 500
     finally:
         db_session.close()
 
-@app.route('/health', methods=['GET'])
-def health_check():
+async def call_hook(func, *args):
     """
-    Health check endpoint to monitor service and dependencies.
+    Call an asynchronous purchase hook.
+
+    Parameters:
+        func (function): A coroutine function, awaited, or a plain function, run in a worker thread.
+        *args: The arguments of the call.
 
     Returns:
-        - 200 OK: If the service and all dependencies are operational.
-        - 500 Internal Server Error: If any dependency or service is not operational.
+        The result of the call.
+    """
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    return await asyncio.to_thread(func, *args)
+
+def purchase_hook(config, name):
+    """
+    Return the hook of a step of an asynchronous purchase.
+
+    Parameters:
+        config (Config): The application config.
+        name (str): The name of the synchronous hook, e.g. "DEDUCT_WALLET_FUNC".
+
+    Returns:
+        function: The `ASYNC_` override of the hook if one is set, else the synchronous hook.
+    """
+    return config.get(f'ASYNC_{name}') or config[name]
+
+def load_purchased_item(item_id):
     """
-    db_status = "unknown"
-    customer_service_status = "unknown"
-    inventory_service_status = "unknown"
+    Load the fields of an inventory item needed by a purchase.
+
+    Parameters:
+        item_id (int): The ID of the inventory item.
 
+    Returns:
+        tuple: The (name, category, price_per_item, stock_count) of the item, or None if it does not exist.
+    """
     db_session = SessionLocal()
     try:
-        db_session.execute(text("SELECT 1"))
+        return db_session.query(
+            InventoryItem.name, InventoryItem.category, InventoryItem.price_per_item, InventoryItem.stock_count
+        ).filter(InventoryItem.id == item_id, InventoryItem.deleted_at.is_(None)).first()
+    finally:
         db_session.close()
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"unavailable: {str(e)}"
 
-    # Check customer-service health
+def save_order(customer, item_id, category, unit_price, quantity):
+    """
+    Log an order in its own transaction.
+
+    Parameters:
+        customer (dict): The customer details, with their `id`.
+        item_id (int): The ID of the purchased item.
+        category (str): The category of the item.
+        unit_price (float): The price of one unit.
+        quantity (int): The units purchased.
+
+    Returns:
+        int: The ID of the new order.
+    """
+    db_session = SessionLocal()
     try:
-        response = requests.get('http://customer-service:3000/health', timeout=5)
-        if response.status_code == 200:
-            customer_service_status = "healthy"
-        else:
-            customer_service_status = f"unhealthy: {response.status_code}"
-    except Exception as e:
-        customer_service_status = f"unavailable: {str(e)}"
+        new_order = record_order(db_session, customer, item_id, category, unit_price, quantity)
+        db_session.commit()
+        return new_order.id
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        db_session.close()
+
+async def purchase_async(item_id, quantity, username, headers):
+    """
+    Run a purchase with concurrent upstream calls under a deadline.
+
+    The customer lookup and the item load do not depend on each other and run concurrently, under
+    the `PURCHASE_DEADLINE` budget. The wallet and stock are then changed one after the other, as
+    in `purchase_item`. The deadline is checked once more before the wallet is charged, but does
+    not interrupt the changes: cancelling them midway could charge the customer without removing
+    the stock or recording the order. They are bounded by the timeouts of the upstream calls.
+
+    Parameters:
+        item_id (int): The ID of the inventory item to purchase.
+        quantity (int): The units to purchase.
+        username (str): The username of the customer.
+        headers (dict): The HTTP headers of the upstream calls.
+
+    Returns:
+        tuple: The JSON payload and the status code of the response.
+
+    Raises:
+        asyncio.TimeoutError: If the deadline expires before the wallet is charged.
+        UpstreamUnavailableError: If an upstream service is unavailable or overloaded.
+    """
+    config = current_app.config
+    loop = asyncio.get_running_loop()
+    expires_at = loop.time() + config['PURCHASE_DEADLINE']
+
+    def remaining():
+        budget = expires_at - loop.time()
+        if budget <= 0:
+            raise asyncio.TimeoutError()
+        return budget
+
+    customer, item = await asyncio.wait_for(asyncio.gather(
+        call_hook(purchase_hook(config, 'GET_CUSTOMER_DATA_FUNC'), username, headers),
+        asyncio.to_thread(load_purchased_item, item_id),
+    ), remaining())
+    if item is None:
+        return {"error": "Item not found"}, 404
+
+    name, category, unit_price, stock_count = item
+    total_cost = unit_price * quantity
+    error = purchase_error(stock_count, total_cost, customer, quantity)
+    if error:
+        return {'error': error}, 400
+
+    # Past this point the purchase changes data in other services and runs to completion
+    remaining()
+    await call_hook(purchase_hook(config, 'DEDUCT_WALLET_FUNC'), username, total_cost, headers)
+    await call_hook(purchase_hook(config, 'REMOVE_STOCK_FUNC'), item_id, quantity, headers)
+
+    order_id = await asyncio.to_thread(save_order, customer, item_id, category, unit_price, quantity)
+    return {
+        "message": f"{customer['username']} successfully purchased {quantity} unit(s) of {name}.",
+        "order_id": order_id
+    }, 200
+
+@app.route('/purchase/async/<int:item_id>', methods=['POST'])
+@jwt_required()
+@role_required(['admin', 'customer'])
+def purchase_item_async(item_id):
+    """
+    Handle item purchase by a logged-in customer, with asynchronous calls to the other services.
+
+    Same contract as POST /purchase/<item_id>, but the customer lookup and the item load run
+    concurrently and are bounded by the `PURCHASE_DEADLINE` setting. The purchase runs in an event
+    loop of its own, so the view does not need Flask's async extra. The upstream calls use httpx
+    when it is installed, and the synchronous hooks in worker threads otherwise.
+
+    Endpoint:
+        POST /purchase/async/<int:item_id>
+
+    Path Parameter:
+        item_id (int): The ID of the inventory item to be purchased.
+
+    Request Body:
+        A JSON object containing the following field:
+            - quantity (int): The quantity of the item to purchase. Must be a positive integer.
+
+    Decorators:
+        @jwt_required() - Ensures the user is authenticated using a JWT token.
+        @role_required(['admin', 'customer']) - Restricts access to users with "admin" or 
+        "customer" roles.
+
+    Returns:
+        - 200 OK: If the purchase is successful. Includes a success message and the order ID.
+        - 400 Bad Request: If the quantity is invalid, stock is insufficient, or the wallet 
+        balance is insufficient.
+        - 404 Not Found: If the item does not exist.
+        - 500 Internal Server Error: If an exception occurs during the process.
+        - 503 Service Unavailable: If customer-service or inventory-service is unavailable or overloaded.
+        - 504 Gateway Timeout: If the customer and item were not loaded within the deadline. Nothing
+          was charged.
+    """
+    data = request.json
+    quantity = data.get('quantity', 0)
+
+    if not isinstance(quantity, int) or quantity <= 0:
+        return jsonify({'error': 'Invalid quantity. Must be a positive integer.'}), 400
 
-    # Check inventory-service health
     try:
-        response = requests.get('http://inventory-service:3001/health', timeout=5)
-        if response.status_code == 200:
-            inventory_service_status = "healthy"
-        else:
-            inventory_service_status = f"unhealthy: {response.status_code}"
+        user = json.loads(get_jwt_identity())
+        jwt_token = create_access_token(identity=get_jwt_identity())
+        headers = {
+            'Authorization': f'Bearer {jwt_token}',
+            'Content-Type': 'application/json'
+        }
+
+        payload, status = asyncio.run(purchase_async(item_id, quantity, user['username'], headers))
+        if status == 200:
+            remove_wishlist(item_id)
+        return jsonify(payload), status
+    except asyncio.TimeoutError:
+        return jsonify({'error': 'Purchase timed out'}), 504
+    except UpstreamUnavailableError as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        inventory_service_status = f"unavailable: {str(e)}"
+        return jsonify({'error': str(e)}), 500
+
+# Dependencies are probed in the background so health requests only read cached results
+health_monitor = HealthMonitor(
+    probes={
+        "database": check_database,
+        "customer_service": http_probe('http://customer-service:3000/health'),
+        "inventory_service": http_probe('http://inventory-service:3001/health'),
+    },
+    healthy_states={
+        "database": "connected",
+        "customer_service": "healthy",
+        "inventory_service": "healthy",
+    },
+)
+app.config['HEALTH_MONITOR'] = health_monitor
+
+@app.route('/health/live', methods=['GET'])
+def liveness_check():
+    """
+    Liveness endpoint telling whether the process is up and serving requests.
+
+    Does not touch the database or any other service.
+
+    Returns:
+        - 200 OK: Always, as long as the service answers.
+    """
+    return jsonify({"status": "alive"}), 200
+
+@app.route('/health/ready', methods=['GET'])
+@app.route('/health', methods=['GET'])
+def health_check():
+    """
+    Readiness endpoint reporting the cached status of the service dependencies.
+
+    The database, customer-service and inventory-service are probed concurrently by a
+    background thread with an overall deadline, so this endpoint never waits on them.
+
+    Returns:
+        - 200 OK: If the service and all dependencies are operational.
+        - 500 Internal Server Error: If any dependency or service is not operational.
+    """
+    monitor = current_app.config['HEALTH_MONITOR']
+    monitor.start()
+    results, age = monitor.snapshot()
 
-    # Determine overall status
-    overall_status = "healthy" if db_status == "connected" and customer_service_status == "healthy" and inventory_service_status == "healthy" else "unhealthy"
+    overall_status = "healthy" if monitor.is_ready(results) else "unhealthy"
 
-    # Return health check details
     return jsonify({
         "status": overall_status,
-        "database": db_status,
-        "customer_service": customer_service_status,
-        "inventory_service": inventory_service_status
+        "database": results.get("database", "unknown"),
+        "customer_service": results.get("customer_service", "unknown"),
+        "inventory_service": results.get("inventory_service", "unknown"),
+        "checked_seconds_ago": round(age, 3)
     }), 200 if overall_status == "healthy" else 500
 
 
@@ -47,6 +47,9 @@ def app():
     flask_app.config['GET_CUSTOMER_DATA_FUNC'] = mock_get_customer_data
     flask_app.config['REMOVE_STOCK_FUNC'] = mock_remove_stock
     flask_app.config['DEDUCT_WALLET_FUNC'] = mock_deduct_wallet
+    flask_app.config['ASYNC_GET_CUSTOMER_DATA_FUNC'] = mock_get_customer_data
+    flask_app.config['ASYNC_REMOVE_STOCK_FUNC'] = mock_remove_stock
+    flask_app.config['ASYNC_DEDUCT_WALLET_FUNC'] = mock_deduct_wallet
 
     yield flask_app
     # Teardown: Drop all tables
@@ -389,4 +392,1013 @@ def test_purchase_item_no_item(client, db_session, get_auth_tokens, ):
     )
     assert response.status_code == 404
     data = response.get_json()
-    assert data['error'] == 'Item not found'
\ No newline at end of file
+    assert data['error'] == 'Item not found'
+
+# ---------------------------
+# Tests for Health
+# ---------------------------
+def test_liveness(client):
+    """
+    Test that the liveness endpoint answers without probing dependencies.
+    """
+    response = client.get('/health/live')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'alive'
+
+def test_readiness_slow_dependency(client):
+    """
+    Test that a hanging dependency is reported as timed out within the overall deadline.
+    """
+    import time
+    from shared.health import HealthMonitor
+
+    def slow_probe():
+        time.sleep(2)
+        return "healthy"
+
+    original_monitor = client.application.config['HEALTH_MONITOR']
+    client.application.config['HEALTH_MONITOR'] = HealthMonitor(
+        probes={
+            "database": lambda: "connected",
+            "customer_service": slow_probe,
+            "inventory_service": lambda: "healthy",
+        },
+        healthy_states={"database": "connected", "customer_service": "healthy", "inventory_service": "healthy"},
+        interval=60,
+        deadline=0.2,
+    )
+    try:
+        started = time.monotonic()
+        response = client.get('/health/ready')
+        assert time.monotonic() - started < 1.5
+        assert response.status_code == 500
+        data = response.get_json()
+        assert data['status'] == 'unhealthy'
+        assert data['database'] == 'connected'
+        assert data['inventory_service'] == 'healthy'
+        assert data['customer_service'] == 'unavailable: timed out'
+    finally:
+        client.application.config['HEALTH_MONITOR'] = original_monitor
+
+
+def test_health_monitor_skips_hung_probe():
+    """
+    Test that a probe still running from an earlier round is not started again.
+    """
+    import threading
+    from shared.health import HealthMonitor
+
+    release = threading.Event()
+    calls = []
+
+    def hung_probe():
+        calls.append(1)
+        release.wait(5)
+        return "healthy"
+
+    monitor = HealthMonitor(
+        probes={"database": lambda: "connected", "customer_service": hung_probe},
+        healthy_states={"database": "connected", "customer_service": "healthy"},
+        interval=60,
+        deadline=0.1,
+    )
+    monitor.start()
+    try:
+        for _ in range(3):
+            results = monitor.refresh()
+            assert results == {"database": "connected", "customer_service": "unavailable: timed out"}
+        assert len(calls) == 1
+    finally:
+        release.set()
+
+    # Once the released call finished, the probe runs again
+    for _ in range(50):
+        assert monitor.refresh()["customer_service"] == "healthy"
+        if len(calls) > 1:
+            break
+    assert len(calls) > 1
+
+# ---------------------------
+# Tests for Circuit Breakers
+# ---------------------------
+def test_purchase_circuit_open(client, get_auth_tokens):
+    """
+    Test that purchases fail fast with 503 once customer-service keeps failing.
+    """
+    import requests
+    from shared.resilience import Upstream
+
+    calls = []
+    def failing_get_customer_data(username, headers):
+        calls.append(username)
+        raise requests.ConnectionError("customer-service unreachable")
+
+    original_func = client.application.config['GET_CUSTOMER_DATA_FUNC']
+    upstream = Upstream('customer-service', failure_threshold=2, reset_timeout=60)
+    client.application.config['GET_CUSTOMER_DATA_FUNC'] = upstream.wrap(failing_get_customer_data)
+    try:
+        for _ in range(2):
+            response = client.post(
+                f'/purchase/{1}',
+                headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'},
+                json={'quantity': 1}
+            )
+            assert response.status_code == 500
+
+        response = client.post(
+            f'/purchase/{1}',
+            headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'},
+            json={'quantity': 1}
+        )
+        assert response.status_code == 503
+        assert 'circuit open' in response.get_json()['error']
+        assert len(calls) == 2
+    finally:
+        client.application.config['GET_CUSTOMER_DATA_FUNC'] = original_func
+
+def test_circuit_half_open_probe():
+    """
+    Test that a successful half-open probe closes the circuit and client errors are not failures.
+    """
+    import time
+    import requests
+    from shared.resilience import CircuitBreaker, Upstream, CircuitOpenError
+
+    upstream = Upstream('inventory-service', failure_threshold=1, reset_timeout=0.05)
+
+    def fail():
+        raise requests.Timeout("slow")
+
+    with pytest.raises(requests.Timeout):
+        upstream.call(fail)
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        upstream.call(lambda: "ok")
+
+    time.sleep(0.06)
+    assert upstream.breaker.state == CircuitBreaker.HALF_OPEN
+    assert upstream.call(lambda: "ok") == "ok"
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+    response = requests.Response()
+    response.status_code = 400
+    def bad_request():
+        raise requests.HTTPError(response=response)
+    with pytest.raises(requests.HTTPError):
+        upstream.call(bad_request)
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+def test_bulkhead_limits_concurrent_calls():
+    """
+    Test that calls beyond the concurrent limit are refused instead of queued.
+    """
+    import threading
+    from shared.resilience import Upstream, BulkheadFullError
+
+    upstream = Upstream('customer-service', max_concurrent=1, max_wait=0.01)
+    entered, release = threading.Event(), threading.Event()
+
+    def blocking_call():
+        entered.set()
+        release.wait(2)
+
+    worker = threading.Thread(target=upstream.call, args=(blocking_call,))
+    worker.start()
+    entered.wait(2)
+    try:
+        with pytest.raises(BulkheadFullError):
+            upstream.call(lambda: "ok")
+    finally:
+        release.set()
+        worker.join()
+    assert upstream.call(lambda: "ok") == "ok"
+
+
+# ---------------------------
+# Tests for Catalog Cache
+# ---------------------------
+def test_catalog_cache_refreshes_on_version_bump(client, db_session, get_auth_tokens):
+    """
+    Test that the catalog is served from cache and rebuilt in the background after a version bump.
+    """
+    import time
+    from sales.app import catalog_cache, catalog_versions
+    from shared.versioning import CATALOG_VERSION, bump_version
+
+    catalog_cache.invalidate()
+    response = client.get('/inventory/food', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+    assert response.status_code == 200
+    names_before = [item['name'] for item in response.get_json()]
+
+    new_item = InventoryItem(name="Banana", description="A yellow banana", price_per_item=5.0, stock_count=10, category="food")
+    db_session.add(new_item)
+    db_session.commit()
+
+    # Without a version bump the cached payload is still current
+    response = client.get('/inventory/food', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+    assert [item['name'] for item in response.get_json()] == names_before
+
+    bump_version(db_session, CATALOG_VERSION)
+    db_session.commit()
+    catalog_versions.forget(CATALOG_VERSION)
+
+    # The stale payload is served once while it is rebuilt in the background
+    response = client.get('/inventory/food', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+    assert response.status_code == 200
+    for _ in range(50):
+        response = client.get('/inventory/food', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        if 'Banana' in [item['name'] for item in response.get_json()]:
+            break
+        time.sleep(0.02)
+    assert 'Banana' in [item['name'] for item in response.get_json()]
+
+    db_session.delete(new_item)
+    db_session.commit()
+
+def test_catalog_conditional_get(client, get_auth_tokens):
+    """
+    Test that the catalog and item details answer 304 to a matching If-None-Match.
+    """
+    for path in ['/inventory', f'/inventory/{1}']:
+        response = client.get(path, headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+
+        response = client.get(
+            path,
+            headers={'Authorization': f'Bearer {get_auth_tokens["user"]}', 'If-None-Match': etag}
+        )
+        assert response.status_code == 304
+        assert response.data == b''
+
+        response = client.get(
+            path,
+            headers={'Authorization': f'Bearer {get_auth_tokens["user"]}', 'If-None-Match': '"outdated"'}
+        )
+        assert response.status_code == 200
+
+def test_catalog_served_precompressed(client, db_session, get_auth_tokens):
+    """
+    Test that large catalog payloads are sent from the compressed copy kept in the cache.
+    """
+    import gzip
+    from sales.app import catalog_cache
+
+    items = [
+        InventoryItem(name=f"Bulk Item {index}", description="A bulk item", price_per_item=1.0, stock_count=1, category="clothes")
+        for index in range(60)
+    ]
+    db_session.add_all(items)
+    db_session.commit()
+    catalog_cache.invalidate()
+
+    try:
+        plain = client.get('/inventory/clothes', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        response = client.get(
+            '/inventory/clothes',
+            headers={'Authorization': f'Bearer {get_auth_tokens["user"]}', 'Accept-Encoding': 'gzip'}
+        )
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+        assert response.headers['ETag'] != plain.headers['ETag']
+
+        response = client.get(
+            '/inventory/clothes',
+            headers={
+                'Authorization': f'Bearer {get_auth_tokens["user"]}',
+                'Accept-Encoding': 'gzip',
+                'If-None-Match': response.headers['ETag']
+            }
+        )
+        assert response.status_code == 304
+    finally:
+        for item in items:
+            db_session.delete(item)
+        db_session.commit()
+        catalog_cache.invalidate()
+
+
+def test_search_inventory_ranking(client, db_session, get_auth_tokens):
+    """
+    Test that search results are ranked by relevance, paginated and validated.
+    """
+    from sales.app import catalog_feed
+
+    items = [
+        InventoryItem(name="Trail Running Shoe", description="Lightweight shoe for trail running", price_per_item=80.0, stock_count=5, category="clothes"),
+        InventoryItem(name="Running Sock", description="Breathable socks", price_per_item=8.0, stock_count=5, category="clothes"),
+        InventoryItem(name="Hiking Boot", description="Sturdy boot, also fine for a trail run", price_per_item=120.0, stock_count=5, category="clothes"),
+    ]
+    db_session.add_all(items)
+    db_session.commit()
+    catalog_feed.sync(full=True)
+
+    try:
+        response = client.get('/inventory/search?q=trail running shoes', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['total'] == 3
+        assert [result['name'] for result in data['results']] == ["Trail Running Shoe", "Running Sock", "Hiking Boot"]
+        assert data['results'][0]['id'] == items[0].id
+        assert data['results'][0]['score'] > data['results'][1]['score']
+
+        response = client.get('/inventory/search?q=trail running shoes&page=2&per_page=2', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert [result['name'] for result in response.get_json()['results']] == ["Hiking Boot"]
+
+        response = client.get('/inventory/search?q=', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 400
+        response = client.get('/inventory/search?q=shoe&per_page=500', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 400
+    finally:
+        for item in items:
+            db_session.delete(item)
+        db_session.commit()
+        catalog_feed.sync(full=True)
+
+def test_search_index_follows_catalog_changes(client, db_session, get_auth_tokens):
+    """
+    Test that item changes recorded in the catalog change log are applied to the search index.
+    """
+    from sales.app import catalog_feed
+    from shared.catalog_feed import record_item_change
+
+    def search(query):
+        catalog_feed.sync()
+        response = client.get(f'/inventory/search?q={query}', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        return [result['name'] for result in response.get_json()['results']]
+
+    assert search('teapot') == []
+
+    item = InventoryItem(name="Ceramic Teapot", description="Holds four cups", price_per_item=25.0, stock_count=3, category="electronics")
+    db_session.add(item)
+    db_session.flush()
+    record_item_change(db_session, item.id)
+    db_session.commit()
+    assert search('teapot') == ["Ceramic Teapot"]
+
+    item.name = "Ceramic Kettle"
+    record_item_change(db_session, item.id)
+    db_session.commit()
+    assert search('teapot') == []
+    assert search('kettle') == ["Ceramic Kettle"]
+
+    # Items marked as deleted disappear before they are purged
+    from datetime import datetime, timezone
+    item.deleted_at = datetime.now(timezone.utc)
+    record_item_change(db_session, item.id)
+    db_session.commit()
+    assert search('kettle') == []
+    catalog_feed.sync(full=True)
+    assert search('kettle') == []
+
+    item_id = item.id
+    db_session.delete(item)
+    record_item_change(db_session, item_id)
+    db_session.commit()
+    assert search('kettle') == []
+
+def test_catalog_changes_pruned_after_retention(db_session):
+    """
+    Test that change log entries older than the retention are deleted, in chunks, after a full load.
+    """
+    from datetime import datetime, timedelta, timezone
+    from shared.catalog_feed import CatalogFeed
+    from shared.models.catalog_change import CatalogChange
+
+    old = (datetime.now(timezone.utc) - timedelta(days=2)).replace(tzinfo=None)
+    db_session.query(CatalogChange).delete()
+    db_session.add_all([CatalogChange(item_id=index, created_at=old) for index in range(5)])
+    db_session.add(CatalogChange(item_id=99))
+    db_session.commit()
+
+    feed = CatalogFeed(batch_size=2, retention=24 * 3600)
+    feed.sync()
+    db_session.expire_all()
+    assert [change.item_id for change in db_session.query(CatalogChange).all()] == [99]
+    # The entries kept still carry the log position
+    assert feed.last_seq == db_session.query(CatalogChange.id).scalar()
+    assert feed.prune() == 0
+
+def test_browse_inventory_filters_and_facets(client, db_session, get_auth_tokens):
+    """
+    Test that catalog browsing filters items and returns facet counts.
+    """
+    from sales.app import catalog_feed
+
+    items = [
+        InventoryItem(name="Facet Watch", description="A wrist watch", price_per_item=150.0, stock_count=2, category="accessories"),
+        InventoryItem(name="Facet Belt", description="A leather belt", price_per_item=30.0, stock_count=0, category="accessories"),
+        InventoryItem(name="Facet Radio", description="A pocket radio", price_per_item=40.0, stock_count=4, category="electronics"),
+    ]
+    db_session.add_all(items)
+    db_session.commit()
+    catalog_feed.sync(full=True)
+
+    try:
+        response = client.get(
+            '/inventory/browse?category=accessories,electronics&min_price=20&max_price=200&in_stock=true',
+            headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'}
+        )
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [item['name'] for item in data['items']] == ["Facet Watch", "Facet Radio"]
+        assert data['total'] == 2
+        assert data['facets']['category']['accessories'] == 1
+        assert data['facets']['category']['electronics'] == 1
+        assert data['facets']['price'] == {"25-50": 1, "100-250": 1}
+
+        response = client.get('/inventory/browse?category=accessories', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        data = response.get_json()
+        assert data['total'] == 2
+        assert data['facets']['category']['accessories'] == 2
+        assert data['facets']['price'] == {"25-50": 1, "100-250": 1}
+
+        response = client.get('/inventory/browse?min_price=abc', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 400
+        response = client.get('/inventory/browse?min_price=50&max_price=10', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 400
+    finally:
+        for item in items:
+            db_session.delete(item)
+        db_session.commit()
+        catalog_feed.sync(full=True)
+
+def test_catalog_facets_apply_changes():
+    """
+    Test that facet counters move items between cells as they change.
+    """
+    from shared.facets import CatalogFacets
+
+    facets = CatalogFacets()
+    facets.reset([(1, "Pen", "accessories", 5.0, None, 3), (2, "Bag", "accessories", 60.0, None, 0)])
+    assert facets.counts() == {"category": {"accessories": 2}, "price": {"0-10": 1, "50-100": 1}}
+    assert facets.counts(in_stock=True) == {"category": {"accessories": 1}, "price": {"0-10": 1}}
+
+    facets.apply(2, (2, "Bag", "clothes", 1200.0, None, 1))
+    facets.apply(1, None)
+    assert facets.counts() == {"category": {"clothes": 1}, "price": {"1000+": 1}}
+    assert facets.counts(categories=["food"]) == {"category": {"clothes": 1}, "price": {}}
+
+def test_item_details_include_rating(client, db_session, get_auth_tokens):
+    """
+    Test that item details and catalog listings carry the rating summary of the item.
+    """
+    from sales.app import catalog_cache
+    from shared.models.rating_summary import ItemRatingSummary
+
+    summary = ItemRatingSummary(item_id=1, review_count=2, rating_sum=9, rating_1=0, rating_2=0, rating_3=0, rating_4=1, rating_5=1)
+    db_session.add(summary)
+    db_session.commit()
+    catalog_cache.invalidate()
+
+    try:
+        response = client.get('/inventory/1', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 200
+        assert response.get_json()['rating'] == {
+            "count": 2, "average": 4.5, "histogram": {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1}
+        }
+
+        response = client.get('/inventory', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        item = response.get_json()[0]
+        assert item['rating'] == {"count": 2, "average": 4.5}
+    finally:
+        db_session.delete(summary)
+        db_session.commit()
+        catalog_cache.invalidate()
+
+def test_leaderboards(client, db_session, get_auth_tokens):
+    """
+    Test that leaderboards rank items from the daily statistics, per window and category.
+    """
+    from datetime import timedelta
+    from sales.app import leaderboard_cache
+    from shared.leaderboards import utc_day
+    from shared.models.item_daily_stats import ItemDailyStats
+
+    items = [
+        InventoryItem(name="Board Lamp", description="A desk lamp", price_per_item=20.0, stock_count=5, category="electronics"),
+        InventoryItem(name="Board Fan", description="A desk fan", price_per_item=30.0, stock_count=5, category="electronics"),
+        InventoryItem(name="Board Plug", description="A wall plug", price_per_item=5.0, stock_count=5, category="electronics"),
+    ]
+    db_session.add_all(items)
+    db_session.commit()
+    lamp, fan, plug = items
+    today = utc_day()
+    stats = [
+        ItemDailyStats(item_id=lamp.id, day=today, units_sold=3, review_count=1, rating_sum=5),
+        ItemDailyStats(item_id=fan.id, day=today, units_sold=2, review_count=10, rating_sum=45),
+        ItemDailyStats(item_id=fan.id, day=today - timedelta(days=20), units_sold=10, review_count=0, rating_sum=0),
+        ItemDailyStats(item_id=plug.id, day=today, units_sold=0, review_count=10, rating_sum=20),
+    ]
+    db_session.add_all(stats)
+    db_session.commit()
+    leaderboard_cache.invalidate()
+
+    try:
+        def board(path):
+            response = client.get(path, headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+            assert response.status_code == 200
+            return [item['name'] for item in response.get_json()['items']]
+
+        assert board('/leaderboards/bestsellers?window=7d&category=electronics') == ["Board Lamp", "Board Fan"]
+        assert board('/leaderboards/bestsellers?window=30d&category=electronics') == ["Board Fan", "Board Lamp"]
+        # Ten 4.5-star reviews outrank a single 5-star review
+        assert board('/leaderboards/top-rated?window=7d&category=electronics') == ["Board Fan", "Board Lamp", "Board Plug"]
+
+        response = client.get('/leaderboards/bestsellers?window=1y', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 400
+        response = client.get('/leaderboards/cheapest', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+        assert response.status_code == 404
+    finally:
+        for row in stats:
+            db_session.delete(row)
+        for item in items:
+            db_session.delete(item)
+        db_session.commit()
+        leaderboard_cache.invalidate()
+
+def test_purchase_counted_in_daily_stats(client, db_session, get_auth_tokens):
+    """
+    Test that a purchase adds its quantity to today's statistics of the item.
+    """
+    from shared.leaderboards import utc_day
+    from shared.models.item_daily_stats import ItemDailyStats
+
+    def units_sold():
+        db_session.expire_all()
+        row = db_session.query(ItemDailyStats).filter_by(item_id=1, day=utc_day()).first()
+        return row.units_sold if row else 0
+
+    before = units_sold()
+    response = client.post('/purchase/1', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'}, json={'quantity': 2})
+    assert response.status_code == 200
+    assert units_sold() == before + 2
+
+def test_daily_stats_backfilled(db_session):
+    """
+    Test that the daily statistics of a database created before them are rebuilt once from its orders and reviews.
+    """
+    from datetime import date, datetime
+    from shared.backfill import marker_name, run_backfills
+    from shared.models.data_version import DataVersion
+    from shared.models.item_daily_stats import ItemDailyStats
+
+    item = InventoryItem(name="Backfill Kettle", description="A kettle", price_per_item=25.0, stock_count=5, category="electronics")
+    db_session.add(item)
+    db_session.commit()
+    rows = [
+        Order(customer_id=1, item_id=item.id, quantity=2, created_at=datetime(2024, 3, 1, 9)),
+        Order(customer_id=1, item_id=item.id, quantity=1, created_at=datetime(2024, 3, 1, 18)),
+        Order(customer_id=1, item_id=item.id, quantity=4, created_at=datetime(2024, 3, 2, 12)),
+        Review(customer_id=1, item_id=item.id, rating=4, status='approved', created_at=datetime(2024, 3, 1, 10)),
+        Review(customer_id=1, item_id=item.id, rating=2, status='approved', created_at=datetime(2024, 3, 3, 10)),
+        Review(customer_id=1, item_id=item.id, rating=1, status='flagged', created_at=datetime(2024, 3, 3, 11)),
+    ]
+    db_session.add_all(rows)
+    db_session.query(DataVersion).filter_by(name=marker_name("daily_stats")).delete()
+    db_session.commit()
+
+    try:
+        assert run_backfills(["daily_stats"]) == ["daily_stats"]
+        db_session.expire_all()
+        stats = db_session.query(ItemDailyStats).filter_by(item_id=item.id).order_by(ItemDailyStats.day).all()
+        assert [(row.day, row.units_sold, row.review_count, row.rating_sum) for row in stats] == [
+            (date(2024, 3, 1), 3, 1, 4),
+            (date(2024, 3, 2), 4, 0, 0),
+            (date(2024, 3, 3), 0, 1, 2),
+        ]
+        assert run_backfills(["daily_stats"]) == []
+    finally:
+        for row in rows:
+            db_session.delete(row)
+        db_session.query(ItemDailyStats).filter_by(item_id=item.id).delete()
+        db_session.delete(item)
+        db_session.commit()
+
+def test_revenue_rollups_backfilled(db_session):
+    """
+    Test that the revenue rollups of a database created before them are rebuilt from the prices recorded on its orders.
+    """
+    from datetime import datetime
+    from shared.backfill import marker_name, run_backfills
+    from shared.models.data_version import DataVersion
+    from shared.models.revenue_rollup import RevenueRollup
+    from shared.revenue import record_revenue
+
+    item = InventoryItem(name="Backfill Toaster", description="A toaster", price_per_item=40.0, stock_count=5, category="electronics")
+    db_session.add(item)
+    db_session.commit()
+    orders = [
+        Order(customer_id=1, item_id=item.id, quantity=2, unit_price=30.0, total_price=60.0, created_at=datetime(2024, 3, 1, 9, 5)),
+        Order(customer_id=1, item_id=item.id, quantity=1, unit_price=35.0, created_at=datetime(2024, 3, 1, 9, 40)),
+        # Placed before prices were recorded, valued at the current price
+        Order(customer_id=1, item_id=item.id, quantity=1, created_at=datetime(2024, 3, 1, 14)),
+    ]
+    db_session.add_all(orders)
+    db_session.query(DataVersion).filter_by(name=marker_name("revenue_rollups")).delete()
+    db_session.commit()
+
+    def rollups():
+        db_session.expire_all()
+        rows = db_session.query(RevenueRollup).filter_by(item_id=item.id).order_by(RevenueRollup.granularity, RevenueRollup.bucket_start).all()
+        return [(row.granularity, row.bucket_start, row.category, row.order_count, row.units, row.revenue) for row in rows]
+
+    try:
+        assert run_backfills(["revenue_rollups"]) == ["revenue_rollups"]
+        assert rollups() == [
+            ("day", datetime(2024, 3, 1), "electronics", 3, 4, 135.0),
+            ("hour", datetime(2024, 3, 1, 9), "electronics", 2, 3, 95.0),
+            ("hour", datetime(2024, 3, 1, 14), "electronics", 1, 1, 40.0),
+        ]
+        assert run_backfills(["revenue_rollups"]) == []
+
+        # Later orders add to the rebuilt buckets
+        record_revenue(db_session, item.id, "electronics", 1, 30.0, ordered_at=datetime(2024, 3, 1, 9, 50))
+        db_session.commit()
+        assert rollups()[:2] == [
+            ("day", datetime(2024, 3, 1), "electronics", 4, 5, 165.0),
+            ("hour", datetime(2024, 3, 1, 9), "electronics", 3, 4, 125.0),
+        ]
+    finally:
+        for order in orders:
+            db_session.delete(order)
+        db_session.query(RevenueRollup).filter_by(item_id=item.id).delete()
+        db_session.delete(item)
+        db_session.commit()
+
+def test_revenue_rollups(client, db_session, get_auth_tokens):
+    """
+    Test that purchases record their price and are reported from the revenue rollups.
+    """
+    def report(query=''):
+        response = client.get(f'/analytics/revenue?granularity=hour{query}', headers={'Authorization': f'Bearer {get_auth_tokens["admin"]}'})
+        assert response.status_code == 200
+        return response.get_json()
+
+    before = report('&group_by=category')['totals']
+    response = client.post('/purchase/1', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'}, json={'quantity': 3})
+    assert response.status_code == 200
+    order = db_session.query(Order).filter_by(id=response.get_json()['order_id']).first()
+    assert order.total_price == order.unit_price * 3
+
+    data = report('&group_by=category')
+    assert data['totals']['orders'] == before['orders'] + 1
+    assert data['totals']['units'] == before['units'] + 3
+    assert data['totals']['revenue'] == round(before['revenue'] + order.total_price, 2)
+    assert data['series'][-1]['category'] == 'food'
+
+    assert report('&item_id=1&group_by=item')['series'][-1]['item_id'] == 1
+    assert report('&category=electronics')['totals']['orders'] == 0
+
+    for query in ['granularity=week', 'start=yesterday', 'group_by=customer', 'start=2024-01-01&end=2024-06-01&granularity=hour']:
+        response = client.get(f'/analytics/revenue?{query}', headers={'Authorization': f'Bearer {get_auth_tokens["admin"]}'})
+        assert response.status_code == 400
+    response = client.get('/analytics/revenue', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'})
+    assert response.status_code == 403
+
+def test_purchase_async(client, db_session):
+    """
+    Test the asyncio purchase flow: concurrent lookups, mocked hooks and the deadline.
+    """
+    import asyncio
+    import time
+    from sales.app import purchase_async
+
+    app = client.application
+    item = db_session.query(InventoryItem).filter_by(name="Apple").first()
+    item.stock_count = 50
+    db_session.commit()
+
+    with app.app_context():
+        payload, status = asyncio.run(purchase_async(item.id, 1, 'user1', {}))
+        assert status == 200
+        assert 'successfully purchased 1 unit(s) of Apple.' in payload['message']
+        assert db_session.query(Order).filter_by(id=payload['order_id']).first() is not None
+
+        assert asyncio.run(purchase_async(9999, 1, 'user1', {})) == ({'error': 'Item not found'}, 404)
+        assert asyncio.run(purchase_async(item.id, 1000, 'user1', {}))[1] == 400
+
+        original = app.config['ASYNC_GET_CUSTOMER_DATA_FUNC']
+        original_deduct = app.config['ASYNC_DEDUCT_WALLET_FUNC']
+        deducted = []
+
+        async def slow_customer(username, headers):
+            await asyncio.sleep(0.5)
+            return original(username, headers)
+
+        async def deduct(username, total_cost, headers):
+            deducted.append(total_cost)
+
+        app.config['ASYNC_GET_CUSTOMER_DATA_FUNC'] = slow_customer
+        app.config['ASYNC_DEDUCT_WALLET_FUNC'] = deduct
+        app.config['PURCHASE_DEADLINE'] = 0.1
+        try:
+            started = time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                asyncio.run(purchase_async(item.id, 1, 'user1', {}))
+            assert time.monotonic() - started < 0.4
+            assert deducted == []
+
+            app.config['PURCHASE_DEADLINE'] = 2.0
+            assert asyncio.run(purchase_async(item.id, 2, 'user1', {}))[1] == 200
+            assert deducted == [100.0]
+        finally:
+            app.config['ASYNC_GET_CUSTOMER_DATA_FUNC'] = original
+            app.config['ASYNC_DEDUCT_WALLET_FUNC'] = original_deduct
+            app.config['PURCHASE_DEADLINE'] = 10.0
+
+def test_purchase_async_deadline_after_deduction(client, db_session, monkeypatch):
+    """
+    Test that a deadline expiring once the wallet is charged does not cancel the purchase.
+    """
+    import asyncio
+    from sales.app import purchase_async
+
+    app = client.application
+    item = db_session.query(InventoryItem).filter_by(name="Apple").first()
+    item.stock_count = 50
+    db_session.commit()
+    steps = []
+
+    async def slow_deduct(username, total_cost, headers):
+        await asyncio.sleep(0.3)
+        steps.append(('deduct', total_cost))
+
+    async def remove_stock(item_id, quantity, headers):
+        steps.append(('remove_stock', quantity))
+
+    monkeypatch.setitem(app.config, 'ASYNC_DEDUCT_WALLET_FUNC', slow_deduct)
+    monkeypatch.setitem(app.config, 'ASYNC_REMOVE_STOCK_FUNC', remove_stock)
+    monkeypatch.setitem(app.config, 'PURCHASE_DEADLINE', 0.1)
+
+    with app.app_context():
+        payload, status = asyncio.run(purchase_async(item.id, 1, 'user1', {}))
+    assert status == 200
+    assert steps == [('deduct', 50.0), ('remove_stock', 1)]
+    assert db_session.query(Order).filter_by(id=payload['order_id']).first() is not None
+
+def test_purchase_async_route_falls_back_to_sync_hooks(client, db_session, get_auth_tokens, monkeypatch):
+    """
+    Test the asynchronous purchase route end to end when only the synchronous hooks are set.
+    """
+    app = client.application
+    for name in ['ASYNC_GET_CUSTOMER_DATA_FUNC', 'ASYNC_REMOVE_STOCK_FUNC', 'ASYNC_DEDUCT_WALLET_FUNC']:
+        monkeypatch.setitem(app.config, name, None)
+
+    # Stand-ins for customer-service and inventory-service, changing the shared tables as they would
+    def get_customer(username, headers):
+        session = SessionLocal()
+        try:
+            customer = session.query(Customer).filter_by(username=username).one()
+            return {"id": customer.id, "username": customer.username, "wallet": customer.wallet}
+        finally:
+            session.close()
+
+    def deduct_wallet(username, total_cost, headers):
+        session = SessionLocal()
+        try:
+            session.query(Customer).filter_by(username=username).update({Customer.wallet: Customer.wallet - total_cost})
+            session.commit()
+        finally:
+            session.close()
+
+    def remove_stock(item_id, quantity, headers):
+        session = SessionLocal()
+        try:
+            session.query(InventoryItem).filter_by(id=item_id).update({InventoryItem.stock_count: InventoryItem.stock_count - quantity})
+            session.commit()
+        finally:
+            session.close()
+
+    monkeypatch.setitem(app.config, 'GET_CUSTOMER_DATA_FUNC', get_customer)
+    monkeypatch.setitem(app.config, 'DEDUCT_WALLET_FUNC', deduct_wallet)
+    monkeypatch.setitem(app.config, 'REMOVE_STOCK_FUNC', remove_stock)
+
+    item = db_session.query(InventoryItem).filter_by(name="Apple").first()
+    customer = db_session.query(Customer).filter_by(username="user1").first()
+    item.stock_count = 10
+    customer.wallet = 400.0
+    db_session.commit()
+
+    response = client.post(f'/purchase/async/{item.id}', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'}, json={'quantity': 3})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['message'] == 'user1 successfully purchased 3 unit(s) of Apple.'
+
+    db_session.expire_all()
+    order = db_session.query(Order).filter_by(id=data['order_id']).one()
+    assert (order.customer_id, order.item_id, order.quantity, order.total_price) == (customer.id, item.id, 3, item.price_per_item * 3)
+    assert customer.wallet == 400.0 - item.price_per_item * 3
+    assert item.stock_count == 7
+
+    # The wallet now covers fewer units than requested: nothing changes
+    response = client.post(f'/purchase/async/{item.id}', headers={'Authorization': f'Bearer {get_auth_tokens["user"]}'}, json={'quantity': 7})
+    assert response.status_code == 400
+    db_session.expire_all()
+    assert (customer.wallet, item.stock_count) == (400.0 - item.price_per_item * 3, 7)
+
+def test_upstream_call_async_counts_failures():
+    """
+    Test that asynchronous upstream calls go through the circuit breaker.
+    """
+    import asyncio
+    import requests
+    from shared.resilience import CircuitOpenError, Upstream
+
+    upstream = Upstream('flaky-service', failure_threshold=1, reset_timeout=60)
+
+    @upstream.wrap_async
+    async def call():
+        raise requests.ConnectionError("unreachable")
+
+    with pytest.raises(requests.ConnectionError):
+        asyncio.run(call())
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call())
+
+def test_request_profiling(app, client, get_auth_tokens, tmp_path):
+    """
+    Test that signed and sampled requests are profiled with their route and latency.
+    """
+    import pstats
+    from shared.profiling import PROFILE_HEADER, RequestProfiler, sign_profile_request
+
+    profiler = RequestProfiler('sales', directory=str(tmp_path), secret='profile-secret', max_profiles=2)
+    original = app.config['REQUEST_PROFILER']
+    app.config['REQUEST_PROFILER'] = profiler
+    headers = {'Authorization': f'Bearer {get_auth_tokens["admin"]}'}
+    try:
+        # Unsigned and wrongly signed requests are not profiled
+        client.get('/inventory/1', headers=headers)
+        client.get('/inventory/1', headers=dict(headers, **{PROFILE_HEADER: sign_profile_request('other-secret', '/inventory/1')}))
+        client.get('/inventory/1', headers=dict(headers, **{PROFILE_HEADER: sign_profile_request('profile-secret', '/inventory')}))
+        assert profiler.profiles() == []
+
+        response = client.get('/inventory/1', headers=dict(headers, **{PROFILE_HEADER: sign_profile_request('profile-secret', '/inventory/1')}))
+        profiles = profiler.profiles()
+        assert len(profiles) == 1
+        assert profiles[0]['route'] == '/inventory/<int:item_id>'
+        assert profiles[0]['status'] == response.status_code
+        assert profiles[0]['trigger'] == 'header'
+        assert profiles[0]['latency_ms'] > 0
+        assert pstats.Stats(str(tmp_path / profiles[0]['stats'])).total_calls > 0
+
+        # Sampled requests are kept only when slower than the threshold
+        profiler.secret, profiler.sample_rate, profiler.min_latency_ms = None, 1.0, 60000
+        client.get('/inventory', headers=headers)
+        assert len(profiler.profiles()) == 1
+        profiler.min_latency_ms = 0
+        client.get('/inventory', headers=headers)
+        client.get('/inventory', headers=headers)
+        profiles = profiler.profiles()
+        assert len(profiles) == 2
+        assert [details['trigger'] for details in profiles] == ['sample', 'sample']
+        assert len(list(tmp_path.glob('*.prof'))) == 2
+    finally:
+        app.config['REQUEST_PROFILER'] = original
+
+def test_metrics_endpoint(client, get_auth_tokens):
+    """
+    Test that /metrics reports per-route requests, latencies, upstream calls, the pool and caches.
+    """
+    from shared.resilience import get_upstream
+
+    headers = {'Authorization': f'Bearer {get_auth_tokens["admin"]}'}
+    client.get('/inventory', headers=headers)
+    client.get('/inventory', headers=headers)
+    client.get('/inventory/9999', headers=headers)
+    get_upstream('metrics-test-service').call(lambda: None)
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    lines = text.splitlines()
+    assert '# TYPE http_requests_total counter' in lines
+    assert any(line.startswith('http_requests_total{route="/inventory/<int:item_id>",method="GET",status="404"} ') for line in lines)
+    count = next(line for line in lines if line.startswith('http_request_duration_seconds_count{route="/inventory",method="GET"}'))
+    assert int(count.split()[-1]) >= 2
+    assert 'http_request_duration_seconds_bucket{route="/inventory",method="GET",le="+Inf"} ' + count.split()[-1] in lines
+    assert any(line.startswith('upstream_request_duration_seconds_count{upstream="metrics-test-service",outcome="success"} 1') for line in lines)
+    assert any(line.startswith('db_pool_checked_out ') for line in lines)
+    assert any(line.startswith('cache_hit_ratio{cache="catalog"} ') for line in lines)
+
+def test_metrics_registry_sharded_counts():
+    """
+    Test that counts written concurrently to the shards of a registry add up.
+    """
+    import threading
+    from shared.metrics import MetricsRegistry
+
+    registry = MetricsRegistry(buckets=(0.1, 1.0), shards=4)
+
+    def record():
+        for _ in range(1000):
+            registry.inc('jobs_total', (('kind', 'a'),))
+            registry.observe('job_seconds', (), 0.5)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counters, histograms = registry.snapshot()
+    assert counters[('jobs_total', (('kind', 'a'),))] == 8000
+    assert histograms[('job_seconds', ())] == [0, 8000, 0, 4000.0]
+    text = registry.render()
+    assert 'job_seconds_bucket{le="0.1"} 0' in text
+    assert 'job_seconds_bucket{le="1.0"} 8000' in text
+    assert 'job_seconds_bucket{le="+Inf"} 8000' in text
+    assert 'job_seconds_count 8000' in text
+
+def test_metrics_registry_multiprocess(tmp_path):
+    """
+    Test that worker processes sharing a metrics directory are reported together, exited ones included.
+    """
+    from shared.metrics import DEAD_FILE, MetricsRegistry, mark_process_dead
+
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.register_collector('pool', lambda: [('db_pool_size', 'gauge', 'Pool size.', [((), 5)])])
+    registry.inc('jobs_total', (('kind', 'a'),))
+    registry.enable_multiprocess(str(tmp_path), clear=True)
+
+    pid = os.fork()
+    if pid == 0:
+        # A worker: starts from empty counts and writes its own
+        try:
+            registry.inc('jobs_total', (('kind', 'a'),), 2)
+            registry.observe('job_seconds', (), 0.5)
+            registry.flush()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    registry.inc('jobs_total', (('kind', 'a'),), 4)
+    lines = registry.render().splitlines()
+    assert 'jobs_total{kind="a"} 7' in lines
+    assert 'job_seconds_count 1' in lines
+    assert f'db_pool_size{{pid="{pid}"}} 5' in lines
+    assert f'db_pool_size{{pid="{os.getpid()}"}} 5' in lines
+
+    # The counts of an exited worker are kept, its collected values are no longer reported
+    mark_process_dead(str(tmp_path), pid)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([DEAD_FILE, f'metrics-{os.getpid()}.json'])
+    lines = registry.render().splitlines()
+    assert 'jobs_total{kind="a"} 7' in lines
+    assert not any(line.startswith(f'db_pool_size{{pid="{pid}"}}') for line in lines)
+
+def test_server_build_options(monkeypatch):
+    """
+    Test that the gunicorn settings follow the preset of each service and the options given.
+    """
+    from shared.server import DEFAULT_PRESETS, PRESETS, SERVICES, build_options
+
+    monkeypatch.delenv("SERVER_PRESET", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert set(DEFAULT_PRESETS) == set(SERVICES)
+    for service, (_, port, _) in SERVICES.items():
+        options = build_options(service)
+        assert options["bind"] == f"0.0.0.0:{port}"
+        assert options["worker_class"] == PRESETS[DEFAULT_PRESETS[service]]["worker_class"]
+        assert options["workers"] == 3
+
+    # gevent workers patch the standard library when they start, so the app is imported after that
+    options = build_options("sales")
+    assert (options["worker_class"], options["worker_connections"], options["preload_app"]) == ("gevent", 1000, False)
+    options = build_options("customers", threads=8, workers=2, bind="127.0.0.1:9000", max_requests=500)
+    assert (options["worker_class"], options["threads"], options["preload_app"]) == ("gthread", 8, True)
+    assert (options["workers"], options["bind"], options["max_requests_jitter"]) == (2, "127.0.0.1:9000", 50)
+
+    monkeypatch.setenv("SERVER_PRESET", "sync")
+    assert build_options("sales")["worker_class"] == "sync"
+    assert build_options("sales", preset="threaded")["worker_class"] == "gthread"
+
+    for kwargs in [{"service": "billing"}, {"service": "sales", "preset": "async"},
+                   {"service": "sales", "preset": "gevent", "threads": 4},
+                   {"service": "sales", "preset": "gevent", "preload": True}]:
+        with pytest.raises(ValueError):
+            build_options(**kwargs)
+
+def test_add_missing_columns_adds_order_prices(tmp_path):
+    """
+    Orders tables created before prices were recorded get the price columns at startup.
+    """
+    from sqlalchemy import create_engine, inspect, text
+    from shared.schema import add_missing_columns
+
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old_engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, item_id INTEGER, quantity INTEGER, created_at DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO orders (id, customer_id, item_id, quantity) VALUES (1, 1, 1, 2)"))
+
+    # The other tables of the list do not exist in this database and are skipped
+    assert add_missing_columns(old_engine) == ["orders.unit_price", "orders.total_price"]
+    assert {"unit_price", "total_price"} <= {column["name"] for column in inspect(old_engine).get_columns("orders")}
+    with old_engine.connect() as connection:
+        assert connection.execute(text("SELECT unit_price, total_price FROM orders WHERE id = 1")).one() == (None, None)
+    assert add_missing_columns(old_engine) == []
+    old_engine.dispose()
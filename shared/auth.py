@@ -0,0 +1,68 @@
+import inspect
+import json
+from functools import wraps
+
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity
+
+# Importing this module has no side effect: no Flask app, JWT manager, password hasher or database
+# connection is created, so every service can use it to check roles.
+
+
+def _role_error(allowed_roles):
+    # The error response for the current JWT identity, or None if its role is allowed
+    identity = json.loads(get_jwt_identity())
+
+    if "role" not in identity:
+        return jsonify({"error": "'role' key missing in JWT identity"}), 400
+
+    user_role = identity.get("role")
+
+    if not user_role:
+        return jsonify({"error": "Missing role in JWT identity"}), 403
+
+    if user_role not in allowed_roles:
+        return jsonify({"error": "Permission denied: Insufficient role"}), 403
+
+    return None
+
+
+def role_required(allowed_roles):
+    """
+    Restrict access to specific roles.
+
+    Works on plain and `async` views.
+
+    Parameters:
+        allowed_roles (list): A list of roles that are allowed to access the decorated route.
+
+    Returns:
+        - 403 Forbidden: If the user's role is not allowed.
+        - 500 Internal Server Error: If an error occurs during role validation.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    error = _role_error(allowed_roles)
+                    if error is not None:
+                        return error
+
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    return jsonify({"error": f"Role validation failed: {str(e)}"}), 500
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                error = _role_error(allowed_roles)
+                if error is not None:
+                    return error
+
+                return func(*args, **kwargs)
+            except Exception as e:
+                return jsonify({"error": f"Role validation failed: {str(e)}"}), 500
+        return wrapper
+    return decorator
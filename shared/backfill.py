@@ -0,0 +1,110 @@
+"""
+One-time fills of the tables derived from orders and reviews.
+
+The derived tables are kept up to date as orders and reviews change, but a database created before
+a table existed starts with it empty. Each backfill rebuilds its table once per database: the
+services owning the tables run `run_backfills` at startup, and a marker row in `data_versions`
+records that the rebuild was done, so later starts skip it.
+
+Usage:
+    python -m shared.backfill [--force] [rating_summaries daily_stats revenue_rollups ...]
+
+`--force` rebuilds the tables again, e.g. after fixing rows by hand.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.exc import IntegrityError
+from shared.database import SessionLocal
+# The models referenced by relationships must be loaded before any query
+from shared.models.customer import Customer
+from shared.models.inventory import InventoryItem
+from shared.models.order import Order
+from shared.models.review import Review
+from shared.models.wishlist import Wishlist
+from shared.models.data_version import DataVersion
+from shared.leaderboards import rebuild_daily_stats
+from shared.ratings import rebuild_rating_summaries
+from shared.revenue import rebuild_revenue_rollups
+
+# The rebuild of every derived table, taking a session and leaving the commit to the caller
+BACKFILLS = {
+    "rating_summaries": rebuild_rating_summaries,
+    "daily_stats": rebuild_daily_stats,
+    "revenue_rollups": rebuild_revenue_rollups,
+}
+
+
+def marker_name(name):
+    """
+    Return the name of the `data_versions` row recording that a backfill ran.
+
+    Parameters:
+        name (str): The backfill, a key of BACKFILLS.
+
+    Returns:
+        str: The marker name, e.g. "backfill:rating_summaries".
+    """
+    return f"backfill:{name}"
+
+
+def run_backfills(names=None, session_factory=SessionLocal, force=False):
+    """
+    Run the backfills that never ran on this database.
+
+    Each backfill runs in one transaction together with the insert of its marker. Processes
+    starting at the same time race on the marker: the first one rebuilds the table, the others get
+    a duplicate key and skip it.
+
+    Parameters:
+        names (list): The backfills to run, keys of BACKFILLS. Defaults to all of them.
+        session_factory (function): Creates the database sessions.
+        force (bool): Whether to run the backfills even if they already ran.
+
+    Returns:
+        list: The names of the backfills that ran.
+    """
+    names = list(BACKFILLS) if names is None else names
+    unknown = [name for name in names if name not in BACKFILLS]
+    if unknown:
+        raise ValueError(f"Unknown backfills: {', '.join(unknown)}. Valid backfills are: {', '.join(BACKFILLS)}.")
+
+    ran = []
+    for name in names:
+        db_session = session_factory()
+        try:
+            marker = db_session.get(DataVersion, marker_name(name))
+            if marker is not None and not force:
+                continue
+            if marker is None:
+                db_session.add(DataVersion(name=marker_name(name), version=1))
+            else:
+                marker.version += 1
+            db_session.flush()
+            BACKFILLS[name](db_session)
+            db_session.commit()
+            ran.append(name)
+        except IntegrityError:
+            # Another process claimed the backfill first
+            db_session.rollback()
+        except Exception:
+            db_session.rollback()
+            raise
+        finally:
+            db_session.close()
+    return ran
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the tables derived from orders and reviews.")
+    parser.add_argument("names", nargs="*", help=f"backfills to run, all by default: {', '.join(BACKFILLS)}")
+    parser.add_argument("--force", action="store_true", help="run them even if they already ran on this database")
+    args = parser.parse_args()
+    try:
+        ran = run_backfills(args.names or None, force=args.force)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Backfilled: {', '.join(ran)}" if ran else "Nothing to backfill")
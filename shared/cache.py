@@ -0,0 +1,180 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.compression import MIN_SIZE, compress
+from shared.json_provider import dumps_bytes
+
+
+class CacheEntry:
+    """
+    A cached, pre-serialized JSON payload.
+
+    Attributes:
+        payload (bytes): The serialized JSON document.
+        version (int): The version of the data the payload was built from.
+        built_at (float): Monotonic time at which the payload was built.
+        etag (str): Strong entity tag of the payload, a hash of its bytes.
+        compressible (bool): Whether the payload is large enough to be sent compressed.
+
+    Methods:
+        encoded(encoding): Returns the payload compressed with `encoding`, compressing it only once.
+    """
+
+    def __init__(self, payload, version):
+        self.payload = payload
+        self.version = version
+        self.built_at = time.monotonic()
+        self.etag = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        self.compressible = len(payload) >= MIN_SIZE
+        self._encoded = {}
+        # gzip is accepted by nearly every client, so it is built along with the entry,
+        # off the request path when the entry is refreshed in the background
+        if self.compressible:
+            self._encoded["gzip"] = compress(payload, "gzip")
+
+    def encoded(self, encoding):
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.payload, encoding)
+        return data
+
+
+class VersionedCache:
+    """
+    In-process cache of JSON payloads invalidated by version counters.
+
+    Classes:
+        VersionedCache: Stores one serialized payload per key together with the version of the data
+        it was built from. When the version moves on, the stale payload keeps being served while a
+        background thread rebuilds it, so readers never wait on the database after the first build,
+        unless the cache is created with `stale_ok=False`.
+
+    Attributes:
+        tracker (VersionTracker): Source of the current version of every counter.
+        max_age (float): Seconds after which an entry is rebuilt even if its version did not change,
+            which bounds staleness for writes that do not bump a counter.
+        max_entries (int): Upper bound on cached keys. The oldest entries are evicted first.
+        stale_ok (bool): Whether stale entries may be served while they are rebuilt. When False, an
+            entry whose version moved on or that expired is rebuilt before it is returned, for data
+            that must not be served out of date, such as a customer's wallet.
+
+    Methods:
+        get(key, version_name, builder): Returns the entry for `key`, building it if needed.
+        changed(key, version_name): Forgets an entry and its version after a local write.
+        invalidate(key): Drops one entry, or every entry when `key` is None.
+    """
+
+    def __init__(self, tracker, max_age=300.0, max_entries=10000, workers=2, stale_ok=True):
+        self.tracker = tracker
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.stale_ok = stale_ok
+        self.workers = workers
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _build(self, key, version_name, builder):
+        version = self.tracker.get(version_name)
+        data = builder()
+        if data is None:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        entry = CacheEntry(serialize(data), version)
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+        return entry
+
+    def _refresh_in_background(self, key, version_name, builder):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cache-refresh")
+
+        def refresh():
+            try:
+                self._build(key, version_name, builder)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(refresh)
+
+    def get(self, key, version_name, builder):
+        """
+        Return the cached payload of `key`.
+
+        Parameters:
+            key (str): The cache key, e.g. "inventory:all".
+            version_name (str): The version counter covering the data of this key.
+            builder (function): Called without arguments to load the data. Returns a JSON-serializable
+                                object, or None if there is nothing to cache (e.g. item not found).
+
+        Returns:
+            CacheEntry: The current or, while it is being rebuilt, the previous entry. Always the
+                        current entry when `stale_ok` is False. None if the builder returned None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return self._build(key, version_name, builder)
+
+        if entry.version == self.tracker.get(version_name) and time.monotonic() - entry.built_at < self.max_age:
+            self.hits += 1
+            return entry
+
+        if not self.stale_ok:
+            self.misses += 1
+            return self._build(key, version_name, builder)
+
+        self.stale_hits += 1
+        self._refresh_in_background(key, version_name, builder)
+        return entry
+
+    def changed(self, key, version_name):
+        """
+        Forget an entry and the cached version of its counter.
+
+        Called by the service that wrote the data, after committing, so its next read is rebuilt
+        synchronously instead of waiting for the version tracker to expire.
+
+        Parameters:
+            key (str): The cache key covering the changed data.
+            version_name (str): The version counter that was bumped.
+        """
+        self.tracker.forget(version_name)
+        self.invalidate(key)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+def serialize(data):
+    """
+    Serialize data to compact JSON bytes.
+
+    Parameters:
+        data: A JSON-serializable object. Dates and datetimes are allowed.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    return dumps_bytes(data)
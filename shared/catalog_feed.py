@@ -0,0 +1,195 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func
+from shared.database import SessionLocal
+from shared.models.catalog_change import CatalogChange
+from shared.models.inventory import InventoryItem
+
+# Columns handed to the feed listeners, in this order
+ITEM_COLUMNS = (
+    InventoryItem.id,
+    InventoryItem.name,
+    InventoryItem.category,
+    InventoryItem.price_per_item,
+    InventoryItem.description,
+    InventoryItem.stock_count,
+)
+
+# Seconds entries of the catalog change log are kept. A reader further behind than this misses
+# entries, which its next full load heals, so this only has to exceed the rebuild intervals.
+CHANGE_RETENTION = 24 * 3600
+
+
+def record_item_change(db_session, item_id):
+    """
+    Append an item change to the catalog change log as part of the caller's transaction.
+
+    Parameters:
+        db_session (Session): The session holding the item change.
+        item_id (int): The ID of the added, updated or deleted item.
+    """
+    db_session.add(CatalogChange(item_id=item_id))
+
+
+def prune_catalog_changes(db_session, retention=CHANGE_RETENTION, chunk_size=1000):
+    """
+    Delete one chunk of the catalog change log entries older than the retention, as part of the
+    caller's transaction.
+
+    The oldest entries are read in sequence order, so the scan stops at the chunk size whether or
+    not they are old enough, and only the old ones are deleted.
+
+    Parameters:
+        db_session (Session): The session to delete in.
+        retention (float): Seconds entries are kept.
+        chunk_size (int): Maximum number of entries deleted.
+
+    Returns:
+        int: The number of entries deleted, fewer than `chunk_size` once no old entry is left.
+    """
+    ids = [change_id for (change_id,) in db_session.query(CatalogChange.id).order_by(CatalogChange.id).limit(chunk_size)]
+    if not ids:
+        return 0
+    # Entries are stored in naive UTC
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=retention)).replace(tzinfo=None)
+    return db_session.execute(
+        delete(CatalogChange).where(CatalogChange.id.in_(ids), CatalogChange.created_at < cutoff),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+
+class CatalogFeed:
+    """
+    Keeps in-memory views of the inventory catalog in sync with the catalog change log.
+
+    Classes:
+        CatalogFeed: Loads the whole catalog once, then replays the catalog change log to its
+        listeners, reloading only the items that changed.
+
+    Attributes:
+        poll_interval (float): Minimum seconds between two reads of the change log.
+        rebuild_interval (float): Seconds between two full loads. Log entries whose transaction
+            commits after a later entry was read are skipped by the replay, the full load heals that.
+        batch_size (int): Maximum number of log entries read at once.
+        retention (float): Seconds log entries are kept. Older entries are deleted after every full
+            load, None to keep them.
+
+    Listeners:
+        Objects with two methods:
+            - reset(rows): Replaces the view with `rows`, every item of the catalog.
+            - apply(item_id, row): Updates one item. `row` is None when the item was deleted,
+              including items marked as deleted and not purged yet.
+        Rows are tuples ordered like `ITEM_COLUMNS`: (id, name, category, price_per_item,
+        description, stock_count).
+
+    Methods:
+        subscribe(listener): Registers a listener.
+        sync(full): Brings every listener up to date, with a full load if `full` is True.
+        maybe_sync(): Same as `sync`, at most once per `poll_interval`.
+        prune(): Deletes the log entries older than `retention`.
+    """
+
+    def __init__(self, session_factory=SessionLocal, poll_interval=1.0, rebuild_interval=600.0, batch_size=5000,
+                 retention=CHANGE_RETENTION):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.rebuild_interval = rebuild_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.listeners = []
+        self.last_seq = None
+        self._synced_at = 0.0
+        self._bootstrapped_at = 0.0
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener):
+        with self._lock:
+            self.listeners.append(listener)
+            # A listener joining late starts from a full load like the others
+            self.last_seq = None
+
+    def _bootstrap(self, db_session):
+        # Read the log position first, so changes racing with the full load are replayed after it
+        last_seq = db_session.query(func.max(CatalogChange.id)).scalar() or 0
+        rows = [tuple(row) for row in db_session.query(*ITEM_COLUMNS).filter(InventoryItem.deleted_at.is_(None)).all()]
+        for listener in self.listeners:
+            listener.reset(rows)
+        self.last_seq = last_seq
+        self._bootstrapped_at = time.monotonic()
+
+    def _replay(self, db_session):
+        while True:
+            changes = db_session.query(CatalogChange.id, CatalogChange.item_id).filter(
+                CatalogChange.id > self.last_seq
+            ).order_by(CatalogChange.id).limit(self.batch_size).all()
+            if not changes:
+                return
+
+            item_ids = {item_id for _, item_id in changes}
+            rows = {row[0]: tuple(row) for row in db_session.query(*ITEM_COLUMNS).filter(
+                InventoryItem.id.in_(item_ids), InventoryItem.deleted_at.is_(None)
+            ).all()}
+            for item_id in item_ids:
+                for listener in self.listeners:
+                    listener.apply(item_id, rows.get(item_id))
+            self.last_seq = changes[-1][0]
+
+            if len(changes) < self.batch_size:
+                return
+
+    def sync(self, full=False):
+        bootstrapped = False
+        with self._lock:
+            db_session = self.session_factory()
+            try:
+                if full or self.last_seq is None or time.monotonic() - self._bootstrapped_at >= self.rebuild_interval:
+                    self._bootstrap(db_session)
+                    bootstrapped = True
+                else:
+                    self._replay(db_session)
+            finally:
+                db_session.close()
+            self._synced_at = time.monotonic()
+        if bootstrapped and self.retention is not None:
+            try:
+                self.prune()
+            except Exception:
+                # Pruning is retried after the next full load, it must not fail the reader
+                pass
+
+    def prune(self, max_chunks=100):
+        """
+        Delete the change log entries older than `retention`, one committed chunk at a time.
+
+        Parameters:
+            max_chunks (int): Maximum number of chunks deleted in one call.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        deleted = 0
+        for _ in range(max_chunks):
+            db_session = self.session_factory()
+            try:
+                count = prune_catalog_changes(db_session, self.retention, self.batch_size)
+                db_session.commit()
+            except Exception:
+                db_session.rollback()
+                raise
+            finally:
+                db_session.close()
+            deleted += count
+            if count < self.batch_size:
+                break
+        return deleted
+
+    def maybe_sync(self):
+        if self.last_seq is not None and time.monotonic() - self._synced_at < self.poll_interval:
+            return
+        # Readers keep using the current views while another thread reads the log,
+        # except before the first load, which every reader has to wait for
+        if self.last_seq is not None and self._lock.locked():
+            return
+        self.sync()
@@ -0,0 +1,124 @@
+import gzip
+
+from flask import request
+
+# brotli and zstandard are optional, gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Responses smaller than this are sent uncompressed, the saving would not pay for the CPU time
+MIN_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html"}
+
+
+def available_encodings():
+    """
+    List the content encodings supported in this process, preferred first.
+
+    Returns:
+        list: Encoding names among "br", "zstd" and "gzip".
+    """
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encodings):
+    """
+    Pick the content encoding to use for a request.
+
+    Parameters:
+        accept_encodings (Accept): The parsed `Accept-Encoding` header of the request.
+
+    Returns:
+        str: The best encoding accepted by the client, or None to send the payload as-is.
+    """
+    return accept_encodings.best_match(available_encodings())
+
+
+def compress(data, encoding):
+    """
+    Compress a payload.
+
+    Parameters:
+        data (bytes): The payload.
+        encoding (str): One of the names returned by `available_encodings`.
+
+    Returns:
+        bytes: The compressed payload.
+    """
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=5)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def encoded_etag(etag, encoding):
+    """
+    Derive the entity tag of a compressed representation.
+
+    Strong entity tags must differ between encodings of the same payload.
+
+    Parameters:
+        etag (str): The entity tag of the uncompressed payload.
+        encoding (str): The content encoding.
+
+    Returns:
+        str: The entity tag of the compressed payload.
+    """
+    return f"{etag}-{encoding}"
+
+
+def init_compression(app, min_size=MIN_SIZE):
+    """
+    Compress the responses of a Flask app according to the client's `Accept-Encoding`.
+
+    Responses that already have a `Content-Encoding` (e.g. served pre-compressed from a cache),
+    streamed responses, non-text responses and responses smaller than `min_size` are left untouched.
+
+    Parameters:
+        app (Flask): The application to install the middleware on.
+        min_size (int): The smallest payload, in bytes, worth compressing.
+    """
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers):
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(encoded_etag(etag, encoding))
+        return response
+
+    return compress_response
@@ -0,0 +1,118 @@
+import bisect
+import threading
+
+# Lower bounds of the price buckets, the last bucket is open-ended
+PRICE_BUCKETS = (0, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def price_bucket(price):
+    """
+    Find the price bucket of a price.
+
+    Parameters:
+        price (float): The price of an item.
+
+    Returns:
+        int: The index in `PRICE_BUCKETS` of the bucket holding the price.
+    """
+    return max(bisect.bisect_right(PRICE_BUCKETS, price) - 1, 0)
+
+
+def bucket_label(bucket):
+    """
+    Render a price bucket as "low-high", or "low+" for the last one.
+
+    Parameters:
+        bucket (int): An index in `PRICE_BUCKETS`.
+
+    Returns:
+        str: The label of the bucket.
+    """
+    if bucket == len(PRICE_BUCKETS) - 1:
+        return f"{PRICE_BUCKETS[bucket]}+"
+    return f"{PRICE_BUCKETS[bucket]}-{PRICE_BUCKETS[bucket + 1]}"
+
+
+class CatalogFacets:
+    """
+    Incrementally maintained item counts per category, price bucket and availability.
+
+    Classes:
+        CatalogFacets: Subscribes to a `CatalogFeed` and keeps, for every (category, price bucket,
+        in stock) cell, the number of items in it. Facet counts are sums over a handful of cells,
+        so they never require a scan of the catalog.
+
+    Attributes:
+        cells (dict): Maps a (category, bucket, in_stock) tuple to a number of items.
+
+    Methods:
+        reset(rows): Recounts every cell from the whole catalog.
+        apply(item_id, row): Moves one item to the cell matching its new values.
+        counts(categories, in_stock): Returns the category and price bucket facet counts.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self._cell_of = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cell(row):
+        category, price, stock_count = row[2], row[3], row[5]
+        return (category, price_bucket(price), stock_count > 0)
+
+    def reset(self, rows):
+        cells = {}
+        cell_of = {}
+        for row in rows:
+            cell = self._cell(row)
+            cells[cell] = cells.get(cell, 0) + 1
+            cell_of[row[0]] = cell
+        with self._lock:
+            self.cells = cells
+            self._cell_of = cell_of
+
+    def apply(self, item_id, row):
+        with self._lock:
+            previous = self._cell_of.pop(item_id, None)
+            if previous is not None:
+                remaining = self.cells[previous] - 1
+                if remaining:
+                    self.cells[previous] = remaining
+                else:
+                    del self.cells[previous]
+            if row is not None:
+                cell = self._cell(row)
+                self.cells[cell] = self.cells.get(cell, 0) + 1
+                self._cell_of[item_id] = cell
+
+    def counts(self, categories=None, in_stock=False):
+        """
+        Count the items per category and per price bucket.
+
+        Each facet ignores its own selection, so the client can show how many items every other
+        choice would give: category counts cover every category, and price bucket counts cover the
+        selected categories only.
+
+        Parameters:
+            categories (list): The selected categories, or None for all of them.
+            in_stock (bool): Whether to count only the items with a positive stock count.
+
+        Returns:
+            dict: `category` maps each category to its item count and `price` maps each non-empty
+                  bucket label to its item count, in increasing price order.
+        """
+        by_category = {}
+        by_bucket = {}
+        with self._lock:
+            cells = list(self.cells.items())
+        for (category, bucket, available), count in cells:
+            if in_stock and not available:
+                continue
+            by_category[category] = by_category.get(category, 0) + count
+            if categories is None or category in categories:
+                by_bucket[bucket] = by_bucket.get(bucket, 0) + count
+        return {
+            "category": dict(sorted(by_category.items())),
+            "price": {bucket_label(bucket): by_bucket[bucket] for bucket in sorted(by_bucket)},
+        }
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from sqlalchemy.sql import text
+from shared.database import SessionLocal
+
+
+class HealthMonitor:
+    """
+    Background dependency prober with cached results.
+
+    Classes:
+        HealthMonitor: Runs every registered probe in parallel on a fixed interval and keeps
+        the latest verdicts in memory so health endpoints never block on a slow dependency.
+
+    Attributes:
+        probes (dict): Maps a dependency name to a callable returning a status string.
+        healthy_states (dict): Maps a dependency name to the status string that counts as healthy.
+        interval (float): Seconds between two background probing rounds.
+        deadline (float): Overall time budget in seconds for one probing round.
+        max_age (float): Age in seconds after which cached results are considered stale.
+
+    Methods:
+        start(): Starts the background probing thread (idempotent).
+        refresh(): Runs one probing round synchronously and caches the results.
+        snapshot(): Returns the cached results, probing first if nothing is cached yet.
+        is_ready(results): Tells whether every dependency in `results` is healthy.
+    """
+
+    def __init__(self, probes, healthy_states, interval=10.0, deadline=3.0, max_age=30.0):
+        self.probes = dict(probes)
+        self.healthy_states = dict(healthy_states)
+        self.interval = interval
+        self.deadline = deadline
+        self.max_age = max_age
+        self._results = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._executor = None
+        self._running = {}
+
+    def start(self):
+        """
+        Start the background probing thread if it is not already running in this process.
+
+        The process id is tracked so a monitor inherited through `fork` starts its own thread.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(max_workers=max(len(self.probes), 1), thread_name_prefix="health-probe")
+            self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            time.sleep(self.interval)
+
+    def refresh(self):
+        """
+        Run every probe concurrently and cache the results.
+
+        Probes that have not answered when the overall deadline expires are reported as
+        "unavailable: timed out" instead of delaying the whole round. A probe still running from
+        an earlier round is not started again and is reported the same way, so a hung dependency
+        holds at most one worker of the executor and the other probes keep theirs.
+
+        Returns:
+            dict: The status string of every dependency.
+        """
+        executor = self._executor or ThreadPoolExecutor(max_workers=max(len(self.probes), 1), thread_name_prefix="health-probe")
+        futures = {}
+        with self._lock:
+            for name, probe in self.probes.items():
+                running = self._running.get(name)
+                if running is not None and not running.done():
+                    futures[name] = running
+                    continue
+                futures[name] = self._running[name] = executor.submit(probe)
+        wait(futures.values(), timeout=self.deadline)
+
+        results = {}
+        for name, future in futures.items():
+            if not future.done():
+                future.cancel()
+                results[name] = "unavailable: timed out"
+                continue
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = f"unavailable: {str(e)}"
+
+        if executor is not self._executor:
+            executor.shutdown(wait=False)
+
+        with self._lock:
+            self._results = results
+            self._checked_at = time.monotonic()
+        return results
+
+    def snapshot(self):
+        """
+        Return the cached probe results.
+
+        Returns:
+            tuple: The status string of every dependency and the age of the results in seconds.
+                   Results older than `max_age` are reported as "unknown: stale".
+        """
+        with self._lock:
+            results, checked_at = self._results, self._checked_at
+        if results is None:
+            results = self.refresh()
+            checked_at = time.monotonic()
+
+        age = time.monotonic() - checked_at
+        if age > self.max_age:
+            results = {name: "unknown: stale" for name in results}
+        return results, age
+
+    def is_ready(self, results):
+        """
+        Tell whether every dependency reported its healthy state.
+
+        Parameters:
+            results (dict): Status strings as returned by `snapshot`.
+
+        Returns:
+            bool: True if all dependencies are healthy.
+        """
+        return all(results.get(name) == state for name, state in self.healthy_states.items())
+
+
+def check_database():
+    """
+    Probe the database with a trivial query.
+
+    Returns:
+        str: "connected" if the query succeeds, raises an exception otherwise.
+    """
+    db_session = SessionLocal()
+    try:
+        db_session.execute(text("SELECT 1"))
+        return "connected"
+    finally:
+        db_session.close()
+
+
+def http_probe(url, timeout=2):
+    """
+    Build a probe checking the health endpoint of another service.
+
+    Parameters:
+        url (str): The health URL of the dependency.
+        timeout (float): The request timeout in seconds.
+
+    Returns:
+        function: A probe returning "healthy" or "unhealthy: <status code>".
+    """
+    def probe():
+        response = requests.get(url, timeout=timeout)
+        if response.status_code == 200:
+            return "healthy"
+        return f"unhealthy: {response.status_code}"
+    return probe
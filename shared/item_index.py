@@ -0,0 +1,162 @@
+import threading
+import time
+
+from sqlalchemy import func
+from shared.database import SessionLocal
+from shared.models.catalog_change import CatalogChange
+from shared.models.inventory import InventoryItem
+
+
+class ItemIndex:
+    """
+    In-memory index of existing inventory item IDs.
+
+    Classes:
+        ItemIndex: Answers "does item X exist" from a bitset of item IDs instead of a database
+        query or an HTTP call to another service.
+
+    Attributes:
+        refresh_interval (float): Seconds between two incremental refreshes. A refresh replays the
+            catalog change log since the last one, adding created items and dropping deleted ones.
+        rebuild_interval (float): Seconds between two full rebuilds, which heal log entries missed
+            by a refresh.
+        negative_ttl (float): Seconds an unknown ID is remembered as missing before the database
+            is asked again.
+        max_negative_entries (int): Upper bound on remembered unknown IDs.
+
+    Methods:
+        exists(item_id): Tells whether an item exists, falling back to the database on a miss.
+        refresh(): Applies the item changes logged since the last refresh.
+        rebuild(): Reloads every item ID from the database.
+    """
+
+    def __init__(self, session_factory=SessionLocal, refresh_interval=5.0, rebuild_interval=300.0,
+                 negative_ttl=30.0, max_negative_entries=10000):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.negative_ttl = negative_ttl
+        self.max_negative_entries = max_negative_entries
+        self._bits = bytearray()
+        self._last_seq = 0
+        self._negative = {}
+        self._refreshed_at = None
+        self._rebuilt_at = None
+        self._lock = threading.Lock()
+
+    def _contains(self, item_id):
+        byte = item_id >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (item_id & 7)))
+
+    def _add(self, bits, item_id):
+        byte = item_id >> 3
+        if byte >= len(bits):
+            bits.extend(bytes(byte - len(bits) + 1 + len(bits) // 2))
+        bits[byte] |= 1 << (item_id & 7)
+
+    def _discard(self, bits, item_id):
+        byte = item_id >> 3
+        if byte < len(bits):
+            bits[byte] &= ~(1 << (item_id & 7)) & 0xFF
+
+    def rebuild(self):
+        """
+        Reload every inventory item ID from the database and forget remembered misses.
+        """
+        db_session = self.session_factory()
+        try:
+            # Read the log position first, so changes racing with the load are replayed after it
+            last_seq = db_session.query(func.max(CatalogChange.id)).scalar() or 0
+            ids = [item_id for (item_id,) in db_session.query(InventoryItem.id).filter(InventoryItem.deleted_at.is_(None)).all()]
+        finally:
+            db_session.close()
+
+        bits = bytearray()
+        for item_id in ids:
+            self._add(bits, item_id)
+        self._bits = bits
+        self._last_seq = last_seq
+        self._negative = {}
+        self._rebuilt_at = self._refreshed_at = time.monotonic()
+
+    def refresh(self):
+        """
+        Apply the item changes recorded in the catalog change log since the last refresh.
+
+        Items created since then are added and items marked as deleted are dropped, so a deleted
+        item stops counting as existing within `refresh_interval` seconds.
+        """
+        db_session = self.session_factory()
+        try:
+            changes = db_session.query(CatalogChange.id, CatalogChange.item_id).filter(
+                CatalogChange.id > self._last_seq
+            ).order_by(CatalogChange.id).all()
+            item_ids = {item_id for _, item_id in changes}
+            live_ids = {item_id for (item_id,) in db_session.query(InventoryItem.id).filter(
+                InventoryItem.id.in_(item_ids), InventoryItem.deleted_at.is_(None)
+            ).all()} if item_ids else set()
+        finally:
+            db_session.close()
+
+        for item_id in item_ids:
+            if item_id in live_ids:
+                self._add(self._bits, item_id)
+                self._negative.pop(item_id, None)
+            else:
+                self._discard(self._bits, item_id)
+        if changes:
+            self._last_seq = changes[-1][0]
+        self._refreshed_at = time.monotonic()
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if self._rebuilt_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        # Only one thread refreshes, the others keep answering from the current bitset
+        if not self._lock.acquire(blocking=self._rebuilt_at is None):
+            return
+        try:
+            if self._rebuilt_at is None or now - self._rebuilt_at >= self.rebuild_interval:
+                self.rebuild()
+            elif now - self._refreshed_at >= self.refresh_interval:
+                self.refresh()
+        finally:
+            self._lock.release()
+
+    def exists(self, item_id):
+        """
+        Tell whether an inventory item exists.
+
+        Parameters:
+            item_id (int): The ID of the inventory item.
+
+        Returns:
+            bool: True if the item exists. Unknown IDs are checked against the database once
+                  and then remembered as missing for `negative_ttl` seconds.
+        """
+        self._maybe_refresh()
+        if self._contains(item_id):
+            return True
+
+        expires_at = self._negative.get(item_id)
+        if expires_at is not None and expires_at > time.monotonic():
+            return False
+
+        db_session = self.session_factory()
+        try:
+            found = db_session.query(InventoryItem.id).filter(
+                InventoryItem.id == item_id, InventoryItem.deleted_at.is_(None)
+            ).first() is not None
+        finally:
+            db_session.close()
+
+        # Refreshes change the bitset and the misses under the same lock
+        with self._lock:
+            if found:
+                self._add(self._bits, item_id)
+                self._negative.pop(item_id, None)
+            else:
+                if len(self._negative) >= self.max_negative_entries:
+                    self._negative = {}
+                self._negative[item_id] = time.monotonic() + self.negative_ttl
+        return found
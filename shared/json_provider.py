@@ -0,0 +1,102 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+
+from flask.json.provider import JSONProvider
+
+# orjson is optional, the standard library encoder is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """
+    Convert the values the encoders do not handle natively.
+
+    Dates and datetimes are written in ISO 8601, the format orjson uses, so responses look the same
+    whichever encoder is installed.
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        """
+        Serialize an object to compact JSON bytes.
+
+        Parameters:
+            obj: The object to serialize. Dates and datetimes are written in ISO 8601.
+
+        Returns:
+            bytes: The UTF-8 encoded JSON document.
+        """
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default)
+
+    def dumps_bytes(obj):
+        """
+        Serialize an object to compact JSON bytes.
+
+        Parameters:
+            obj: The object to serialize. Dates and datetimes are written in ISO 8601.
+
+        Returns:
+            bytes: The UTF-8 encoded JSON document.
+        """
+        return _encoder.encode(obj).encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson when it is installed.
+
+    Classes:
+        FastJSONProvider(JSONProvider): Used by `jsonify`, `request.json` and `app.json` once
+        installed with `init_json`.
+
+    Methods:
+        dumps(obj): Serializes `obj` to a JSON string.
+        loads(s): Deserializes a JSON string or bytes.
+        response(*args, **kwargs): Builds a JSON response straight from the encoded bytes.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
+
+
+def init_json(app):
+    """
+    Install the fast JSON provider on a Flask app.
+
+    Parameters:
+        app (Flask): The application whose `jsonify` and request parsing should use it.
+    """
+    app.json = FastJSONProvider(app)
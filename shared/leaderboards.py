@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Float, cast, func, insert, literal, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from shared.models.inventory import InventoryItem
+from shared.models.item_daily_stats import ItemDailyStats
+from shared.models.order import Order
+from shared.models.rating_summary import ItemRatingSummary
+from shared.models.review import Review
+
+# Leaderboard windows, in days. None covers the whole history.
+WINDOWS = {"7d": 7, "30d": 30, "all": None}
+
+# Weight, in reviews, of the average rating of all items when ranking top rated items, so an item
+# with a single 5-star review does not outrank one with hundreds of 4.8-star reviews
+PRIOR_REVIEWS = 5
+
+
+def utc_day(value=None):
+    """
+    Return the UTC day of a timestamp.
+
+    Parameters:
+        value (datetime): The timestamp. Naive timestamps are taken as UTC. None for now.
+
+    Returns:
+        date: The UTC day.
+    """
+    if value is None:
+        return datetime.now(timezone.utc).date()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def add_daily_stats(db_session, item_id, day, units_sold=0, review_count=0, rating_sum=0):
+    """
+    Add to the daily statistics of an item as part of the caller's transaction.
+
+    The row is changed with a relative UPDATE, so concurrent orders and reviews of the same item do
+    not overwrite each other. It is created on the first change of the day.
+
+    Parameters:
+        db_session (Session): The session holding the order or review change.
+        item_id (int): The ID of the inventory item.
+        day (date): The UTC day to add to.
+        units_sold (int): Units to add to the units sold.
+        review_count (int): Approved reviews to add, negative to remove.
+        rating_sum (int): Ratings to add to the rating sum, negative to remove.
+    """
+    if not (units_sold or review_count or rating_sum):
+        return
+    statement = update(ItemDailyStats).where(
+        ItemDailyStats.item_id == item_id, ItemDailyStats.day == day
+    ).values(
+        units_sold=ItemDailyStats.units_sold + units_sold,
+        review_count=ItemDailyStats.review_count + review_count,
+        rating_sum=ItemDailyStats.rating_sum + rating_sum,
+    )
+    if db_session.execute(statement).rowcount:
+        return
+    try:
+        with db_session.begin_nested():
+            db_session.add(ItemDailyStats(
+                item_id=item_id, day=day, units_sold=units_sold, review_count=review_count, rating_sum=rating_sum
+            ))
+    except IntegrityError:
+        # Another transaction created the row first
+        db_session.execute(statement)
+
+
+def record_sale(db_session, item_id, quantity):
+    """
+    Count an order in today's statistics of the item.
+
+    Parameters:
+        db_session (Session): The session holding the order.
+        item_id (int): The ID of the ordered item.
+        quantity (int): The number of units ordered.
+    """
+    add_daily_stats(db_session, item_id, utc_day(), units_sold=quantity)
+
+
+def _window_start(window):
+    days = WINDOWS[window]
+    if days is None:
+        return None
+    return utc_day() - timedelta(days=days - 1)
+
+
+def bestsellers(db_session, window="7d", category=None, limit=10):
+    """
+    Rank items by units sold over a window.
+
+    Parameters:
+        db_session (Session): The session to read with.
+        window (str): One of the keys of `WINDOWS`.
+        category (str): Restrict the ranking to one category, or None for every category.
+        limit (int): The number of items to return.
+
+    Returns:
+        list: Dictionaries with the `id`, `name`, `category` and `units_sold` of each item, best
+              seller first.
+    """
+    units = func.sum(ItemDailyStats.units_sold)
+    query = db_session.query(
+        InventoryItem.id, InventoryItem.name, InventoryItem.category, units
+    ).join(InventoryItem, InventoryItem.id == ItemDailyStats.item_id).filter(InventoryItem.deleted_at.is_(None))
+    start = _window_start(window)
+    if start is not None:
+        query = query.filter(ItemDailyStats.day >= start)
+    if category is not None:
+        query = query.filter(InventoryItem.category == category)
+    rows = query.group_by(InventoryItem.id, InventoryItem.name, InventoryItem.category).having(
+        units > 0
+    ).order_by(units.desc(), InventoryItem.id).limit(limit).all()
+    return [
+        {"id": item_id, "name": name, "category": item_category, "units_sold": int(units_sold)}
+        for item_id, name, item_category, units_sold in rows
+    ]
+
+
+def top_rated(db_session, window="all", category=None, limit=10):
+    """
+    Rank items by the average rating of their approved reviews over a window.
+
+    Averages are pulled towards the average of all ranked items by `PRIOR_REVIEWS` virtual reviews,
+    so items need several good reviews to reach the top.
+
+    Parameters:
+        db_session (Session): The session to read with.
+        window (str): One of the keys of `WINDOWS`. Reviews count towards the day they were written.
+        category (str): Restrict the ranking to one category, or None for every category.
+        limit (int): The number of items to return.
+
+    Returns:
+        list: Dictionaries with the `id`, `name`, `category`, `review_count`, `average` and ranking
+              `score` of each item, best rated first.
+    """
+    if window == "all":
+        # The rating summaries already hold the totals over the whole history
+        source = db_session.query(
+            ItemRatingSummary.item_id.label("item_id"),
+            ItemRatingSummary.review_count.label("review_count"),
+            ItemRatingSummary.rating_sum.label("rating_sum"),
+        )
+    else:
+        source = db_session.query(
+            ItemDailyStats.item_id.label("item_id"),
+            func.sum(ItemDailyStats.review_count).label("review_count"),
+            func.sum(ItemDailyStats.rating_sum).label("rating_sum"),
+        ).filter(ItemDailyStats.day >= _window_start(window)).group_by(ItemDailyStats.item_id)
+    ratings = source.subquery()
+
+    query = db_session.query(InventoryItem.id, InventoryItem.name, InventoryItem.category, ratings.c.review_count, ratings.c.rating_sum).join(
+        ratings, ratings.c.item_id == InventoryItem.id
+    ).filter(ratings.c.review_count > 0, InventoryItem.deleted_at.is_(None))
+    if category is not None:
+        query = query.filter(InventoryItem.category == category)
+
+    total_count, total_sum = query.with_entities(func.sum(ratings.c.review_count), func.sum(ratings.c.rating_sum)).one()
+    if not total_count:
+        return []
+    prior_mean = float(total_sum) / float(total_count)
+
+    score = (cast(ratings.c.rating_sum, Float) + PRIOR_REVIEWS * prior_mean) / (cast(ratings.c.review_count, Float) + PRIOR_REVIEWS)
+    rows = query.add_columns(score).order_by(score.desc(), InventoryItem.id).limit(limit).all()
+    return [
+        {
+            "id": item_id,
+            "name": name,
+            "category": item_category,
+            "review_count": int(review_count),
+            "average": round(float(rating_sum) / float(review_count), 2),
+            "score": round(float(item_score), 4),
+        }
+        for item_id, name, item_category, review_count, rating_sum, item_score in rows
+    ]
+
+
+def rebuild_daily_stats(db_session, counted_status="approved"):
+    """
+    Recompute every daily statistics row from the orders and reviews tables.
+
+    Used to fill the table on a database created before it existed. The rows are computed and
+    written by a single grouped INSERT ... SELECT, so no order or review is loaded. The caller
+    commits.
+
+    Parameters:
+        db_session (Session): The session to run the rebuild in.
+        counted_status (str): The review status counted in the ratings.
+
+    Returns:
+        int: The number of rows written.
+    """
+    order_day = func.date(Order.created_at)
+    order_days = select(
+        Order.item_id.label("item_id"),
+        order_day.label("day"),
+        func.sum(Order.quantity).label("units_sold"),
+        literal(0).label("review_count"),
+        literal(0).label("rating_sum"),
+    ).group_by(Order.item_id, order_day)
+    review_day = func.date(Review.created_at)
+    review_days = select(
+        Review.item_id, review_day, literal(0), func.count(Review.id), func.sum(Review.rating)
+    ).where(Review.status == counted_status).group_by(Review.item_id, review_day)
+    days = union_all(order_days, review_days).subquery()
+
+    db_session.query(ItemDailyStats).delete()
+    result = db_session.execute(insert(ItemDailyStats).from_select(
+        ["item_id", "day", "units_sold", "review_count", "rating_sum"],
+        select(
+            days.c.item_id, days.c.day, func.sum(days.c.units_sold), func.sum(days.c.review_count), func.sum(days.c.rating_sum)
+        ).group_by(days.c.item_id, days.c.day),
+    ))
+    return result.rowcount
@@ -0,0 +1,465 @@
+import bisect
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, request
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Number of independent counter sets, each thread or greenlet writes to one of them
+SHARDS = 16
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = "http_requests_total"
+HTTP_DURATION = "http_request_duration_seconds"
+UPSTREAM_DURATION = "upstream_request_duration_seconds"
+
+# File holding the counts of the worker processes that exited, in a shared metrics directory
+DEAD_FILE = "metrics-dead.json"
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms exposed in the Prometheus text format.
+
+    Classes:
+        MetricsRegistry: Collects request metrics on the hot path and renders them on scrape.
+
+    Every thread, or greenlet under gevent, is assigned one of `shards` counter sets on its first
+    write, round-robin. Each set has its own lock, so concurrent requests rarely wait on each
+    other; a scrape merges the sets. Values read from elsewhere (pool sizes, cache counters) are
+    gathered by collectors at scrape time instead of being updated per request.
+
+    A registry only sees the process it lives in. When a service runs several worker processes,
+    `enable_multiprocess` makes every worker write its metrics to a shared directory every
+    `flush_interval` seconds, and a scrape of any worker adds up the counters and histograms of
+    all of them, including workers that exited. Collected values are per worker and carry a "pid"
+    label. Counts of the other workers lag by up to `flush_interval` seconds.
+
+    Attributes:
+        buckets (tuple): Upper bounds, in seconds, of the histogram buckets.
+        directory (str): The directory shared by the worker processes, None for a single process.
+        flush_interval (float): Seconds between two writes of the metrics of a worker.
+
+    Methods:
+        describe(name, kind, text): Sets the type and help text of a metric.
+        inc(name, labels, value): Adds `value` to a counter.
+        observe(name, labels, value): Records a value in a histogram.
+        register_collector(key, collector): Adds a function returning metrics computed on scrape.
+        enable_multiprocess(directory, interval, clear): Shares the metrics of forked workers.
+        flush(): Writes the metrics of this process to the shared directory.
+        render(): Returns every metric in the Prometheus text format.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, shards=SHARDS):
+        self.buckets = tuple(buckets)
+        self._shards = [({}, {}, threading.Lock()) for _ in range(shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+        self._descriptions = {}
+        self._collectors = {}
+        self.directory = None
+        self.flush_interval = 5.0
+        self._flusher = None
+        self._fork_hook = False
+
+    def _shard(self):
+        index = getattr(self._local, "shard", None)
+        if index is None:
+            index = self._local.shard = next(self._next_shard) % len(self._shards)
+        return self._shards[index]
+
+    def describe(self, name, kind, text):
+        """
+        Set the type and help text of a metric.
+
+        Parameters:
+            name (str): The metric name.
+            kind (str): "counter", "gauge" or "histogram".
+            text (str): The help text.
+        """
+        self._descriptions[name] = (kind, text)
+
+    def inc(self, name, labels=(), value=1):
+        """
+        Add to a counter.
+
+        Parameters:
+            name (str): The metric name.
+            labels (tuple): The (label, value) pairs of the series.
+            value (float): The amount to add.
+        """
+        counters, _, lock = self._shard()
+        key = (name, labels)
+        with lock:
+            counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """
+        Record a value in a histogram.
+
+        Parameters:
+            name (str): The metric name.
+            labels (tuple): The (label, value) pairs of the series.
+            value (float): The observed value, in seconds for latencies.
+        """
+        _, histograms, lock = self._shard()
+        index = bisect.bisect_left(self.buckets, value)
+        key = (name, labels)
+        with lock:
+            series = histograms.get(key)
+            if series is None:
+                # One count per bucket, then the +Inf bucket and the sum of the values
+                series = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def register_collector(self, key, collector):
+        """
+        Add a function returning metrics computed on scrape.
+
+        Parameters:
+            key (str): Identifies the collector, registering the same key again replaces it.
+            collector (function): Called without arguments, returns a list of (name, kind, help,
+                                  samples) tuples where samples is a list of (labels, value).
+        """
+        self._collectors[key] = collector
+
+    def snapshot(self):
+        """
+        Merge the counter sets.
+
+        Returns:
+            tuple: The counters, mapping (name, labels) to a value, and the histograms, mapping
+                   (name, labels) to the per-bucket counts followed by the sum.
+        """
+        counters, histograms = {}, {}
+        for shard_counters, shard_histograms, lock in self._shards:
+            with lock:
+                shard_counters = list(shard_counters.items())
+                shard_histograms = [(key, list(series)) for key, series in shard_histograms.items()]
+            for key, value in shard_counters:
+                counters[key] = counters.get(key, 0) + value
+            for key, series in shard_histograms:
+                merged = histograms.setdefault(key, [0] * len(series))
+                for index, value in enumerate(series):
+                    merged[index] += value
+        return counters, histograms
+
+    def _collect(self):
+        collected = []
+        for collector in list(self._collectors.values()):
+            try:
+                collected.extend(collector())
+            except Exception:
+                # A failing source must not hide the other metrics
+                continue
+        return collected
+
+    def enable_multiprocess(self, directory, interval=5.0, clear=False):
+        """
+        Share the metrics of the worker processes forked from this one through a directory.
+
+        Meant to be called in the master process before the workers are forked. Each worker starts
+        with empty counts and writes them to the directory from a background thread.
+
+        Parameters:
+            directory (str): The directory, created if missing.
+            interval (float): Seconds between two writes of the metrics of a worker.
+            clear (bool): Whether to delete the metrics left in the directory by an earlier run.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if clear:
+            for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+                os.unlink(path)
+        self.directory = directory
+        self.flush_interval = interval
+        if not self._fork_hook:
+            os.register_at_fork(after_in_child=self._after_fork)
+            self._fork_hook = True
+
+    def _after_fork(self):
+        # The counts recorded before the fork belong to the parent, and its threads are not copied
+        self._shards = [({}, {}, threading.Lock()) for _ in range(len(self._shards))]
+        self._local = threading.local()
+        self._flusher = None
+        if self.directory is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="metrics-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def flush(self, snapshot=None, collected=None):
+        """
+        Write the metrics of this process to the shared directory, if there is one.
+
+        Parameters:
+            snapshot (tuple): The counters and histograms to write, as returned by `snapshot`.
+                              Taken now by default.
+            collected (list): The collected metrics to write. Collected now by default.
+        """
+        if self.directory is None:
+            return
+        counters, histograms = snapshot if snapshot is not None else self.snapshot()
+        _write_state(
+            os.path.join(self.directory, f"metrics-{os.getpid()}.json"), counters, histograms,
+            self._collect() if collected is None else collected,
+        )
+
+    def _merge_directory(self):
+        counters, histograms, collected = {}, {}, []
+        for path in sorted(glob.glob(os.path.join(self.directory, "metrics-*.json"))):
+            try:
+                state = _read_state(path)
+            except (OSError, ValueError):
+                # Removed by the master after its worker exited, or not written yet
+                continue
+            _merge_counts(counters, histograms, state)
+            pid_label = (("pid", str(state["pid"])),) if state.get("pid") is not None else ()
+            for name, kind, text, samples in state["collected"]:
+                collected.append((name, kind, text, [(labels + pid_label, value) for labels, value in samples]))
+        return counters, histograms, collected
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format.
+
+        With a shared directory, the metrics of every worker process are rendered.
+
+        Returns:
+            str: The exposition, one block per metric.
+        """
+        counters, histograms = self.snapshot()
+        collected = self._collect()
+        if self.directory is not None:
+            # This process writes first, so its own counts are current
+            self.flush((counters, histograms), collected)
+            counters, histograms, collected = self._merge_directory()
+
+        families = {}
+        for (name, labels), value in sorted(counters.items()):
+            families.setdefault(name, []).append(_sample_line(name, labels, value))
+        for (name, labels), series in sorted(histograms.items()):
+            lines = families.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                lines.append(_sample_line(f"{name}_bucket", labels + (("le", _format_bound(bound)),), cumulative))
+            lines.append(_sample_line(f"{name}_sum", labels, series[-1]))
+            lines.append(_sample_line(f"{name}_count", labels, cumulative))
+
+        descriptions = dict(self._descriptions)
+        for name, kind, text, samples in collected:
+            descriptions.setdefault(name, (kind, text))
+            families.setdefault(name, []).extend(_sample_line(name, labels, value) for labels, value in samples)
+
+        output = []
+        for name in sorted(families):
+            kind, text = descriptions.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(families[name])
+        return "\n".join(output) + "\n"
+
+
+def _labels(pairs):
+    return tuple(tuple(pair) for pair in pairs)
+
+
+def _write_state(path, counters, histograms, collected, pid=True):
+    state = {
+        "pid": os.getpid() if pid else None,
+        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        "histograms": [[name, labels, series] for (name, labels), series in histograms.items()],
+        "collected": [[name, kind, text, [[labels, value] for labels, value in samples]] for name, kind, text, samples in collected],
+    }
+    # Readers never see a partly written file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as state_file:
+        json.dump(state, state_file)
+    os.replace(temporary, path)
+
+
+def _read_state(path):
+    with open(path) as state_file:
+        state = json.load(state_file)
+    return {
+        "pid": state.get("pid"),
+        "counters": [(name, _labels(labels), value) for name, labels, value in state["counters"]],
+        "histograms": [(name, _labels(labels), series) for name, labels, series in state["histograms"]],
+        "collected": [(name, kind, text, [(_labels(labels), value) for labels, value in samples]) for name, kind, text, samples in state["collected"]],
+    }
+
+
+def _merge_counts(counters, histograms, state):
+    for name, labels, value in state["counters"]:
+        counters[(name, labels)] = counters.get((name, labels), 0) + value
+    for name, labels, series in state["histograms"]:
+        merged = histograms.setdefault((name, labels), [0] * len(series))
+        for index, value in enumerate(series):
+            merged[index] += value
+
+
+def mark_process_dead(directory, pid):
+    """
+    Fold the counts of an exited worker into the totals of the exited workers.
+
+    Called by the master process when a worker exits, so counters keep growing across worker
+    restarts while the collected values of the worker, e.g. its pool size, stop being reported.
+
+    Parameters:
+        directory (str): The shared metrics directory.
+        pid (int): The process ID of the worker.
+    """
+    path = os.path.join(directory, f"metrics-{pid}.json")
+    try:
+        state = _read_state(path)
+    except (OSError, ValueError):
+        return
+    dead_path = os.path.join(directory, DEAD_FILE)
+    counters, histograms = {}, {}
+    try:
+        _merge_counts(counters, histograms, _read_state(dead_path))
+    except (OSError, ValueError):
+        pass
+    _merge_counts(counters, histograms, state)
+    _write_state(dead_path, counters, histograms, [], pid=False)
+    os.unlink(path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _sample_line(name, labels, value):
+    if labels:
+        name += "{" + ",".join(f'{label}="{_escape(label_value)}"' for label, label_value in labels) + "}"
+    return f"{name} {value}"
+
+
+# One registry per process, shared by the app and the upstream guards
+metrics = MetricsRegistry()
+metrics.describe(HTTP_REQUESTS, "counter", "Requests handled, by route, method and status code.")
+metrics.describe(HTTP_DURATION, "histogram", "Time spent handling requests, by route and method.")
+metrics.describe(UPSTREAM_DURATION, "histogram", "Time spent in calls to other services, by upstream and outcome.")
+
+
+def pool_collector(engine):
+    """
+    Build a collector reporting the connection pool of a database engine.
+
+    Parameters:
+        engine (Engine): The SQLAlchemy engine.
+
+    Returns:
+        function: The collector, reporting the pool size and the connections checked out, idle and
+                  in overflow, for the pools that track them.
+    """
+    def collect():
+        pool = engine.pool
+        gauges = (
+            ("db_pool_size", "Connections kept open by the pool.", "size"),
+            ("db_pool_checked_out", "Connections currently in use.", "checkedout"),
+            ("db_pool_checked_in", "Idle connections in the pool.", "checkedin"),
+            ("db_pool_overflow", "Connections open beyond the pool size.", "overflow"),
+        )
+        # The pool counts overflow from minus its size, negative while it is not full
+        return [
+            (name, "gauge", text, [((), max(getattr(pool, method)(), 0) if method == "overflow" else getattr(pool, method)())])
+            for name, text, method in gauges if hasattr(pool, method)
+        ]
+    return collect
+
+
+def track_cache(name, cache):
+    """
+    Report the hits and misses of a `VersionedCache`.
+
+    Stale hits are served from the cache while it is rebuilt in the background, so they count as
+    hits in the hit ratio.
+
+    Parameters:
+        name (str): The name of the cache in the metrics, e.g. "catalog".
+        cache (VersionedCache): The cache.
+    """
+    def collect():
+        hits, stale_hits, misses = cache.hits, cache.stale_hits, cache.misses
+        total = hits + stale_hits + misses
+        labels = (("cache", name),)
+        return [
+            ("cache_requests_total", "counter", "Cache lookups, by cache and result.", [
+                (labels + (("result", "hit"),), hits),
+                (labels + (("result", "stale"),), stale_hits),
+                (labels + (("result", "miss"),), misses),
+            ]),
+            ("cache_hit_ratio", "gauge", "Share of cache lookups served from the cache since start.", [
+                (labels, round((hits + stale_hits) / total, 4) if total else 0.0),
+            ]),
+        ]
+    metrics.register_collector(f"cache:{name}", collect)
+
+
+def init_metrics(app, engine=None, registry=metrics):
+    """
+    Count the requests of a Flask app and expose the metrics at GET /metrics.
+
+    Requests are labelled with their route pattern, not their path, so the number of series stays
+    bounded; requests matching no route are labelled "unmatched".
+
+    Parameters:
+        app (Flask): The application to instrument.
+        engine (Engine): The database engine whose connection pool is reported.
+        registry (MetricsRegistry): The registry to record to.
+    """
+    if engine is not None:
+        registry.register_collector(f"pool:{id(engine)}", pool_collector(engine))
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_response_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request_metrics(error=None):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        status = g.pop("metrics_status", 500)
+        registry.inc(HTTP_REQUESTS, (("route", route), ("method", request.method), ("status", str(status))))
+        registry.observe(HTTP_DURATION, (("route", route), ("method", request.method)), time.perf_counter() - started)
+
+    @app.route('/metrics', methods=['GET'])
+    def expose_metrics():
+        """
+        Expose the metrics of the service.
+
+        Endpoint:
+            GET /metrics
+
+        Returns:
+            - 200 OK: Every metric in the Prometheus text format.
+        """
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return expose_metrics
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from shared.models.base import Base
+
+class CatalogChange(Base):
+    """
+    CatalogChange model definition.
+
+    Classes:
+        CatalogChange(Base): One entry of the append-only log of inventory item changes.
+
+    Attributes:
+        id (int): The sequence number of the change. Auto-incremented primary key.
+        item_id (int): The ID of the inventory item that was added, updated or deleted. Not a foreign
+                       key, since the entry outlives a deleted item.
+        created_at (datetime): The timestamp when the change was recorded. Defaults to the current timestamp.
+
+    Inventory-service appends an entry in the same transaction as every item change. Services keeping
+    derived views of the catalog (search index, facet counts) read the entries after the last
+    sequence number they processed and reload only the items listed.
+    """
+    __tablename__ = 'catalog_changes'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    item_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, Integer, String 
+from sqlalchemy import Column, Float, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from shared.models.base import Base
 from shared.models.order import Order  # Import the Order class
@@ -21,6 +21,8 @@ class Customer(Base):
         marital_status (str): The marital status of the customer. Valid values: "single", "married".
         wallet (float): The wallet balance of the customer. Defaults to 0.0.
         role (str): The role of the customer. Defaults to "customer".
+        deleted_at (datetime): The timestamp when the account was deleted. Set while its data is
+                               purged in the background, after which the row itself is deleted.
 
     Relationships:
         reviews: A one-to-many relationship with the `Review` model.
@@ -41,6 +43,7 @@ class Customer(Base):
     marital_status = Column(String(10), nullable=False) 
     wallet = Column(Float, nullable=False, default=0.0)
     role = Column(String(100), default="customer")
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
 
     reviews = relationship("Review", back_populates="customer")
     previous_orders = relationship("Order", back_populates="customer", cascade="all, delete-orphan")
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String
+from shared.models.base import Base
+
+class DataVersion(Base):
+    """
+    DataVersion model definition.
+
+    Classes:
+        DataVersion(Base): A named counter that goes up every time the data it covers changes.
+
+    Attributes:
+        name (str): The name of the data set, e.g. "catalog" or "catalog:item:42". Primary key.
+        version (int): The current version of the data set. Starts at 1 on the first change.
+
+    Services that cache data read these counters to tell whether their cached copy is still current,
+    while the services that write the data bump them in the same transaction as the change.
+    """
+    __tablename__ = 'data_versions'
+
+    name = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float , Text
+from sqlalchemy import Column, Integer, String, Float , Text, Index, DateTime
 from shared.models.base import Base
 from sqlalchemy.orm import relationship
 
@@ -16,6 +16,8 @@ class InventoryItem(Base):
         price_per_item (float): The price of a single unit of the inventory item. Must be a positive number.
         description (str): A textual description of the item. Optional but must be at least 5 characters if provided.
         stock_count (int): The number of units available in stock. Must be a non-negative integer.
+        deleted_at (datetime): The timestamp when the item was deleted. Deleted items are hidden from
+                               the catalog while their orders and reviews are purged in the background.
 
     Relationships:
         reviews: A one-to-many relationship with the `Review` model.
@@ -27,6 +29,10 @@ class InventoryItem(Base):
             Validates the inventory item data against the required fields and constraints.
     """
     __tablename__ = 'inventory_item'
+    __table_args__ = (
+        # Serves catalog browsing filtered by category and price range
+        Index('ix_inventory_item_category_price', 'category', 'price_per_item'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False)
@@ -34,6 +40,7 @@ class InventoryItem(Base):
     price_per_item = Column(Float, nullable=False)
     description = Column(Text(400), nullable=True)
     stock_count = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
 
     reviews = relationship("Review", back_populates="inventory_item")
     orders = relationship("Order", back_populates="inventory_item")
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, Date, Index
+from shared.models.base import Base
+
+class ItemDailyStats(Base):
+    """
+    ItemDailyStats model definition.
+
+    Classes:
+        ItemDailyStats(Base): The sales and approved ratings of an inventory item over one day.
+
+    Attributes:
+        item_id (int): The ID of the inventory item. Part of the primary key. Not a foreign key, so the
+                       row can be written without locking the item row.
+        day (date): The UTC day covered by the row. Part of the primary key.
+        units_sold (int): The number of units ordered that day.
+        review_count (int): The number of approved reviews written that day.
+        rating_sum (int): The sum of the ratings of those reviews.
+
+    Sales-service and review-service add to the row of the day in the same transaction as each order
+    and review change, so leaderboards over the last days only sum a few rows per item instead of
+    scanning orders and reviews.
+    """
+    __tablename__ = 'item_daily_stats'
+    __table_args__ = (
+        Index('ix_item_daily_stats_day', 'day'),
+    )
+
+    item_id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+    units_sold = Column(Integer, nullable=False, default=0)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float
 from sqlalchemy.orm import relationship
 from shared.models.base import Base
 from sqlalchemy.sql import func
@@ -15,6 +15,8 @@ class Order(Base):
         customer_id (int): The ID of the customer who placed the order. Foreign key referencing the `customers` table.
         item_id (int): The ID of the inventory item ordered. Foreign key referencing the `inventory_item` table.
         quantity (int): The number of units ordered. Must be a positive integer.
+        unit_price (float): The price of one unit when the order was placed. None for orders placed before it was recorded.
+        total_price (float): The amount charged for the order, `unit_price` times `quantity`.
         created_at (datetime): The timestamp when the order was created. Defaults to the current timestamp.
 
     Relationships:
@@ -26,6 +28,8 @@ class Order(Base):
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)  
     item_id = Column(Integer, ForeignKey('inventory_item.id'), nullable=False) 
     quantity = Column(Integer, nullable=False)  
+    unit_price = Column(Float, nullable=True)
+    total_price = Column(Float, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())  
 
     # Relationships
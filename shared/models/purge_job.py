@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from shared.models.base import Base
+
+class PurgeJob(Base):
+    """
+    PurgeJob model definition.
+
+    Classes:
+        PurgeJob(Base): The progress of the background deletion of a record and its dependent rows.
+
+    Attributes:
+        id (int): The unique identifier for the job. Auto-incremented primary key.
+        kind (str): The kind of record purged, e.g. "customer".
+        target_id (int): The ID of the purged record. Not a foreign key, since the job outlives it.
+        label (str): A readable name of the record, e.g. the username of a customer.
+        status (str): "pending" until the first chunk is deleted, then "running", then "done".
+        step (str): The dependent table being purged, e.g. "orders".
+        rows_deleted (int): The number of rows deleted so far.
+        error (str): The last error met by the job, cleared by the next successful chunk.
+        created_at (datetime): The timestamp when the deletion was requested. Defaults to the current timestamp.
+        updated_at (datetime): The timestamp of the last progress. Automatically updated.
+        finished_at (datetime): The timestamp when the record itself was deleted.
+    """
+    __tablename__ = 'purge_jobs'
+    __table_args__ = (
+        # Serves the purge workers looking for unfinished jobs
+        Index('ix_purge_jobs_status', 'status'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(50), nullable=False)
+    target_id = Column(Integer, nullable=False)
+    label = Column(String(100), nullable=True)
+    status = Column(String(20), nullable=False, default="pending")
+    step = Column(String(50), nullable=True)
+    rows_deleted = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
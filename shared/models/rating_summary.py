@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer
+from shared.models.base import Base
+
+class ItemRatingSummary(Base):
+    """
+    ItemRatingSummary model definition.
+
+    Classes:
+        ItemRatingSummary(Base): The aggregated ratings of the approved reviews of an inventory item.
+
+    Attributes:
+        item_id (int): The ID of the inventory item. Primary key. Not a foreign key, so the summary
+                       can be written without locking the item row.
+        review_count (int): The number of approved reviews.
+        rating_sum (int): The sum of the ratings of the approved reviews.
+        rating_1 ... rating_5 (int): The number of approved reviews with each rating.
+
+    Review-service adjusts the summary in the same transaction as every review change, so reading the
+    average rating or the rating histogram of an item never requires a scan of its reviews.
+    """
+    __tablename__ = 'item_rating_summaries'
+
+    item_id = Column(Integer, primary_key=True, autoincrement=False)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from shared.models.base import Base
+
+class RevenueRollup(Base):
+    """
+    RevenueRollup model definition.
+
+    Classes:
+        RevenueRollup(Base): The orders of an inventory item over one hour or one day.
+
+    Attributes:
+        granularity (str): "hour" or "day". Part of the primary key.
+        bucket_start (datetime): The UTC start of the hour or day, without time zone. Part of the primary key.
+        item_id (int): The ID of the ordered item. Part of the primary key. Not a foreign key, so
+                       the history outlives a deleted item.
+        category (str): The category of the item when the orders were placed.
+        order_count (int): The number of orders.
+        units (int): The number of units ordered.
+        revenue (float): The amount charged for the orders.
+
+    Sales-service adds every order to its hour and day rows in the same transaction as the order,
+    so revenue reports read a bounded number of rollup rows instead of scanning orders.
+    """
+    __tablename__ = 'revenue_rollups'
+    __table_args__ = (
+        # Serves per-category reports over a time range
+        Index('ix_revenue_rollups_category', 'granularity', 'category', 'bucket_start'),
+    )
+
+    granularity = Column(String(10), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    item_id = Column(Integer, primary_key=True, autoincrement=False)
+    category = Column(String(20), nullable=False)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Enum, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from shared.models.base import Base
@@ -16,7 +16,7 @@ class Review(Base):
         item_id (int): The ID of the inventory item being reviewed. Foreign key referencing the `inventory_item` table.
         rating (int): The rating given by the customer. Must be an integer between 1 and 5.
         comment (str): Optional comment provided by the customer.
-        status (str): The status of the review. Valid options: "approved", "normal", "flagged".
+        status (str): The status of the review. Valid options: "pending", "approved", "normal", "flagged".
         created_at (datetime): The timestamp when the review was created. Defaults to the current timestamp.
         updated_at (datetime): The timestamp when the review was last updated. Automatically updated.
 
@@ -29,6 +29,10 @@ class Review(Base):
             Validates review data against required fields and constraints.
     """
     __tablename__ = 'reviews'
+    __table_args__ = (
+        # Serves the moderation queue, listed per status oldest first with keyset pagination
+        Index('ix_reviews_status_created_at', 'status', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)  
@@ -56,10 +60,10 @@ class Review(Base):
             Validation Rules:
                 - `rating` (required): Must be an integer between 1 and 5.
                 - `comment` (optional): Must be a string or null.
-                - `status` (optional): Must be one of "approved", "normal", or "flagged".
+                - `status` (optional): Must be one of "pending", "approved", "normal", or "flagged".
         """
         required_fields = ["rating"]
-        valid_statuses = ["approved", "normal" ,"flagged"]
+        valid_statuses = ["pending", "approved", "normal" ,"flagged"]
 
         # Check for missing fields
         for field in required_fields:
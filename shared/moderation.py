@@ -0,0 +1,213 @@
+import importlib.util
+import json
+import os
+from string import ascii_letters, digits
+
+# Leetspeak substitutions accepted for each letter of a censor word, as in better_profanity
+CHARS_MAPPING = {
+    "a": ("a", "@", "*", "4"),
+    "i": ("i", "*", "l", "1"),
+    "o": ("o", "*", "0", "@"),
+    "u": ("u", "*", "v"),
+    "v": ("v", "*", "u"),
+    "l": ("l", "1"),
+    "e": ("e", "*", "3"),
+    "s": ("s", "$", "5"),
+    "t": ("t", "7"),
+}
+
+DEAD = 0
+
+
+def _package_file(filename):
+    # Read the data files of better_profanity without importing it: its package import builds a
+    # word set of several megabytes that this module replaces
+    spec = importlib.util.find_spec("better_profanity")
+    if spec is None or not spec.submodule_search_locations:
+        raise ImportError("better_profanity is required for its censor word list")
+    return os.path.join(list(spec.submodule_search_locations)[0], filename)
+
+
+def default_words():
+    """
+    Read the censor word list shipped with better_profanity.
+
+    Returns:
+        list: The censor words, lowercase.
+    """
+    with open(_package_file("profanity_wordlist.txt"), encoding="utf-8") as wordlist:
+        return [row.strip().lower() for row in wordlist if row.strip()]
+
+
+def default_word_characters():
+    """
+    Build the set of characters that form words, the others separate words.
+
+    Matches better_profanity: ASCII letters, digits, the leetspeak symbols @, $ and *, quotes and
+    every alphabetic Unicode character.
+
+    Returns:
+        frozenset: The word characters.
+    """
+    characters = set(ascii_letters) | set(digits) | {"@", "$", "*", '"', "'"}
+    with open(_package_file("alphabetic_unicode.json"), encoding="utf-8") as unicode_file:
+        characters.update(json.load(unicode_file))
+    return frozenset(characters)
+
+
+class ProfanityFilter:
+    """
+    Profanity detection compiled into a single automaton.
+
+    Classes:
+        ProfanityFilter: Gives the same verdicts as `better_profanity.profanity.contains_profanity`
+        without generating variants of every word at check time.
+
+    Like better_profanity, the filter matches whole words: a comment is profane when a word, or a
+    word joined to the following words (directly or with the separators between them), equals a
+    censor word, each letter of the censor word standing for itself or one of its leetspeak
+    substitutions.
+
+    At construction, the censor words are stored in a trie whose nodes are then determinized over
+    the substitutions (a text character such as "*" or "1" may stand for several letters), giving
+    a deterministic automaton with one transition per character. Since matches are anchored at word
+    boundaries, no failure links are needed: the automaton restarts at every word, and a run stops
+    as soon as it reaches the dead state, which for ordinary words happens within a few characters.
+    A comment is therefore scanned in time linear in its length.
+
+    Attributes:
+        max_joined_words (int): How many following words may be joined to a word, the largest
+            number of separator characters in a censor word.
+        state_count (int): The number of automaton states.
+
+    Methods:
+        contains_profanity(text): Returns True if the text contains a censor word.
+    """
+
+    def __init__(self, words=None, char_map=None, word_characters=None):
+        words = default_words() if words is None else [word.lower() for word in words]
+        char_map = CHARS_MAPPING if char_map is None else char_map
+        self.word_characters = default_word_characters() if word_characters is None else frozenset(word_characters)
+
+        self.max_joined_words = 1
+        for word in words:
+            separators = sum(1 for char in word if char not in self.word_characters)
+            self.max_joined_words = max(self.max_joined_words, separators)
+
+        self._compile(set(words), char_map)
+
+    def _compile(self, words, char_map):
+        # Trie of the censor words
+        children = [{}]
+        terminal = [False]
+        for word in words:
+            node = 0
+            for char in word:
+                child = children[node].get(char)
+                if child is None:
+                    child = len(children)
+                    children.append({})
+                    terminal.append(False)
+                    children[node][char] = child
+                node = child
+            terminal[node] = True
+
+        # The censor word letters each text character may stand for
+        pattern_chars = {char for node_children in children for char in node_children}
+        stands_for = {}
+        for letter in pattern_chars:
+            for substitute in char_map.get(letter, (letter,)):
+                stands_for.setdefault(substitute, set()).add(letter)
+
+        # Subset construction, state 0 is the dead state
+        start = frozenset([0])
+        state_ids = {frozenset(): DEAD, start: 1}
+        transitions = [{}, {}]
+        accepting = [False, False]
+        pending = [start]
+        while pending:
+            nodes = pending.pop()
+            state = state_ids[nodes]
+            for char, letters in stands_for.items():
+                next_nodes = frozenset(
+                    children[node][letter] for node in nodes for letter in letters if letter in children[node]
+                )
+                if not next_nodes:
+                    continue
+                next_state = state_ids.get(next_nodes)
+                if next_state is None:
+                    next_state = state_ids[next_nodes] = len(transitions)
+                    transitions.append({})
+                    accepting.append(any(terminal[node] for node in next_nodes))
+                    pending.append(next_nodes)
+                transitions[state][char] = next_state
+
+        self._transitions = transitions
+        self._accepting = accepting
+        self.state_count = len(transitions)
+
+    def _run(self, state, text):
+        transitions = self._transitions
+        for char in text:
+            state = transitions[state].get(char, DEAD)
+            if state == DEAD:
+                return DEAD
+        return state
+
+    def _split(self, text):
+        # Words as (start, end) offsets, with end excluded
+        words = []
+        start = None
+        word_characters = self.word_characters
+        for index, char in enumerate(text):
+            if char in word_characters:
+                if start is None:
+                    start = index
+            elif start is not None:
+                words.append((start, index))
+                start = None
+        if start is not None:
+            words.append((start, len(text)))
+        return words
+
+    def contains_profanity(self, text):
+        """
+        Check a text for profanity.
+
+        Parameters:
+            text (str): The text to check. Other values are converted to strings.
+
+        Returns:
+            bool: True if the text contains a censor word.
+        """
+        if not isinstance(text, str):
+            text = str(text)
+        words = self._split(text)
+        # better_profanity leaves texts whose first word starts on the last character unchecked,
+        # and never joins a one-character word ending the text to the previous words
+        if not words or words[0][0] >= len(text) - 1:
+            return False
+        last = len(text) - 1
+
+        accepting = self._accepting
+        for position, (start, end) in enumerate(words):
+            state = self._run(1, text[start:end].lower())
+            if state == DEAD:
+                continue
+            if accepting[state]:
+                return True
+
+            joined = separated = state
+            for next_start, next_end in words[position + 1:position + 1 + self.max_joined_words]:
+                if next_start >= last:
+                    break
+                if joined != DEAD:
+                    joined = self._run(joined, text[next_start:next_end].lower())
+                if separated != DEAD:
+                    separated = self._run(separated, text[end:next_end].lower())
+                if accepting[joined] or accepting[separated]:
+                    return True
+                if joined == DEAD and separated == DEAD:
+                    break
+                end = next_end
+        return False
@@ -0,0 +1,258 @@
+import argparse
+import cProfile
+import glob
+import hashlib
+import hmac
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import current_app, g, request
+
+# Requests carrying a valid signature in this header are always profiled
+PROFILE_HEADER = "X-Profile-Request"
+
+# Signatures older than this many seconds are refused, so a leaked header is only useful briefly
+MAX_SIGNATURE_AGE = 300
+
+
+def sign_profile_request(secret, path, timestamp=None):
+    """
+    Sign a request path for the profile header.
+
+    Parameters:
+        secret (str): The shared profiling secret (`PROFILE_SECRET`).
+        path (str): The path of the request to profile, e.g. "/inventory/3".
+        timestamp (int): The signing time in Unix seconds. Defaults to now.
+
+    Returns:
+        str: The header value, "<timestamp>.<signature>".
+    """
+    timestamp = int(time.time()) if timestamp is None else int(timestamp)
+    signature = hmac.new(secret.encode(), f"{timestamp}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{timestamp}.{signature}"
+
+
+def verify_profile_request(secret, value, path, now=None, max_age=MAX_SIGNATURE_AGE):
+    """
+    Check the profile header of a request.
+
+    Parameters:
+        secret (str): The shared profiling secret, None when header profiling is disabled.
+        value (str): The header value.
+        path (str): The path of the request.
+        now (float): The current time in Unix seconds. Defaults to now.
+        max_age (int): The age in seconds after which a signature expires.
+
+    Returns:
+        bool: True if the header was signed for this path with the secret and has not expired.
+    """
+    if not secret or not value or "." not in value:
+        return False
+    timestamp, _ = value.split(".", 1)
+    try:
+        age = (time.time() if now is None else now) - int(timestamp)
+    except ValueError:
+        return False
+    if not -60 <= age <= max_age:
+        return False
+    return hmac.compare_digest(value, sign_profile_request(secret, path, int(timestamp)))
+
+
+class RequestProfiler:
+    """
+    Deterministic profiling of single requests.
+
+    Classes:
+        RequestProfiler: Decides which requests to profile and stores their profiles.
+
+    A request is profiled when it carries a valid signed `X-Profile-Request` header, or when it is
+    drawn by the sampling rate. Sampled profiles are only kept for requests slower than
+    `min_latency_ms`, so sampling in staging collects the slow requests. Each profile is stored as a
+    pstats file next to a JSON file describing the request: route, status and latency.
+
+    One request is profiled at a time per process, others are served normally. Only the thread
+    handling the request is profiled: work done in other threads, e.g. async views, is not seen.
+
+    Attributes:
+        service (str): The name of the service, prefixed to the stored files.
+        directory (str): Where profiles are stored.
+        secret (str): The secret of the profile header, None to ignore the header.
+        sample_rate (float): The fraction of requests profiled, between 0 and 1.
+        min_latency_ms (float): The latency under which sampled profiles are dropped.
+        max_profiles (int): The number of profiles kept, the oldest ones are deleted.
+
+    Methods:
+        should_profile(): Tells whether the current request is profiled, and why.
+        save(profile, details): Stores a profile and returns the path of its pstats file.
+        profiles(): Lists the stored profiles.
+    """
+
+    def __init__(self, service, directory=None, secret=None, sample_rate=0.0, min_latency_ms=0.0, max_profiles=200):
+        self.service = service
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "profiles")
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.min_latency_ms = min_latency_ms
+        self.max_profiles = max_profiles
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, service):
+        """
+        Configure a profiler from `PROFILE_SECRET`, `PROFILE_SAMPLE_RATE`, `PROFILE_MIN_LATENCY_MS`,
+        `PROFILE_DIR` and `PROFILE_MAX_FILES`. Without them, no request is profiled.
+        """
+        return cls(
+            service,
+            directory=os.getenv("PROFILE_DIR"),
+            secret=os.getenv("PROFILE_SECRET") or None,
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            min_latency_ms=float(os.getenv("PROFILE_MIN_LATENCY_MS", "0")),
+            max_profiles=int(os.getenv("PROFILE_MAX_FILES", "200")),
+        )
+
+    def should_profile(self):
+        """
+        Tell whether the current request is profiled.
+
+        Returns:
+            str: "header" for a valid signed header, "sample" for a sampled request, else None.
+        """
+        value = request.headers.get(PROFILE_HEADER)
+        if value and verify_profile_request(self.secret, value, request.path):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def save(self, profile, details):
+        """
+        Store the profile of a request.
+
+        Parameters:
+            profile (cProfile.Profile): The stopped profiler.
+            details (dict): The description of the request, stored as JSON next to the profile.
+
+        Returns:
+            str: The path of the pstats file.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        base = os.path.join(self.directory, f"{self.service}-{stamp}-{uuid.uuid4().hex[:8]}")
+        profile.dump_stats(base + ".prof")
+        with open(base + ".json", "w") as details_file:
+            json.dump(dict(details, stats=os.path.basename(base + ".prof")), details_file)
+        self._prune()
+        return base + ".prof"
+
+    def _prune(self):
+        paths = sorted(glob.glob(os.path.join(self.directory, f"{self.service}-*.json")))
+        for path in paths[:max(len(paths) - self.max_profiles, 0)]:
+            for stale in (path, path[:-len(".json")] + ".prof"):
+                try:
+                    os.unlink(stale)
+                except FileNotFoundError:
+                    pass
+
+    def profiles(self):
+        """
+        List the stored profiles of the service.
+
+        Returns:
+            list: The description of every stored profile, newest first.
+        """
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(self.directory, f"{self.service}-*.json")), reverse=True):
+            try:
+                with open(path) as details_file:
+                    profiles.append(json.load(details_file))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+
+def init_profiling(app, service):
+    """
+    Profile requests of a Flask app selected by a `RequestProfiler`.
+
+    The profiler is read from `app.config['REQUEST_PROFILER']`, configured from the environment by
+    default. Profiling starts before the other `before_request` hooks of the app when this is
+    called first, and stops once the response, compressed if need be, is complete.
+
+    Parameters:
+        app (Flask): The application to install the middleware on.
+        service (str): The name of the service.
+    """
+    app.config['REQUEST_PROFILER'] = RequestProfiler.from_env(service)
+
+    @app.before_request
+    def start_request_profile():
+        profiler = current_app.config['REQUEST_PROFILER']
+        if not profiler.secret and not profiler.sample_rate:
+            return
+        trigger = profiler.should_profile()
+        if trigger is None or not profiler.lock.acquire(blocking=False):
+            return
+        g.request_profile = (profiler, trigger, cProfile.Profile(), time.perf_counter())
+        g.request_profile[2].enable()
+
+    @app.after_request
+    def record_profiled_status(response):
+        if "request_profile" in g:
+            g.request_profile_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def stop_request_profile(error=None):
+        if "request_profile" not in g:
+            return
+        profiler, trigger, profile, started = g.pop("request_profile")
+        try:
+            profile.disable()
+            latency_ms = (time.perf_counter() - started) * 1000
+            if trigger == "sample" and latency_ms < profiler.min_latency_ms:
+                return
+            profiler.save(profile, {
+                "service": profiler.service,
+                "method": request.method,
+                "path": request.path,
+                "route": request.url_rule.rule if request.url_rule else None,
+                "status": g.pop("request_profile_status", 500),
+                "latency_ms": round(latency_ms, 2),
+                "trigger": trigger,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            })
+        except Exception:
+            # Profiling must never fail the request
+            pass
+        finally:
+            profiler.lock.release()
+
+    return start_request_profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sign profile headers and list stored request profiles.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sign = commands.add_parser("sign", help="print the profile header of a request path, signed with PROFILE_SECRET")
+    sign.add_argument("path", help="the path of the request, e.g. /inventory/3")
+    listing = commands.add_parser("list", help="list stored profiles, slowest first")
+    listing.add_argument("service", help="the service whose profiles to list")
+    listing.add_argument("--directory", default=os.getenv("PROFILE_DIR"), help="where profiles are stored")
+    listing.add_argument("--limit", type=int, default=20, help="number of profiles listed")
+    args = parser.parse_args()
+
+    if args.command == "sign":
+        if not os.getenv("PROFILE_SECRET"):
+            parser.error("PROFILE_SECRET is not set")
+        print(f"{PROFILE_HEADER}: {sign_profile_request(os.getenv('PROFILE_SECRET'), args.path)}")
+    else:
+        profiles = RequestProfiler(args.service, directory=args.directory).profiles()
+        profiles.sort(key=lambda details: details["latency_ms"], reverse=True)
+        print(json.dumps(profiles[:args.limit], indent=2))
@@ -0,0 +1,307 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, update
+from shared.database import SessionLocal
+from shared.models.customer import Customer
+from shared.models.inventory import InventoryItem
+from shared.models.item_daily_stats import ItemDailyStats
+from shared.models.order import Order
+from shared.models.purge_job import PurgeJob
+from shared.models.rating_summary import ItemRatingSummary
+from shared.models.review import Review
+from shared.models.wishlist import Wishlist
+from shared.ratings import COUNTED_STATUS, apply_bulk_rating_change
+from shared.versioning import bump_version, customer_version_name, review_version_name
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+
+
+def schedule_purge(db_session, kind, target_id, label=None):
+    """
+    Create the purge job of a record as part of the caller's transaction.
+
+    The caller marks the record as deleted in the same transaction, so it disappears from reads
+    right away while its dependent rows are deleted in the background.
+
+    Parameters:
+        db_session (Session): The session marking the record.
+        kind (str): The kind of record, a key of PURGE_PLANS.
+        target_id (int): The ID of the record.
+        label (str): A readable name of the record.
+
+    Returns:
+        PurgeJob: The new job, flushed so its ID is set.
+    """
+    job = PurgeJob(kind=kind, target_id=target_id, label=label, status=PENDING, rows_deleted=0)
+    db_session.add(job)
+    db_session.flush()
+    return job
+
+
+def find_purge_job(db_session, kind, target_id):
+    """
+    Find the latest purge job of a record.
+
+    Parameters:
+        db_session (Session): The session to read with.
+        kind (str): The kind of record.
+        target_id (int): The ID of the record.
+
+    Returns:
+        PurgeJob: The job, or None if the record was never marked as deleted.
+    """
+    return db_session.query(PurgeJob).filter_by(kind=kind, target_id=target_id).order_by(PurgeJob.id.desc()).first()
+
+
+def purge_job_to_dict(job):
+    """
+    Render a purge job for API responses.
+
+    Parameters:
+        job (PurgeJob): The job.
+
+    Returns:
+        dict: The job ID, the purged record, the status, current step and rows deleted so far.
+    """
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "target_id": job.target_id,
+        "label": job.label,
+        "status": job.status,
+        "step": job.step,
+        "rows_deleted": job.rows_deleted,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def delete_chunk(db_session, key, criterion, limit, columns=()):
+    """
+    Delete at most `limit` rows matching a filter.
+
+    The chunk is read and locked with SELECT ... FOR UPDATE, then removed with a plain DELETE on its
+    keys, which every database supports. A second worker purging the same rows waits on the lock and
+    then no longer finds them.
+
+    Parameters:
+        db_session (Session): The session to delete in.
+        key (Column): The primary key column of the table, e.g. `Order.id`, or the remaining key
+                      column of a composite key fixed by `criterion`.
+        criterion: The SQLAlchemy filter expression selecting the rows.
+        limit (int): The chunk size.
+        columns (tuple): Columns to read from every deleted row.
+
+    Returns:
+        list: The values of `columns` for every deleted row, an empty tuple per row without them.
+    """
+    rows = db_session.query(key, *columns).filter(criterion).order_by(key).limit(limit).with_for_update().all()
+    if not rows:
+        return []
+    db_session.execute(
+        delete(key.class_).where(key.in_([row[0] for row in rows]), criterion),
+        execution_options={"synchronize_session": False},
+    )
+    return [tuple(row[1:]) for row in rows]
+
+
+def delete_review_chunk(db_session, criterion, limit):
+    """
+    Delete a chunk of reviews, removing the approved ones from the rating summaries.
+
+    The rating changes are computed from the locked rows, so they stay exact when two workers purge
+    the same reviews.
+
+    Parameters:
+        db_session (Session): The session to delete in.
+        criterion: The SQLAlchemy filter expression selecting the reviews.
+        limit (int): The chunk size.
+
+    Returns:
+        int: The number of reviews deleted.
+    """
+    deleted = delete_chunk(
+        db_session, Review.id, criterion, limit,
+        columns=(Review.item_id, Review.rating, Review.created_at, Review.status),
+    )
+    apply_bulk_rating_change(db_session, [row[:3] for row in deleted if row[3] == COUNTED_STATUS], -1)
+    for item_id in {row[0] for row in deleted}:
+        bump_version(db_session, review_version_name(item_id))
+    return len(deleted)
+
+
+def _finish_customer(db_session, job):
+    db_session.execute(delete(Customer).where(Customer.id == job.target_id, Customer.deleted_at.isnot(None)))
+    bump_version(db_session, customer_version_name(job.label))
+
+
+def _finish_item(db_session, job):
+    db_session.execute(delete(ItemRatingSummary).where(ItemRatingSummary.item_id == job.target_id))
+    db_session.execute(delete(InventoryItem).where(InventoryItem.id == job.target_id, InventoryItem.deleted_at.isnot(None)))
+
+
+# The dependent tables of each kind of record, purged in order, and the final deletion of the record
+PURGE_PLANS = {
+    "customer": (
+        [
+            ("orders", lambda db_session, job, limit: len(delete_chunk(db_session, Order.id, Order.customer_id == job.target_id, limit))),
+            ("reviews", lambda db_session, job, limit: delete_review_chunk(db_session, Review.customer_id == job.target_id, limit)),
+            ("wishlist", lambda db_session, job, limit: len(delete_chunk(db_session, Wishlist.wishlist_id, Wishlist.customer_id == job.target_id, limit))),
+        ],
+        _finish_customer,
+    ),
+    "item": (
+        [
+            ("orders", lambda db_session, job, limit: len(delete_chunk(db_session, Order.id, Order.item_id == job.target_id, limit))),
+            ("reviews", lambda db_session, job, limit: delete_review_chunk(db_session, Review.item_id == job.target_id, limit)),
+            ("wishlist", lambda db_session, job, limit: len(delete_chunk(db_session, Wishlist.wishlist_id, Wishlist.item_id == job.target_id, limit))),
+            ("daily_stats", lambda db_session, job, limit: len(delete_chunk(db_session, ItemDailyStats.day, ItemDailyStats.item_id == job.target_id, limit))),
+        ],
+        _finish_item,
+    ),
+}
+
+
+class Purger:
+    """
+    Background purge of deleted records.
+
+    Classes:
+        Purger: A worker thread deleting the dependent rows of records marked as deleted, one
+        bounded chunk per transaction, then the records themselves.
+
+    Deleting a large account in one transaction holds locks on the orders, reviews and wishlist
+    tables for seconds. Chunks keep every transaction short, and the pause between chunks leaves
+    room to the request traffic on the same tables. Chunks are safe to run from several processes
+    at once: each one deletes only rows still present, and job progress is updated relatively.
+
+    Attributes:
+        plans (dict): Maps a kind of record to its steps and final deletion, see PURGE_PLANS.
+        chunk_size (int): Maximum number of rows deleted per transaction.
+        pause (float): Seconds waited between two chunks.
+        interval (float): Seconds the worker waits after finding no job.
+        on_purged (function): Called with the kind, ID and label of each purged record, e.g. to drop
+            local caches.
+
+    Methods:
+        start(): Starts the worker thread if it is not running in this process.
+        run_chunk(job_id): Deletes one chunk of a job and returns the number of rows deleted.
+        run_once(): Runs every unfinished job to completion.
+    """
+
+    def __init__(self, plans, session_factory=SessionLocal, chunk_size=500, pause=0.05, interval=1.0, on_purged=None):
+        self.plans = plans
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.interval = interval
+        self.on_purged = on_purged
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="purger", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                purged = self.run_once(pause=self.pause)
+            except Exception:
+                purged = 0
+            if not purged:
+                time.sleep(self.interval)
+
+    def _unfinished_jobs(self):
+        db_session = self.session_factory()
+        try:
+            return [job_id for (job_id,) in db_session.query(PurgeJob.id).filter(
+                PurgeJob.status != DONE, PurgeJob.kind.in_(list(self.plans))
+            ).order_by(PurgeJob.id)]
+        finally:
+            db_session.close()
+
+    def _record_error(self, job_id, error):
+        db_session = self.session_factory()
+        try:
+            db_session.execute(update(PurgeJob).where(PurgeJob.id == job_id).values(error=str(error)[:1000]))
+            db_session.commit()
+        finally:
+            db_session.close()
+
+    def run_chunk(self, job_id):
+        """
+        Delete the next chunk of a purge job, or the record itself once no dependent row is left.
+
+        Parameters:
+            job_id (int): The ID of the job.
+
+        Returns:
+            int: The number of dependent rows deleted, 0 when the job finished or was already done.
+        """
+        db_session = self.session_factory()
+        finished = None
+        try:
+            job = db_session.get(PurgeJob, job_id)
+            if job is None or job.status == DONE:
+                return 0
+            steps, finish = self.plans[job.kind]
+            for step, purge_step in steps:
+                deleted = purge_step(db_session, job, self.chunk_size)
+                if deleted:
+                    db_session.execute(update(PurgeJob).where(PurgeJob.id == job_id).values(
+                        status=RUNNING, step=step, rows_deleted=PurgeJob.rows_deleted + deleted, error=None
+                    ))
+                    db_session.commit()
+                    return deleted
+
+            purged = (job.kind, job.target_id, job.label)
+            finish(db_session, job)
+            result = db_session.execute(update(PurgeJob).where(PurgeJob.id == job_id, PurgeJob.status != DONE).values(
+                status=DONE, step=None, error=None, finished_at=datetime.now(timezone.utc)
+            ))
+            db_session.commit()
+            if result.rowcount:
+                finished = purged
+        except Exception as e:
+            db_session.rollback()
+            self._record_error(job_id, e)
+            raise
+        finally:
+            db_session.close()
+
+        if finished is not None and self.on_purged is not None:
+            self.on_purged(*finished)
+        return 0
+
+    def run_once(self, pause=0.0):
+        """
+        Run every unfinished job to completion.
+
+        Parameters:
+            pause (float): Seconds waited between two chunks.
+
+        Returns:
+            int: The number of dependent rows deleted.
+        """
+        total = 0
+        for job_id in self._unfinished_jobs():
+            while True:
+                deleted = self.run_chunk(job_id)
+                total += deleted
+                if not deleted:
+                    break
+                if pause:
+                    time.sleep(pause)
+        return total
@@ -0,0 +1,198 @@
+from datetime import date
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from shared.models.rating_summary import ItemRatingSummary
+from shared.models.review import Review
+from shared.leaderboards import add_daily_stats, utc_day
+from shared.versioning import CATALOG_VERSION, bump_version, item_version_name
+
+# Only approved reviews count towards the rating of an item
+COUNTED_STATUS = "approved"
+
+RATING_COLUMNS = {
+    1: ItemRatingSummary.rating_1,
+    2: ItemRatingSummary.rating_2,
+    3: ItemRatingSummary.rating_3,
+    4: ItemRatingSummary.rating_4,
+    5: ItemRatingSummary.rating_5,
+}
+
+
+def adjust_rating_summary(db_session, item_id, deltas):
+    """
+    Add or remove ratings from the summary of an item as part of the caller's transaction.
+
+    The summary is changed with a relative UPDATE, so concurrent review changes on the same item
+    do not overwrite each other. Only the item version is bumped: catalog listings also show the
+    rating, but bumping the catalog version on every review would rebuild them all the time, so
+    sales-service refreshes them by age instead.
+
+    Parameters:
+        db_session (Session): The session holding the review change.
+        item_id (int): The ID of the reviewed item.
+        deltas (dict): Maps a rating (1 to 5) to the number of reviews with that rating to add,
+                       negative to remove.
+    """
+    deltas = {rating: delta for rating, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    values = {
+        "review_count": ItemRatingSummary.review_count + sum(deltas.values()),
+        "rating_sum": ItemRatingSummary.rating_sum + sum(rating * delta for rating, delta in deltas.items()),
+    }
+    for rating, delta in deltas.items():
+        column = RATING_COLUMNS[rating]
+        values[column.key] = column + delta
+    statement = update(ItemRatingSummary).where(ItemRatingSummary.item_id == item_id).values(**values)
+
+    if not db_session.execute(statement).rowcount:
+        summary = ItemRatingSummary(
+            item_id=item_id,
+            review_count=sum(deltas.values()),
+            rating_sum=sum(rating * delta for rating, delta in deltas.items()),
+            **{RATING_COLUMNS[rating].key: deltas.get(rating, 0) for rating in RATING_COLUMNS}
+        )
+        try:
+            with db_session.begin_nested():
+                db_session.add(summary)
+        except IntegrityError:
+            # Another transaction created the summary first
+            db_session.execute(statement)
+
+    bump_version(db_session, item_version_name(item_id))
+
+
+def apply_rating_change(db_session, before, after):
+    """
+    Update rating summaries and daily statistics for a review that was created, changed or deleted.
+
+    Parameters:
+        db_session (Session): The session holding the review change.
+        before (tuple): The (item_id, rating, status, created_at) of the review before the change,
+                        or None if it was just created.
+        after (tuple): The (item_id, rating, status, created_at) of the review after the change, or
+                       None if it was deleted. `created_at` is None for a review not flushed yet.
+    """
+    changes = []
+    if before is not None and before[2] == COUNTED_STATUS:
+        changes.append((before, -1))
+    if after is not None and after[2] == COUNTED_STATUS:
+        changes.append((after, 1))
+    _apply_counts(db_session, [(item_id, rating, created_at, sign) for (item_id, rating, _, created_at), sign in changes])
+
+
+def remove_reviews_from_summaries(db_session, *criteria):
+    """
+    Subtract a set of reviews from the rating summaries, before they are deleted in bulk.
+
+    The reviews are counted in SQL per item, rating and day, so only the groups are loaded however
+    many reviews match.
+
+    Parameters:
+        db_session (Session): The session that will delete the reviews.
+        criteria: SQLAlchemy filter expressions selecting the reviews, e.g. `Review.customer_id == 4`.
+
+    Returns:
+        list: The IDs of the items whose summary changed.
+    """
+    day = func.date(Review.created_at)
+    groups = db_session.query(Review.item_id, Review.rating, day, func.count(Review.id)).filter(
+        Review.status == COUNTED_STATUS, *criteria
+    ).group_by(Review.item_id, Review.rating, day).all()
+    return _apply_day_counts(db_session, [(item_id, rating, _as_date(day), -count) for item_id, rating, day, count in groups])
+
+
+def apply_bulk_rating_change(db_session, rows, delta):
+    """
+    Update rating summaries and daily statistics for reviews entering or leaving approval in bulk.
+
+    Parameters:
+        db_session (Session): The session holding the bulk change.
+        rows (list): The (item_id, rating, created_at) of every review that changed, e.g. the rows
+                     returned by an UPDATE or DELETE ... RETURNING.
+        delta (int): 1 if the reviews became approved, -1 if they stopped being approved.
+
+    Returns:
+        list: The IDs of the items whose summary changed.
+    """
+    return _apply_counts(db_session, [(item_id, rating, created_at, delta) for item_id, rating, created_at in rows])
+
+
+def _apply_counts(db_session, counts):
+    return _apply_day_counts(db_session, [(item_id, rating, utc_day(created_at), delta) for item_id, rating, created_at, delta in counts])
+
+
+def _apply_day_counts(db_session, counts):
+    # Merge the changes per item and per day, so each row is updated once
+    summary_deltas = {}
+    daily_deltas = {}
+    for item_id, rating, day, delta in counts:
+        item_deltas = summary_deltas.setdefault(item_id, {})
+        item_deltas[rating] = item_deltas.get(rating, 0) + delta
+        daily = daily_deltas.setdefault((item_id, day), [0, 0])
+        daily[0] += delta
+        daily[1] += rating * delta
+
+    for item_id, item_deltas in summary_deltas.items():
+        adjust_rating_summary(db_session, item_id, item_deltas)
+    for (item_id, day), (review_count, rating_sum) in daily_deltas.items():
+        add_daily_stats(db_session, item_id, day, review_count=review_count, rating_sum=rating_sum)
+    return list(summary_deltas)
+
+
+def _as_date(value):
+    # DATE() comes back as a string from SQLite and as a date from MySQL
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rebuild_rating_summaries(db_session):
+    """
+    Recompute every rating summary from the reviews table.
+
+    Used to fill the summaries of a database created before they existed. The caller commits.
+
+    Parameters:
+        db_session (Session): The session to run the rebuild in.
+
+    Returns:
+        int: The number of items with at least one approved review.
+    """
+    rows = db_session.query(Review.item_id, Review.rating, func.count(Review.id)).filter(
+        Review.status == COUNTED_STATUS
+    ).group_by(Review.item_id, Review.rating).all()
+
+    summaries = {}
+    for item_id, rating, count in rows:
+        summary = summaries.setdefault(item_id, ItemRatingSummary(
+            item_id=item_id, review_count=0, rating_sum=0, rating_1=0, rating_2=0, rating_3=0, rating_4=0, rating_5=0
+        ))
+        summary.review_count += count
+        summary.rating_sum += rating * count
+        setattr(summary, RATING_COLUMNS[rating].key, count)
+
+    db_session.query(ItemRatingSummary).delete()
+    db_session.add_all(summaries.values())
+    bump_version(db_session, CATALOG_VERSION)
+    return len(summaries)
+
+
+def summary_to_dict(summary):
+    """
+    Render a rating summary for API responses.
+
+    Parameters:
+        summary (ItemRatingSummary): The summary, or None if the item has no approved review.
+
+    Returns:
+        dict: The `count` of approved reviews, their `average` rating rounded to two decimals (None
+              without reviews) and the `histogram` of ratings.
+    """
+    if summary is None or not summary.review_count:
+        return {"count": 0, "average": None, "histogram": {str(rating): 0 for rating in RATING_COLUMNS}}
+    return {
+        "count": summary.review_count,
+        "average": round(summary.rating_sum / summary.review_count, 2),
+        "histogram": {str(rating): getattr(summary, column.key) for rating, column in RATING_COLUMNS.items()},
+    }
@@ -0,0 +1,295 @@
+import asyncio
+import threading
+import time
+from functools import wraps
+
+import requests
+from shared.metrics import UPSTREAM_DURATION, metrics
+
+# httpx is optional, it is only used by the asyncio call paths
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+HTTP_ERRORS = (requests.HTTPError,) if httpx is None else (requests.HTTPError, httpx.HTTPStatusError)
+
+
+class UpstreamUnavailableError(Exception):
+    """
+    Raised when a call to another service is refused locally instead of being attempted.
+    """
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """
+    Raised when the circuit breaker of an upstream service is open.
+    """
+
+
+class BulkheadFullError(UpstreamUnavailableError):
+    """
+    Raised when too many calls to an upstream service are already in flight.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with half-open probing.
+
+    Classes:
+        CircuitBreaker: Tracks consecutive failures of an upstream service and fails calls fast
+        while the service is considered down.
+
+    Attributes:
+        name (str): The name of the upstream service.
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before letting probe calls through.
+        half_open_max_calls (int): Probe calls allowed concurrently while half-open.
+
+    States:
+        - closed: Calls go through, failures are counted.
+        - open: Calls are refused with `CircuitOpenError` until `reset_timeout` has elapsed.
+        - half_open: A limited number of probe calls go through. A success closes the circuit,
+          a failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """
+        Reserve the right to call the upstream service.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or all half-open probe slots are taken.
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+                self._state = self.HALF_OPEN
+                self._half_open_calls = 0
+
+            if self._state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit half-open)")
+                self._half_open_calls += 1
+
+    def record_success(self):
+        """
+        Record a successful call, closing the circuit if it was half-open.
+        """
+        with self._lock:
+            self._failures = 0
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._half_open_calls = 0
+
+    def record_failure(self):
+        """
+        Record a failed call, opening the circuit when the threshold is reached or a probe fails.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+
+class Bulkhead:
+    """
+    Bounded number of concurrent calls to one upstream service.
+
+    Attributes:
+        name (str): The name of the upstream service.
+        max_concurrent (int): The maximum number of calls in flight.
+        max_wait (float): Seconds to wait for a free slot before refusing the call.
+    """
+
+    def __init__(self, name, max_concurrent=10, max_wait=0.05):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def acquire(self):
+        """
+        Take a call slot.
+
+        Raises:
+            BulkheadFullError: If no slot frees up within `max_wait` seconds.
+        """
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            raise BulkheadFullError(f"{self.name} is unavailable (too many concurrent calls)")
+
+    async def acquire_async(self):
+        """
+        Take a call slot without blocking the event loop.
+
+        Raises:
+            BulkheadFullError: If no slot frees up within `max_wait` seconds.
+        """
+        deadline = time.monotonic() + self.max_wait
+        while not self._semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise BulkheadFullError(f"{self.name} is unavailable (too many concurrent calls)")
+            await asyncio.sleep(0.005)
+
+    def release(self):
+        """
+        Give back a call slot taken with `acquire`.
+        """
+        self._semaphore.release()
+
+
+def is_upstream_failure(error):
+    """
+    Tell whether an exception means the upstream service is unhealthy.
+
+    Client errors (HTTP 4xx) are answers from a working service, such as an insufficient balance,
+    so they do not count against the circuit breaker.
+
+    Parameters:
+        error (Exception): The exception raised by the call.
+
+    Returns:
+        bool: True for timeouts, connection errors, HTTP 5xx and unexpected errors.
+    """
+    if isinstance(error, HTTP_ERRORS) and error.response is not None:
+        return error.response.status_code >= 500
+    return True
+
+
+class Upstream:
+    """
+    Circuit breaker and bulkhead guarding the calls to one upstream service.
+
+    The duration of every attempted call is recorded in the `upstream_request_duration_seconds`
+    metric, with the outcome "success", "failure" (counted by the breaker) or "error" (an answer
+    that is not a failure of the service, e.g. 404).
+
+    Attributes:
+        name (str): The name of the upstream service.
+        breaker (CircuitBreaker): The circuit breaker of the service.
+        bulkhead (Bulkhead): The concurrent call limit of the service.
+
+    Methods:
+        call(func, *args, **kwargs): Calls `func` under the breaker and the bulkhead.
+        wrap(func): Returns `func` decorated so every call goes through `call`.
+        call_async(func, *args, **kwargs): Awaits the coroutine function `func` under the breaker
+            and the bulkhead.
+        wrap_async(func): Returns the coroutine function `func` decorated so every call goes
+            through `call_async`.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, max_concurrent=10, max_wait=0.05):
+        self.name = name
+        self.breaker = CircuitBreaker(name, failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        self.bulkhead = Bulkhead(name, max_concurrent=max_concurrent, max_wait=max_wait)
+
+    def _observe(self, outcome, started):
+        # Time spent in the call itself, waiting for a bulkhead slot excluded
+        metrics.observe(UPSTREAM_DURATION, (("upstream", self.name), ("outcome", outcome)), time.perf_counter() - started)
+
+    def call(self, func, *args, **kwargs):
+        self.bulkhead.acquire()
+        try:
+            self.breaker.allow()
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                    self._observe("failure", started)
+                else:
+                    self.breaker.record_success()
+                    self._observe("error", started)
+                raise
+            self.breaker.record_success()
+            self._observe("success", started)
+            return result
+        finally:
+            self.bulkhead.release()
+
+    def wrap(self, func):
+        @wraps(func)
+        def guarded(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        guarded.upstream = self
+        return guarded
+
+    async def call_async(self, func, *args, **kwargs):
+        await self.bulkhead.acquire_async()
+        try:
+            self.breaker.allow()
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                # Cancelled by the caller's deadline: the service was too slow, like a timeout
+                self.breaker.record_failure()
+                self._observe("failure", started)
+                raise
+            except Exception as e:
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                    self._observe("failure", started)
+                else:
+                    self.breaker.record_success()
+                    self._observe("error", started)
+                raise
+            self.breaker.record_success()
+            self._observe("success", started)
+            return result
+        finally:
+            self.bulkhead.release()
+
+    def wrap_async(self, func):
+        @wraps(func)
+        async def guarded(*args, **kwargs):
+            return await self.call_async(func, *args, **kwargs)
+        guarded.upstream = self
+        return guarded
+
+
+# One guard per upstream service and process, shared by every function calling that service
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name, **options):
+    """
+    Return the guard of an upstream service, creating it on first use.
+
+    Parameters:
+        name (str): The name of the upstream service, e.g. "customer-service".
+        **options: Settings passed to `Upstream` when the guard is created.
+
+    Returns:
+        Upstream: The guard shared by all callers of that service in this process.
+    """
+    with _upstreams_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name, **options)
+        return _upstreams[name]
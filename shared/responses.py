@@ -0,0 +1,33 @@
+from flask import Response, request
+from shared.compression import encoded_etag, negotiate_encoding
+
+def cached_json_response(entry, status=200):
+    """
+    Build a conditional response from a cached payload.
+
+    The payload is sent as-is, without serializing it again, together with its strong ETag.
+    When the client accepts a compressed encoding, the compressed copy kept by the entry is sent
+    instead of compressing the payload on every request. When the client already holds that
+    version (`If-None-Match`), an empty 304 is returned.
+
+    Parameters:
+        entry (CacheEntry): The cached payload.
+        status (int): The HTTP status code of a full response.
+
+    Returns:
+        Response: A 304 Not Modified response, or a JSON response holding the cached bytes.
+    """
+    encoding = negotiate_encoding(request.accept_encodings) if entry.compressible else None
+    etag = encoded_etag(entry.etag, encoding) if encoding else entry.etag
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    elif encoding:
+        response = Response(entry.encoded(encoding), status=status, mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = Response(entry.payload, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    if entry.compressible:
+        response.vary.add('Accept-Encoding')
+    return response
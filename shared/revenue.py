@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from shared.models.inventory import InventoryItem
+from shared.models.order import Order
+from shared.models.revenue_rollup import RevenueRollup
+
+GRANULARITIES = ("hour", "day")
+
+# Longest report range per granularity, which bounds the rollup rows read by one report
+MAX_RANGE = {"hour": timedelta(days=31), "day": timedelta(days=366)}
+
+GROUPINGS = ("category", "item")
+
+
+def naive_utc(moment):
+    """
+    Convert a timestamp to a naive UTC timestamp, as stored in the rollups.
+
+    Parameters:
+        moment (datetime): The timestamp. Naive timestamps are taken as UTC already.
+
+    Returns:
+        datetime: The naive UTC timestamp.
+    """
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def bucket_start(moment, granularity):
+    """
+    Truncate a timestamp to the start of its hour or day, in UTC.
+
+    Parameters:
+        moment (datetime): The timestamp. Naive timestamps are taken as UTC.
+        granularity (str): "hour" or "day".
+
+    Returns:
+        datetime: The naive UTC start of the bucket.
+    """
+    moment = naive_utc(moment)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_to_rollup(db_session, granularity, start, item_id, category, order_count, units, revenue):
+    statement = update(RevenueRollup).where(
+        RevenueRollup.granularity == granularity,
+        RevenueRollup.bucket_start == start,
+        RevenueRollup.item_id == item_id,
+    ).values(
+        order_count=RevenueRollup.order_count + order_count,
+        units=RevenueRollup.units + units,
+        revenue=RevenueRollup.revenue + revenue,
+    )
+    if db_session.execute(statement).rowcount:
+        return
+    try:
+        with db_session.begin_nested():
+            db_session.add(RevenueRollup(
+                granularity=granularity, bucket_start=start, item_id=item_id, category=category,
+                order_count=order_count, units=units, revenue=revenue
+            ))
+    except IntegrityError:
+        # Another transaction created the row first
+        db_session.execute(statement)
+
+
+def record_revenue(db_session, item_id, category, quantity, total_price, ordered_at=None):
+    """
+    Add an order to the hourly and daily revenue rollups as part of the caller's transaction.
+
+    Parameters:
+        db_session (Session): The session holding the order.
+        item_id (int): The ID of the ordered item.
+        category (str): The category of the item.
+        quantity (int): The number of units ordered.
+        total_price (float): The amount charged for the order.
+        ordered_at (datetime): When the order was placed. Defaults to now.
+    """
+    ordered_at = ordered_at or datetime.now(timezone.utc)
+    for granularity in GRANULARITIES:
+        _add_to_rollup(db_session, granularity, bucket_start(ordered_at, granularity), item_id, category, 1, quantity, total_price)
+
+
+def revenue_report(db_session, granularity, start, end, group_by=None, category=None, item_id=None):
+    """
+    Sum the revenue rollups over a time range.
+
+    Parameters:
+        db_session (Session): The session to read with.
+        granularity (str): "hour" or "day", the size of the returned buckets.
+        start (datetime): The start of the range, truncated to its bucket.
+        end (datetime): The end of the range, excluded.
+        group_by (str): "category" or "item" to split every bucket, or None for one total per bucket.
+        category (str): Restrict the report to one category.
+        item_id (int): Restrict the report to one item.
+
+    Returns:
+        dict: The `totals` over the range and the `series` of buckets, each with its `bucket`
+              start, its `category` or `item_id` when grouped, and its `orders`, `units` and `revenue`.
+    """
+    group_columns = {"category": [RevenueRollup.category], "item": [RevenueRollup.item_id], None: []}[group_by]
+    query = db_session.query(
+        RevenueRollup.bucket_start,
+        *group_columns,
+        func.sum(RevenueRollup.order_count),
+        func.sum(RevenueRollup.units),
+        func.sum(RevenueRollup.revenue),
+    ).filter(
+        RevenueRollup.granularity == granularity,
+        RevenueRollup.bucket_start >= bucket_start(start, granularity),
+        RevenueRollup.bucket_start < naive_utc(end),
+    )
+    if category is not None:
+        query = query.filter(RevenueRollup.category == category)
+    if item_id is not None:
+        query = query.filter(RevenueRollup.item_id == item_id)
+    rows = query.group_by(RevenueRollup.bucket_start, *group_columns).order_by(RevenueRollup.bucket_start, *group_columns).all()
+
+    key = {"category": "category", "item": "item_id"}.get(group_by)
+    series = []
+    totals = {"orders": 0, "units": 0, "revenue": 0.0}
+    for row in rows:
+        orders, units, revenue = int(row[-3]), int(row[-2]), float(row[-1])
+        point = {"bucket": row[0]}
+        if key is not None:
+            point[key] = row[1]
+        point.update({"orders": orders, "units": units, "revenue": round(revenue, 2)})
+        series.append(point)
+        totals["orders"] += orders
+        totals["units"] += units
+        totals["revenue"] += revenue
+    totals["revenue"] = round(totals["revenue"], 2)
+    return {"totals": totals, "series": series}
+
+
+def _bucket_expression(dialect_name, column, granularity):
+    # Truncates in SQL to the text of the bucket start, in the format the dialect stores it in
+    pattern = "%Y-%m-%d %H:00:00" if granularity == "hour" else "%Y-%m-%d 00:00:00"
+    if dialect_name == "sqlite":
+        return func.strftime(pattern + ".000000", column)
+    return func.date_format(column, pattern)
+
+
+def rebuild_revenue_rollups(db_session):
+    """
+    Recompute every revenue rollup from the orders table.
+
+    Used to fill the rollups of a database created before they existed. The rollups of each
+    granularity are computed and written by one grouped INSERT ... SELECT, so no order is loaded.
+    Orders are valued at the price they recorded. Orders placed before prices were recorded have
+    none, and are valued at the current price of their item, so their revenue is an approximation.
+    The caller commits.
+
+    Parameters:
+        db_session (Session): The session to run the rebuild in.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    dialect_name = db_session.get_bind().dialect.name
+    revenue = func.coalesce(
+        Order.total_price, Order.unit_price * Order.quantity, InventoryItem.price_per_item * Order.quantity
+    )
+
+    db_session.query(RevenueRollup).delete()
+    written = 0
+    for granularity in GRANULARITIES:
+        bucket = _bucket_expression(dialect_name, Order.created_at, granularity)
+        rows = select(
+            literal(granularity), bucket, Order.item_id, InventoryItem.category,
+            func.count(Order.id), func.sum(Order.quantity), func.sum(revenue),
+        ).join(InventoryItem, InventoryItem.id == Order.item_id).group_by(bucket, Order.item_id, InventoryItem.category)
+        result = db_session.execute(insert(RevenueRollup).from_select(
+            ["granularity", "bucket_start", "item_id", "category", "order_count", "units", "revenue"], rows
+        ))
+        written += result.rowcount
+    return written
@@ -0,0 +1,246 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func, or_, update
+from shared.database import SessionLocal
+from shared.models.review import Review
+from shared.ratings import apply_rating_change
+from shared.versioning import bump_version, review_version_name
+
+PENDING = "pending"
+
+LINK_PATTERN = re.compile(r"https?://|www\.|\b[a-z0-9-]+\.(com|net|org|io|ru|cn|biz)\b", re.IGNORECASE)
+REPEATED_CHARACTER_PATTERN = re.compile(r"(.)\1{5,}")
+
+# Comments shorter than this are too generic ("Great product!") to be treated as copies
+MIN_DUPLICATE_LENGTH = 30
+# A comment posted on the same item by this many different customers is treated as copy-pasted spam
+MAX_CUSTOMERS_PER_COMMENT = 3
+
+
+def check_links(comment):
+    """Flag comments advertising links."""
+    if LINK_PATTERN.search(comment):
+        return "contains a link"
+    return None
+
+
+def check_shouting(comment):
+    """Flag comments written mostly in capital letters."""
+    letters = [char for char in comment if char.isalpha()]
+    if len(letters) >= 20 and sum(1 for char in letters if char.isupper()) >= 0.7 * len(letters):
+        return "mostly capital letters"
+    return None
+
+
+def check_repetition(comment):
+    """Flag comments padded with a repeated character."""
+    if REPEATED_CHARACTER_PATTERN.search(comment):
+        return "repeated characters"
+    return None
+
+
+def profanity_check(profanity_filter):
+    """
+    Build a check flagging profane comments.
+
+    Parameters:
+        profanity_filter (ProfanityFilter): The compiled censor word list.
+
+    Returns:
+        function: The check.
+    """
+    def check_profanity(comment):
+        if profanity_filter.contains_profanity(comment):
+            return "profanity"
+        return None
+    return check_profanity
+
+
+class ReviewModerator:
+    """
+    Background moderation of pending reviews.
+
+    Classes:
+        ReviewModerator: A pool of worker threads that claim pending reviews in batches, run the
+        moderation checks on them and set them to "approved" or "flagged", one transaction per batch.
+
+    Batches are claimed with `SELECT ... FOR UPDATE SKIP LOCKED` where the database supports it, so
+    workers in every process of the service share the queue without moderating a review twice.
+    Each status change is also conditional on the review still being pending, which keeps the
+    rating summaries exact on databases without row locks and when a moderator decides first.
+
+    Attributes:
+        checks (list): Callables taking a comment and returning the reason to flag it, or None.
+        batch_size (int): Maximum number of reviews moderated per transaction.
+        workers (int): Number of worker threads.
+        interval (float): Seconds a worker waits after finding the queue empty.
+        on_moderated (function): Called after each batch with the set of IDs of the items whose
+            reviews changed, e.g. to drop local caches.
+        moderated (int): Reviews moderated by this process.
+        flagged (int): Reviews flagged by this process.
+
+    Methods:
+        start(): Starts the worker threads if they are not running in this process.
+        moderate_batch(): Moderates one batch and returns the number of reviews claimed.
+        run_once(): Moderates batches until the queue is empty.
+        backlog(): Returns the size and age of the queue.
+    """
+
+    def __init__(self, checks, session_factory=SessionLocal, batch_size=100, workers=2, interval=1.0, on_moderated=None):
+        self.checks = list(checks)
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.workers = workers
+        self.interval = interval
+        self.on_moderated = on_moderated
+        self.moderated = 0
+        self.flagged = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid() and any(thread.is_alive() for thread in self._threads):
+                return
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"review-moderator-{index}", daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                moderated = self.moderate_batch()
+            except Exception:
+                moderated = 0
+            if moderated < self.batch_size:
+                time.sleep(self.interval)
+
+    def _duplicates(self, db_session, reviews):
+        # One query for the whole batch: earlier reviews with the same comment text, by the same
+        # customers or on the same items. The comment column is not indexed, the lookup goes through
+        # the customer and item indexes and only compares the comments of the rows they select.
+        candidates = [review for review in reviews if review.comment and len(review.comment) >= MIN_DUPLICATE_LENGTH]
+        if not candidates:
+            return set()
+        copies = db_session.query(Review.id, Review.customer_id, Review.item_id, Review.comment).filter(
+            or_(
+                Review.customer_id.in_({review.customer_id for review in candidates}),
+                Review.item_id.in_({review.item_id for review in candidates}),
+            ),
+            Review.comment.in_({review.comment for review in candidates}),
+        )
+        authors = {}
+        for review_id, customer_id, item_id, comment in copies:
+            authors.setdefault(comment, []).append((review_id, customer_id, item_id))
+
+        duplicates = set()
+        for review in candidates:
+            others = authors.get(review.comment, [])
+            if any(customer_id == review.customer_id and review_id < review.id for review_id, customer_id, _ in others):
+                duplicates.add(review.id)
+            elif len({customer_id for _, customer_id, item_id in others if item_id == review.item_id}) >= MAX_CUSTOMERS_PER_COMMENT:
+                duplicates.add(review.id)
+        return duplicates
+
+    def verdict(self, review, duplicates=()):
+        """
+        Decide the status of a pending review.
+
+        Parameters:
+            review (Review): The pending review.
+            duplicates (set): IDs of the reviews of the batch found to be copies.
+
+        Returns:
+            tuple: The new status, "approved" or "flagged", and the reason it was flagged (or None).
+        """
+        if review.id in duplicates:
+            return "flagged", "duplicate comment"
+        comment = review.comment or ""
+        for check in self.checks:
+            reason = check(comment)
+            if reason:
+                return "flagged", reason
+        return "approved", None
+
+    def moderate_batch(self):
+        db_session = self.session_factory()
+        try:
+            reviews = db_session.query(Review).filter(Review.status == PENDING).order_by(Review.id).limit(
+                self.batch_size
+            ).with_for_update(skip_locked=True).all()
+            if not reviews:
+                db_session.rollback()
+                return 0
+
+            duplicates = self._duplicates(db_session, reviews)
+            changed_items = set()
+            moderated = flagged = 0
+            for review in reviews:
+                status, _ = self.verdict(review, duplicates)
+                result = db_session.execute(
+                    update(Review).where(Review.id == review.id, Review.status == PENDING).values(status=status)
+                )
+                if not result.rowcount:
+                    continue
+                before = (review.item_id, review.rating, PENDING, review.created_at)
+                apply_rating_change(db_session, before, (review.item_id, review.rating, status, review.created_at))
+                changed_items.add(review.item_id)
+                moderated += 1
+                flagged += status == "flagged"
+
+            for item_id in changed_items:
+                bump_version(db_session, review_version_name(item_id))
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+        finally:
+            db_session.close()
+
+        with self._lock:
+            # Reviews a moderator changed first are claimed but not counted
+            self.moderated += moderated
+            self.flagged += flagged
+        if changed_items and self.on_moderated is not None:
+            self.on_moderated(changed_items)
+        return len(reviews)
+
+    def run_once(self):
+        total = 0
+        while True:
+            moderated = self.moderate_batch()
+            total += moderated
+            if moderated < self.batch_size:
+                return total
+
+    def backlog(self):
+        """
+        Measure the moderation queue.
+
+        Returns:
+            dict: The number of `pending` reviews, the age in seconds of the oldest one (None when
+                  the queue is empty), and the reviews `moderated` and `flagged` by this process.
+        """
+        db_session = self.session_factory()
+        try:
+            pending, oldest = db_session.query(func.count(Review.id), func.min(Review.created_at)).filter(
+                Review.status == PENDING
+            ).one()
+        finally:
+            db_session.close()
+
+        oldest_age = None
+        if oldest is not None:
+            if oldest.tzinfo is None:
+                oldest = oldest.replace(tzinfo=timezone.utc)
+            oldest_age = round(max((datetime.now(timezone.utc) - oldest).total_seconds(), 0.0), 3)
+        return {"pending": pending, "oldest_pending_seconds": oldest_age, "moderated": self.moderated, "flagged": self.flagged}
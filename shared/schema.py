@@ -0,0 +1,110 @@
+from sqlalchemy import inspect, text
+from shared.models.customer import Customer
+from shared.models.inventory import InventoryItem
+from shared.models.order import Order
+from shared.models.review import Review
+
+# Nullable columns added to existing tables after their first release. `create_all` only creates
+# missing tables, so these are added to databases created before them by `add_missing_columns`.
+ADDED_COLUMNS = [
+    Customer.__table__.c.deleted_at,
+    InventoryItem.__table__.c.deleted_at,
+    Order.__table__.c.unit_price,
+    Order.__table__.c.total_price,
+]
+
+
+def _index(model, name):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+# Indexes added to existing tables after their first release, created on databases created before
+# them by `add_missing_indexes`
+ADDED_INDEXES = [
+    _index(InventoryItem, 'ix_inventory_item_category_price'),
+    _index(Review, 'ix_reviews_status_created_at'),
+]
+
+
+def _column_names(engine, table_name):
+    inspector = inspect(engine)
+    if not inspector.has_table(table_name):
+        return None
+    return {column["name"] for column in inspector.get_columns(table_name)}
+
+
+def add_missing_columns(engine, columns=ADDED_COLUMNS):
+    """
+    Add the given columns to their tables where the database does not have them yet.
+
+    Meant to run at startup right after `Base.metadata.create_all`. Every service may run it at the
+    same time: a column added by another service in the meantime is not an error.
+
+    Parameters:
+        engine (Engine): The database engine.
+        columns (list): The nullable columns to add, e.g. `Customer.__table__.c.deleted_at`.
+
+    Returns:
+        list: The "table.column" names of the columns added.
+    """
+    added = []
+    preparer = engine.dialect.identifier_preparer
+    for column in columns:
+        table_name = column.table.name
+        existing = _column_names(engine, table_name)
+        # Tables missing altogether are left to `create_all`
+        if existing is None or column.name in existing:
+            continue
+        statement = text(
+            f"ALTER TABLE {preparer.quote(table_name)} ADD COLUMN {preparer.quote(column.name)} "
+            f"{column.type.compile(dialect=engine.dialect)} NULL"
+        )
+        try:
+            with engine.begin() as connection:
+                connection.execute(statement)
+        except Exception:
+            # Another service added it first
+            if column.name not in _column_names(engine, table_name):
+                raise
+            continue
+        added.append(f"{table_name}.{column.name}")
+    return added
+
+
+def _index_names(engine, table_name):
+    inspector = inspect(engine)
+    if not inspector.has_table(table_name):
+        return None
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def add_missing_indexes(engine, indexes=ADDED_INDEXES):
+    """
+    Create the given indexes where the database does not have them yet.
+
+    Meant to run at startup right after `add_missing_columns`. Every service may run it at the
+    same time: an index created by another service in the meantime is not an error.
+
+    Parameters:
+        engine (Engine): The database engine.
+        indexes (list): The indexes to create, e.g. from `ADDED_INDEXES`.
+
+    Returns:
+        list: The names of the indexes created.
+    """
+    created = []
+    for index in indexes:
+        table_name = index.table.name
+        existing = _index_names(engine, table_name)
+        # Tables missing altogether are left to `create_all`
+        if existing is None or index.name in existing:
+            continue
+        try:
+            index.create(bind=engine, checkfirst=True)
+        except Exception:
+            # Another service created it first
+            if index.name not in _index_names(engine, table_name):
+                raise
+            continue
+        created.append(index.name)
+    return created
@@ -0,0 +1,155 @@
+import heapq
+import math
+import re
+import threading
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on",
+    "or", "the", "to", "with",
+})
+
+# Matches in the item name count more than matches in the description
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """
+    Split text into normalized search terms.
+
+    Terms are lowercase alphanumeric runs, stopwords are dropped and a trailing plural "s" is removed
+    so "apples" matches "apple".
+
+    Parameters:
+        text (str): The text to split. None is treated as empty.
+
+    Returns:
+        list: The terms, in order of appearance.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall((text or "").lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over inventory item names and descriptions.
+
+    Classes:
+        SearchIndex: Ranks items against a free-text query with BM25. Subscribes to a `CatalogFeed`,
+        so it is loaded once and then updated item by item as the catalog changes.
+
+    Attributes:
+        postings (dict): Maps a term to a dictionary of item ID -> weighted term frequency.
+        documents (dict): Maps an item ID to its (name, category, price) for result rendering.
+
+    Methods:
+        reset(rows): Rebuilds the index from every catalog row.
+        apply(item_id, row): Adds, replaces or removes one item.
+        search(query, limit, offset): Returns the total number of matches and one page of results.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        self._lengths = {}
+        self._terms = {}
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+
+    def _weighted_terms(self, name, description):
+        weights = {}
+        for term in tokenize(name):
+            weights[term] = weights.get(term, 0.0) + NAME_WEIGHT
+        for term in tokenize(description):
+            weights[term] = weights.get(term, 0.0) + DESCRIPTION_WEIGHT
+        return weights
+
+    def _remove(self, item_id):
+        weights = self._terms.pop(item_id, None)
+        if weights is None:
+            return
+        for term in weights:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(item_id, None)
+                if not posting:
+                    del self.postings[term]
+        self._total_length -= self._lengths.pop(item_id, 0.0)
+        self.documents.pop(item_id, None)
+
+    def _add(self, row):
+        item_id, name, category, price, description = row[0], row[1], row[2], row[3], row[4]
+        weights = self._weighted_terms(name, description)
+        for term, weight in weights.items():
+            self.postings.setdefault(term, {})[item_id] = weight
+        length = sum(weights.values())
+        self._terms[item_id] = weights
+        self._lengths[item_id] = length
+        self._total_length += length
+        self.documents[item_id] = (name, category, price)
+
+    def reset(self, rows):
+        rebuilt = SearchIndex()
+        for row in rows:
+            rebuilt._add(row)
+        with self._lock:
+            self.postings = rebuilt.postings
+            self.documents = rebuilt.documents
+            self._lengths = rebuilt._lengths
+            self._terms = rebuilt._terms
+            self._total_length = rebuilt._total_length
+
+    def apply(self, item_id, row):
+        with self._lock:
+            self._remove(item_id)
+            if row is not None:
+                self._add(row)
+
+    def search(self, query, limit=20, offset=0):
+        """
+        Rank the items matching a query.
+
+        Items matching any query term are returned, those matching more (and rarer) terms first.
+
+        Parameters:
+            query (str): The free-text query.
+            limit (int): The number of results to return.
+            offset (int): The number of top results to skip.
+
+        Returns:
+            tuple: The total number of matching items, and a list of (item_id, score, document)
+                   tuples for the requested page, best match first.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            item_count = len(self._lengths)
+            if not terms or not item_count:
+                return 0, []
+            average_length = self._total_length / item_count
+
+            scores = {}
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1.0 + (item_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                lengths = self._lengths
+                for item_id, frequency in posting.items():
+                    norm = K1 * (1.0 - B + B * lengths[item_id] / average_length)
+                    scores[item_id] = scores.get(item_id, 0.0) + idf * frequency * (K1 + 1.0) / (frequency + norm)
+
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda pair: (pair[1], -pair[0]))
+            page = [(item_id, score, self.documents[item_id]) for item_id, score in top[offset:]]
+        return len(scores), page
@@ -0,0 +1,208 @@
+import argparse
+import gc
+import importlib
+import multiprocessing
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The app module, port and optional startup function of every service
+SERVICES = {
+    "auth": ("auth.app", 3004, "create_default_admin"),
+    "customers": ("customers.app", 3000, None),
+    "inventory": ("inventory.app", 3001, None),
+    "reviews": ("reviews.app", 3002, None),
+    "sales": ("sales.app", 3003, None),
+}
+
+# Worker models: "sync" runs one request per process, "threaded" a pool of threads per process, and
+# "gevent" thousands of cooperative greenlets per process for services waiting on other services
+PRESETS = {
+    "sync": {"worker_class": "sync", "threads": 1},
+    "threaded": {"worker_class": "gthread", "threads": 4},
+    "gevent": {"worker_class": "gevent", "worker_connections": 1000},
+}
+
+# sales and reviews spend most of a request waiting on the network
+DEFAULT_PRESETS = {
+    "auth": "threaded",
+    "customers": "threaded",
+    "inventory": "threaded",
+    "reviews": "gevent",
+    "sales": "gevent",
+}
+
+
+def default_workers(preset):
+    """
+    Choose the number of worker processes.
+
+    Parameters:
+        preset (str): The worker model, a key of PRESETS.
+
+    Returns:
+        int: `WEB_CONCURRENCY` if set, else one process per CPU for cooperative workers, which
+             each serve many requests at once, and 2 * CPUs + 1 for the others.
+    """
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    cpus = multiprocessing.cpu_count()
+    return cpus if preset == "gevent" else cpus * 2 + 1
+
+
+def build_options(service, preset=None, workers=None, threads=None, bind=None, preload=None,
+                  timeout=30, graceful_timeout=30, max_requests=10000):
+    """
+    Build the gunicorn settings of a service.
+
+    Parameters:
+        service (str): The service to run, a key of SERVICES.
+        preset (str): The worker model, a key of PRESETS. Defaults to the preset of the service.
+        workers (int): The number of worker processes. Defaults to `default_workers(preset)`.
+        threads (int): The number of threads per process, for the "threaded" preset.
+        bind (str): The address to listen on. Defaults to 0.0.0.0 on the port of the service.
+        preload (bool): Whether to import the app once in the master process before forking the
+                        workers, which then share its memory pages copy-on-write. Defaults to
+                        True, except with the "gevent" preset: its workers patch the standard
+                        library when they start, and an app imported before would keep blocking
+                        sockets and locks.
+        timeout (int): Seconds after which a silent worker is killed and restarted.
+        graceful_timeout (int): Seconds workers get to finish their requests on shutdown.
+        max_requests (int): Requests after which a worker is replaced, bounding memory growth.
+                            A random jitter of 10% keeps the workers from restarting together.
+
+    Returns:
+        dict: The gunicorn settings.
+    """
+    if service not in SERVICES:
+        raise ValueError(f"Unknown service '{service}'. Valid services are: {', '.join(SERVICES)}.")
+    preset = preset or os.getenv("SERVER_PRESET") or DEFAULT_PRESETS[service]
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset}'. Valid presets are: {', '.join(PRESETS)}.")
+
+    options = dict(PRESETS[preset])
+    if threads is not None:
+        if preset != "threaded":
+            raise ValueError("Threads can only be set with the 'threaded' preset.")
+        options["threads"] = threads
+    if preload is None:
+        preload = preset != "gevent"
+    elif preload and preset == "gevent":
+        raise ValueError("The app cannot be preloaded with the 'gevent' preset.")
+    options.update({
+        "bind": bind or f"0.0.0.0:{SERVICES[service][1]}",
+        "workers": workers or default_workers(preset),
+        "preload_app": preload,
+        "timeout": timeout,
+        "graceful_timeout": graceful_timeout,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "child_exit": child_exit,
+    })
+    return options
+
+
+def post_fork(server, worker):
+    """
+    Drop the database connections a worker inherited from the master process.
+
+    Connections opened while preloading belong to the master; a worker using them would share a
+    socket with its siblings. The pool is emptied without closing them, the master still owns them.
+    """
+    from shared.database import engine
+    engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """
+    Close the database connections of a stopping worker and write its last metrics.
+    """
+    from shared.database import engine
+    from shared.metrics import metrics
+    engine.dispose()
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    """
+    Keep the request counts of an exited worker in the metrics of the service. Runs in the master.
+    """
+    from shared.metrics import mark_process_dead, metrics
+    if metrics.directory is not None:
+        mark_process_dead(metrics.directory, worker.pid)
+
+
+def load_app(service):
+    """
+    Import the Flask app of a service and run its startup function.
+
+    Parameters:
+        service (str): The service, a key of SERVICES.
+
+    Returns:
+        Flask: The app.
+    """
+    module_name, _, startup = SERVICES[service]
+    module = importlib.import_module(module_name)
+    if startup:
+        getattr(module, startup)()
+    return module.app
+
+
+def serve(service, **settings):
+    """
+    Run a service under gunicorn until it is stopped.
+
+    SIGTERM and SIGINT stop the service gracefully: workers stop accepting connections and get
+    `graceful_timeout` seconds to finish the requests in progress. SIGHUP reloads the workers.
+
+    Parameters:
+        service (str): The service, a key of SERVICES.
+        settings: Passed to `build_options`.
+    """
+    options = build_options(service, **settings)
+
+    # Every worker counts its own requests; GET /metrics on any of them reports the sum of all
+    # workers, written to this directory
+    from shared.metrics import metrics
+    metrics.enable_multiprocess(os.getenv("METRICS_DIR") or tempfile.mkdtemp(prefix=f"metrics-{service}-"), clear=True)
+
+    from gunicorn.app.base import BaseApplication
+
+    class ServiceApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            app = load_app(service)
+            # Objects created while importing the app live as long as the process; freezing them
+            # keeps the collector from touching them, and so, once preloaded, from copying their
+            # memory pages after fork
+            gc.freeze()
+            return app
+
+    ServiceApplication().run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a service under a production WSGI server.")
+    parser.add_argument("service", choices=list(SERVICES))
+    parser.add_argument("--preset", choices=list(PRESETS), help="worker model, defaults to the preset of the service")
+    parser.add_argument("--workers", type=int, help="worker processes, defaults to WEB_CONCURRENCY or a CPU-based count")
+    parser.add_argument("--threads", type=int, help="threads per worker, for the threaded preset")
+    parser.add_argument("--bind", help="address to listen on, defaults to 0.0.0.0 on the service port")
+    parser.add_argument("--no-preload", dest="preload", action="store_false", default=None, help="import the app in every worker, always done with the gevent preset")
+    parser.add_argument("--timeout", type=int, default=30, help="seconds before a silent worker is restarted")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="seconds workers get to finish on shutdown")
+    parser.add_argument("--max-requests", type=int, default=10000, help="requests before a worker is replaced")
+    args = parser.parse_args()
+    serve(
+        args.service, preset=args.preset, workers=args.workers, threads=args.threads, bind=args.bind,
+        preload=args.preload, timeout=args.timeout, graceful_timeout=args.graceful_timeout,
+        max_requests=args.max_requests,
+    )
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from shared.database import SessionLocal
+from shared.models.data_version import DataVersion
+
+# Version names shared by the services writing and caching the inventory catalog
+CATALOG_VERSION = "catalog"
+
+def item_version_name(item_id):
+    """
+    Return the name of the version counter of a single inventory item.
+
+    Parameters:
+        item_id (int): The ID of the inventory item.
+
+    Returns:
+        str: The version name, e.g. "catalog:item:42".
+    """
+    return f"catalog:item:{item_id}"
+
+def review_version_name(item_id):
+    """
+    Return the name of the version counter of the reviews of an inventory item.
+
+    Parameters:
+        item_id (int): The ID of the inventory item.
+
+    Returns:
+        str: The version name, e.g. "reviews:item:42".
+    """
+    return f"reviews:item:{item_id}"
+
+def customer_version_name(username):
+    """
+    Return the name of the version counter of a customer profile.
+
+    Parameters:
+        username (str): The username of the customer.
+
+    Returns:
+        str: The version name, e.g. "customer:alice".
+    """
+    return f"customer:{username}"
+
+def bump_version(db_session, name):
+    """
+    Increment a version counter as part of the caller's transaction.
+
+    The caller commits; readers only see the new version once the data change is committed too.
+
+    Parameters:
+        db_session (Session): The session holding the data change.
+        name (str): The name of the version counter.
+    """
+    result = db_session.execute(
+        update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1)
+    )
+    if result.rowcount:
+        return
+    try:
+        with db_session.begin_nested():
+            db_session.add(DataVersion(name=name, version=1))
+    except IntegrityError:
+        # Another transaction created the counter first
+        db_session.execute(
+            update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1)
+        )
+
+class VersionTracker:
+    """
+    Process-local view of version counters.
+
+    Classes:
+        VersionTracker: Reads version counters from the database at most once per `ttl` seconds
+        per name, so checking whether a cache entry is current rarely costs a query.
+
+    Attributes:
+        ttl (float): Seconds a version read from the database is trusted.
+
+    Methods:
+        get(name): Returns the current version of a counter (0 if it was never bumped).
+        known(name): Returns the cached version without querying, or None if it expired.
+        forget(name): Drops the cached version so the next `get` reads the database.
+    """
+
+    def __init__(self, session_factory=SessionLocal, ttl=1.0):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def known(self, name):
+        cached = self._versions.get(name)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        return None
+
+    def get(self, name):
+        version = self.known(name)
+        if version is not None:
+            return version
+
+        db_session = self.session_factory()
+        try:
+            row = db_session.query(DataVersion.version).filter(DataVersion.name == name).first()
+        finally:
+            db_session.close()
+        version = row[0] if row else 0
+        with self._lock:
+            self._versions[name] = (version, time.monotonic())
+        return version
+
+    def forget(self, name):
+        with self._lock:
+            self._versions.pop(name, None)